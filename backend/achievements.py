@@ -0,0 +1,181 @@
+# Server-side achievement engine
+#
+# Conditions are declared as minimum values for (dotted) stat fields and
+# indexed by the top-level field they read, so a write touching
+# `totalQuestsCompleted` only evaluates the achievements that depend on it.
+# Unlocks are recorded with $addToSet and never overwrite existing ones.
+#
+# Usage (backfill newly added achievements for all existing users):
+#   python achievements.py backfill [achievement_id ...]
+import argparse
+import asyncio
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from archive import HOT_USER
+
+# Keep in sync with frontend/src/utils/achievements.js.
+# Each achievement unlocks once every listed field is >= its minimum.
+ACHIEVEMENTS: Dict[str, Dict[str, int]] = {
+    'first_steps': {'totalQuestsCompleted': 1},
+    'week_warrior': {'streaks.dailyStreak': 7},
+    'month_master': {'streaks.dailyStreak': 30},
+    'century_club': {'streaks.dailyStreak': 100},
+    'level_10': {'level': 10},
+    'level_25': {'level': 25},
+    'level_50': {'level': 50},
+    'game_master': {
+        'miniGamesPlayed.dice': 1,
+        'miniGamesPlayed.focusHunt': 1,
+        'miniGamesPlayed.raceClock': 1,
+        'miniGamesPlayed.bossBattle': 1,
+    },
+    'boss_slayer': {'mainQuestsCompleted': 1},
+    'centurion': {'totalQuestsCompleted': 100},
+    'legendary': {'totalQuestsCompleted': 500},
+    'coin_collector': {'totalCoinsEarned': 100},
+    'first_purchase': {'totalPurchases': 1},
+}
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _meets(value: Any, minimum: int) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= minimum
+
+
+def unlocked_ids(achievements: Iterable[Any]) -> set:
+    """Achievement IDs from a stored list (plain IDs or legacy {'id': ...} dicts)"""
+    ids = set()
+    for entry in achievements or []:
+        if isinstance(entry, str):
+            ids.add(entry)
+        elif isinstance(entry, dict) and entry.get('id'):
+            ids.add(entry['id'])
+    return ids
+
+
+class AchievementEngine:
+    """Evaluates only the achievements affected by a set of changed fields"""
+
+    def __init__(self, definitions: Dict[str, Dict[str, int]] = ACHIEVEMENTS):
+        self.definitions = definitions
+        self._by_root: Dict[str, List[str]] = defaultdict(list)
+        for achievement_id, condition in definitions.items():
+            for root in {field.split('.', 1)[0] for field in condition}:
+                self._by_root[root].append(achievement_id)
+
+    def affected(self, changed_fields: Iterable[str]) -> List[str]:
+        """
+        Achievements whose condition reads any of the changed fields
+
+        Args:
+            changed_fields: Updated paths, e.g. 'level', 'streaks' or 'miniGamesPlayed.dice'
+        """
+        result = []
+        seen = set()
+        for field in changed_fields:
+            for achievement_id in self._by_root.get(field.split('.', 1)[0], ()):
+                if achievement_id not in seen:
+                    seen.add(achievement_id)
+                    result.append(achievement_id)
+        return result
+
+    def projection(self, achievement_ids: Iterable[str]) -> Dict[str, int]:
+        """Minimal projection needed to evaluate the given achievements"""
+        projection = {'_id': 0, 'achievements': 1}
+        for achievement_id in achievement_ids:
+            for field in self.definitions[achievement_id]:
+                projection[field] = 1
+        return projection
+
+    def evaluate(self, doc: Dict[str, Any], achievement_ids: Iterable[str]) -> List[str]:
+        """
+        Return which of the given achievements are newly satisfied by doc
+
+        Args:
+            doc: User document (at least the fields from `projection`)
+            achievement_ids: Candidates, usually from `affected`
+        """
+        already = unlocked_ids(doc.get('achievements'))
+        newly = []
+        for achievement_id in achievement_ids:
+            if achievement_id in already:
+                continue
+            condition = self.definitions[achievement_id]
+            if all(_meets(_get_path(doc, field), minimum) for field, minimum in condition.items()):
+                newly.append(achievement_id)
+        return newly
+
+    async def unlock(self, db, google_id: str, achievement_ids: List[str]) -> None:
+        """Record unlocks atomically without touching existing achievements"""
+        if achievement_ids:
+            await db.users.update_one(
+                {"google_id": google_id, **HOT_USER},
+                {"$addToSet": {"achievements": {"$each": achievement_ids}}}
+            )
+
+    def backfill_filter(self, achievement_id: str) -> Dict[str, Any]:
+        """Query matching users who qualify for but don't have an achievement"""
+        query = {field: {"$gte": minimum} for field, minimum in self.definitions[achievement_id].items()}
+        query['achievements'] = {"$ne": achievement_id}
+        return query
+
+    async def backfill(self, db, achievement_ids: Iterable[str] = None) -> Dict[str, int]:
+        """
+        Unlock achievements for every qualifying user with one update_many each
+
+        The condition runs inside MongoDB, so no user documents are loaded.
+
+        Returns:
+            dict of achievement_id -> number of users unlocked
+        """
+        results = {}
+        for achievement_id in achievement_ids or self.definitions:
+            result = await db.users.update_many(
+                self.backfill_filter(achievement_id),
+                {"$addToSet": {"achievements": achievement_id}}
+            )
+            results[achievement_id] = result.modified_count
+        return results
+
+
+achievement_engine = AchievementEngine()
+
+
+async def _run_backfill(achievement_ids: List[str]):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        results = await achievement_engine.backfill(db, achievement_ids or None)
+        for achievement_id, count in results.items():
+            print(f"  - {achievement_id}: {count} user(s) unlocked")
+        print(f"✅ Backfilled {len(results)} achievement(s)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Achievement maintenance')
+    sub = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = sub.add_parser('backfill', help='Unlock achievements for all qualifying users')
+    backfill_parser.add_argument('achievement_ids', nargs='*', help='Defaults to every achievement')
+    args = parser.parse_args()
+
+    unknown = [a for a in args.achievement_ids if a not in ACHIEVEMENTS]
+    if unknown:
+        parser.error(f"Unknown achievement(s): {', '.join(unknown)}")
+    asyncio.run(_run_backfill(args.achievement_ids))
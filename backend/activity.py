@@ -0,0 +1,317 @@
+# Activity event log and pre-aggregated rollups
+#
+# Clients send batches of small append-only events (XP gained, coins, quest
+# completions, streak changes, mini-game plays). They land in a MongoDB
+# time-series collection, and scheduled $merge pipelines fold them into
+# per-user daily and weekly rollup documents that the read API serves with
+# a single indexed lookup.
+#
+# Usage (e.g. from cron, instead of or in addition to the in-process loop):
+#   python activity.py rollup
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = 'activity_events'
+DAILY_COLLECTION = 'activity_daily'
+WEEKLY_COLLECTION = 'activity_weekly'
+JOB_STATE_COLLECTION = 'job_state'
+ROLLUP_JOB_ID = 'activity_rollups'
+
+# Raw events are only needed until they've been rolled up
+EVENT_RETENTION_SECONDS = int(os.environ.get('ACTIVITY_EVENT_RETENTION_DAYS', 35)) * 86400
+ROLLUP_INTERVAL_SECONDS = int(os.environ.get('ACTIVITY_ROLLUP_INTERVAL_SECONDS', 300))
+
+# Client timestamps are accepted (events may be sent after an offline period)
+# but clamped to this window, so each rollup only has to revisit a few days
+MAX_EVENT_AGE = timedelta(hours=48)
+
+
+async def ensure_activity_collections(db) -> None:
+    """Create the time-series collection and rollup indexes if missing"""
+    try:
+        await db.create_collection(
+            EVENTS_COLLECTION,
+            timeseries={'timeField': 'ts', 'metaField': 'meta', 'granularity': 'minutes'},
+            expireAfterSeconds=EVENT_RETENTION_SECONDS,
+        )
+    except (CollectionInvalid, OperationFailure):
+        # Already exists (or another worker created it first)
+        pass
+    await db[DAILY_COLLECTION].create_index([('google_id', 1), ('day', -1)])
+    await db[WEEKLY_COLLECTION].create_index([('google_id', 1), ('week', -1)])
+
+
+def build_event_docs(google_id: str, events: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Turn validated client events into time-series documents
+
+    Args:
+        google_id: Owner of the events
+        events: Event dicts (type, event_id, amount, quest_type, streak_type, game, ts)
+        now: Server receive time
+    """
+    oldest = now - MAX_EVENT_AGE
+    docs = []
+    for event in events:
+        ts = event.get('ts') or now
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        doc = {
+            'ts': min(max(ts, oldest), now),
+            'meta': {'google_id': google_id},
+            'type': event['type'],
+            'amount': event.get('amount', 0),
+        }
+        for field in ('event_id', 'quest_type', 'streak_type', 'game'):
+            if event.get(field) is not None:
+                doc[field] = event[field]
+        docs.append(doc)
+    return docs
+
+
+async def drop_seen_events(db, google_id: str, docs: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Drop events whose event_id was already stored (a resent batch)
+
+    Stored copies were clamped to MAX_EVENT_AGE when they arrived, so resends
+    within that window of the first delivery are recognised.
+
+    Args:
+        db: Database handle
+        google_id: Owner of the events
+        docs: Documents from build_event_docs
+        now: Server receive time
+    """
+    ids = {doc['event_id'] for doc in docs if 'event_id' in doc}
+    if not ids:
+        return docs
+    seen = set(await db[EVENTS_COLLECTION].distinct('event_id', {
+        'meta.google_id': google_id,
+        'ts': {'$gte': now - 2 * MAX_EVENT_AGE},
+        'event_id': {'$in': list(ids)},
+    }))
+    fresh = []
+    for doc in docs:
+        event_id = doc.get('event_id')
+        if event_id is not None:
+            if event_id in seen:
+                continue
+            # Also drop repeats within the batch
+            seen.add(event_id)
+        fresh.append(doc)
+    return fresh
+
+
+def _sum_if(condition: Dict[str, Any], value: Any = 1) -> Dict[str, Any]:
+    return {'$sum': {'$cond': [condition, value, 0]}}
+
+
+def _is_type(event_type: str) -> Dict[str, Any]:
+    return {'$eq': ['$type', event_type]}
+
+
+def _and(*conditions) -> Dict[str, Any]:
+    return {'$and': list(conditions)}
+
+
+def daily_rollup_pipeline(since: datetime, now: datetime) -> List[Dict[str, Any]]:
+    """Recompute every (user, day) with events on or after `since` (a UTC midnight)"""
+    def quest(quest_type):
+        return _sum_if(_and(_is_type('quest_completed'), {'$eq': ['$quest_type', quest_type]}))
+
+    def streak(streak_type):
+        return _sum_if(_and(_is_type('streak_change'), {'$eq': ['$streak_type', streak_type]}), '$amount')
+
+    return [
+        {'$match': {'ts': {'$gte': since}}},
+        {'$group': {
+            '_id': {
+                'google_id': '$meta.google_id',
+                'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$ts'}},
+            },
+            'xp': _sum_if(_is_type('xp'), '$amount'),
+            'coins': _sum_if(_is_type('coins'), '$amount'),
+            'completed_daily': quest('daily'),
+            'completed_weekly': quest('weekly'),
+            'completed_side': quest('side'),
+            'completed_main': quest('main'),
+            'streak_daily': streak('daily'),
+            'streak_weekly': streak('weekly'),
+            'mini_games': _sum_if(_is_type('minigame_played')),
+            'events': {'$sum': 1},
+        }},
+        {'$project': {
+            '_id': {'$concat': ['$_id.google_id', ':', '$_id.day']},
+            'google_id': '$_id.google_id',
+            'day': '$_id.day',
+            'xp': 1,
+            'coins': 1,
+            'completed': {
+                'daily': '$completed_daily',
+                'weekly': '$completed_weekly',
+                'side': '$completed_side',
+                'main': '$completed_main',
+            },
+            'streakChanges': {'daily': '$streak_daily', 'weekly': '$streak_weekly'},
+            'miniGamesPlayed': '$mini_games',
+            'events': 1,
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        {'$merge': {'into': DAILY_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+
+
+def weekly_rollup_pipeline(since_day: str, now: datetime) -> List[Dict[str, Any]]:
+    """Recompute every (user, ISO week) from daily rollups on or after `since_day` (a Monday)"""
+    return [
+        {'$match': {'day': {'$gte': since_day}}},
+        {'$group': {
+            '_id': {
+                'google_id': '$google_id',
+                'week': {'$dateToString': {'format': '%G-W%V', 'date': {'$dateFromString': {'dateString': '$day'}}}},
+            },
+            'xp': {'$sum': '$xp'},
+            'coins': {'$sum': '$coins'},
+            'completed_daily': {'$sum': '$completed.daily'},
+            'completed_weekly': {'$sum': '$completed.weekly'},
+            'completed_side': {'$sum': '$completed.side'},
+            'completed_main': {'$sum': '$completed.main'},
+            'streak_daily': {'$sum': '$streakChanges.daily'},
+            'streak_weekly': {'$sum': '$streakChanges.weekly'},
+            'mini_games': {'$sum': '$miniGamesPlayed'},
+            'active_days': {'$sum': 1},
+        }},
+        {'$project': {
+            '_id': {'$concat': ['$_id.google_id', ':', '$_id.week']},
+            'google_id': '$_id.google_id',
+            'week': '$_id.week',
+            'xp': 1,
+            'coins': 1,
+            'completed': {
+                'daily': '$completed_daily',
+                'weekly': '$completed_weekly',
+                'side': '$completed_side',
+                'main': '$completed_main',
+            },
+            'streakChanges': {'daily': '$streak_daily', 'weekly': '$streak_weekly'},
+            'miniGamesPlayed': '$mini_games',
+            'active_days': 1,
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        {'$merge': {'into': WEEKLY_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+
+
+async def acquire_lease(db, job_id: str, now: datetime, lease: timedelta) -> Optional[str]:
+    """
+    Make sure only one worker/instance runs a scheduled job at a time
+
+    Returns:
+        The lease owner token (pass it to renew_lease), or None if another
+        runner holds an unexpired lease
+    """
+    owner = str(uuid.uuid4())
+    try:
+        await db[JOB_STATE_COLLECTION].find_one_and_update(
+            {'_id': job_id, '$or': [{'lease_until': {'$lt': now}}, {'lease_until': None}]},
+            {'$set': {'lease_until': now + lease, 'lease_owner': owner}},
+            upsert=True,
+        )
+        return owner
+    except DuplicateKeyError:
+        # The job document exists and its lease hasn't expired
+        return None
+
+
+async def renew_lease(db, job_id: str, owner: str, lease: timedelta) -> bool:
+    """
+    Extend a lease we still hold to `lease` from now (for long multi-stage jobs)
+
+    Returns:
+        False if the lease expired and another runner has taken it over
+    """
+    result = await db[JOB_STATE_COLLECTION].update_one(
+        {'_id': job_id, 'lease_owner': owner},
+        {'$set': {'lease_until': datetime.now(timezone.utc) + lease}},
+    )
+    return result.matched_count == 1
+
+
+async def run_rollups(db, force: bool = False) -> bool:
+    """
+    Incrementally refresh daily and weekly rollups
+
+    Only days at or after the previous watermark (minus the late-event window)
+    are recomputed; whole days are rebuilt so $merge can simply replace them.
+
+    Returns:
+        True if the rollup ran, False if another runner holds the lease
+    """
+    now = datetime.now(timezone.utc)
+    if not force and not await acquire_lease(db, ROLLUP_JOB_ID, now, timedelta(seconds=max(ROLLUP_INTERVAL_SECONDS, 60))):
+        return False
+
+    state = await db[JOB_STATE_COLLECTION].find_one({'_id': ROLLUP_JOB_ID}) or {}
+    watermark = state.get('watermark')
+    if watermark is None:
+        since = now - timedelta(seconds=EVENT_RETENTION_SECONDS)
+    else:
+        if watermark.tzinfo is None:
+            watermark = watermark.replace(tzinfo=timezone.utc)
+        since = watermark - MAX_EVENT_AGE
+    since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = since - timedelta(days=since.weekday())
+
+    await db[EVENTS_COLLECTION].aggregate(daily_rollup_pipeline(since, now)).to_list(None)
+    await db[DAILY_COLLECTION].aggregate(weekly_rollup_pipeline(week_start.strftime('%Y-%m-%d'), now)).to_list(None)
+
+    await db[JOB_STATE_COLLECTION].update_one(
+        {'_id': ROLLUP_JOB_ID},
+        {'$set': {'watermark': now, 'last_run_at': now}},
+        upsert=True,
+    )
+    return True
+
+
+async def rollup_loop(db, interval: int = ROLLUP_INTERVAL_SECONDS) -> None:
+    """Background task: run the rollups every `interval` seconds"""
+    while True:
+        try:
+            if await run_rollups(db):
+                logger.info("📊 [Activity] Rollups refreshed")
+        except Exception as e:
+            logger.error("Activity rollup failed: %s: %s", type(e).__name__, e)
+        await asyncio.sleep(interval)
+
+
+async def _run_cli():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        await ensure_activity_collections(db)
+        await run_rollups(db, force=True)
+        print("✅ Activity rollups refreshed")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ['rollup']:
+        print("Usage: python activity.py rollup")
+        sys.exit(1)
+    asyncio.run(_run_cli())
@@ -0,0 +1,338 @@
+# Operator analytics
+#
+# A scheduled job keeps small summary collections up to date so the admin
+# dashboards read a few documents instead of scanning `users`:
+#
+#   analytics_user_facts  one tiny doc per user (cohort, last active day,
+#                         coin balances, promo count), refreshed only for
+#                         users written since the last run
+#   analytics_active_days one doc per (user, day) a user was seen active
+#   analytics_daily       per day: active users, new signups
+#   analytics_retention   per (signup-month cohort, month): active users
+#   analytics_cohorts     per signup-month cohort: size
+#   analytics_economy     per day: coins in circulation, earned and spent
+#   analytics_promos      per promo code / batch: redemptions and rate
+#
+# Each run only reads users whose `updated_at` is past the previous watermark
+# (through the `updated_at_hot` index) and recomputes just the days, months
+# and cohorts those users touch, $merge-ing the results. The first run
+# backfills from every user's current document, so activity before it only
+# shows each user's last active day.
+#
+# Aggregations read with ANALYTICS_READ_PREFERENCE (secondaryPreferred by
+# default; $merge from a secondary needs MongoDB 5.0+), keeping them off the
+# primary when the deployment has secondaries.
+#
+# Usage (e.g. from cron, instead of or in addition to the in-process loop):
+#   python analytics.py refresh [--full]
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+from activity import JOB_STATE_COLLECTION, acquire_lease, renew_lease
+
+logger = logging.getLogger(__name__)
+
+FACTS_COLLECTION = 'analytics_user_facts'
+ACTIVE_DAYS_COLLECTION = 'analytics_active_days'
+DAILY_STATS_COLLECTION = 'analytics_daily'
+RETENTION_COLLECTION = 'analytics_retention'
+COHORTS_COLLECTION = 'analytics_cohorts'
+ECONOMY_COLLECTION = 'analytics_economy'
+PROMOS_COLLECTION = 'analytics_promos'
+ANALYTICS_JOB_ID = 'analytics'
+# Cohort of users without a signup date
+UNKNOWN_COHORT = 'unknown'
+
+ANALYTICS_INTERVAL_SECONDS = int(os.environ.get('ANALYTICS_INTERVAL_SECONDS', 900))
+# Renewed after every stage, so it only has to outlast the slowest single stage
+ANALYTICS_LEASE = timedelta(seconds=max(ANALYTICS_INTERVAL_SECONDS, 60))
+ANALYTICS_READ_PREFERENCE = make_read_preference(
+    read_pref_mode_from_name(os.environ.get('ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')), None
+)
+# Writes stamped just before a run may commit (or replicate) just after it,
+# so each run re-reads a little before the previous watermark
+WATERMARK_OVERLAP = timedelta(seconds=int(os.environ.get('ANALYTICS_WATERMARK_OVERLAP_SECONDS', 300)))
+
+
+async def ensure_analytics_indexes(db) -> None:
+    await db[FACTS_COLLECTION].create_index('updated_at')
+    await db[FACTS_COLLECTION].create_index('cohort')
+    await db[FACTS_COLLECTION].create_index('member_since_day')
+    await db[ACTIVE_DAYS_COLLECTION].create_index('day')
+    await db[ACTIVE_DAYS_COLLECTION].create_index([('month', 1), ('cohort', 1)])
+
+
+def _merge(into: str, when_matched: str = 'replace') -> Dict[str, Any]:
+    return {'$merge': {'into': into, 'on': '_id', 'whenMatched': when_matched, 'whenNotMatched': 'insert'}}
+
+
+def _prefix(field: str, length: int) -> Dict[str, Any]:
+    return {'$substrBytes': [field, 0, length]}
+
+
+def days_between(since: datetime, now: datetime) -> List[str]:
+    """Every UTC day from since to now, as YYYY-MM-DD"""
+    day = since.date()
+    days = []
+    while day <= now.date():
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def user_facts_pipeline(since: Optional[datetime], now: datetime) -> List[Dict[str, Any]]:
+    """Refresh the facts of users written since `since` (None: every user)"""
+    if since is None:
+        # Backfill; archived stubs still carry their cohort
+        match = {}
+    else:
+        # Matches the partial `updated_at_hot` index (see archive.py)
+        match = {'updated_at': {'$gte': since.isoformat()}, 'archived': False}
+    member_since = {'$ifNull': ['$memberSince', {'$ifNull': ['$created_at', UNKNOWN_COHORT]}]}
+    return [
+        {'$match': match},
+        {'$project': {
+            '_id': '$google_id',
+            'cohort': _prefix(member_since, 7),
+            'member_since_day': _prefix(member_since, 10),
+            'last_active_day': _prefix('$updated_at', 10),
+            'level': '$level',
+            'coins': '$coins',
+            'coins_earned': '$totalCoinsEarned',
+            'coins_spent': '$totalCoinsSpent',
+            'promos_redeemed': {'$size': {'$ifNull': ['$used_promo_codes', []]}},
+            'archived': {'$ifNull': ['$archived', False]},
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        _merge(FACTS_COLLECTION),
+    ]
+
+
+def active_days_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """Record a (user, day) activity doc for every fact refreshed in this run"""
+    return [
+        {'$match': {'updated_at': now.isoformat(), 'archived': False}},
+        {'$project': {
+            '_id': {'$concat': ['$_id', ':', '$last_active_day']},
+            'google_id': '$_id',
+            'day': '$last_active_day',
+            'month': _prefix('$last_active_day', 7),
+            'cohort': 1,
+        }},
+        _merge(ACTIVE_DAYS_COLLECTION, 'keepExisting'),
+    ]
+
+
+def daily_active_pipeline(days: Optional[List[str]], now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {'$match': {} if days is None else {'day': {'$in': days}}},
+        {'$group': {'_id': '$day', 'active_users': {'$sum': 1}}},
+        {'$project': {'day': '$_id', 'active_users': 1, 'updated_at': {'$literal': now.isoformat()}}},
+        _merge(DAILY_STATS_COLLECTION, 'merge'),
+    ]
+
+
+def daily_signups_pipeline(days: Optional[List[str]], now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {'$match': {'member_since_day': {'$ne': UNKNOWN_COHORT}} if days is None else {'member_since_day': {'$in': days}}},
+        {'$group': {'_id': '$member_since_day', 'new_users': {'$sum': 1}}},
+        {'$project': {'day': '$_id', 'new_users': 1, 'updated_at': {'$literal': now.isoformat()}}},
+        _merge(DAILY_STATS_COLLECTION, 'merge'),
+    ]
+
+
+def retention_pipeline(months: Optional[List[str]], now: datetime) -> List[Dict[str, Any]]:
+    """Distinct active users per (cohort, month) for the given months"""
+    return [
+        {'$match': {} if months is None else {'month': {'$in': months}}},
+        {'$group': {'_id': {'cohort': '$cohort', 'month': '$month', 'google_id': '$google_id'}}},
+        {'$group': {'_id': {'cohort': '$_id.cohort', 'month': '$_id.month'}, 'active_users': {'$sum': 1}}},
+        {'$project': {
+            '_id': {'$concat': ['$_id.cohort', ':', '$_id.month']},
+            'cohort': '$_id.cohort',
+            'month': '$_id.month',
+            'active_users': 1,
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        _merge(RETENTION_COLLECTION),
+    ]
+
+
+def cohort_sizes_pipeline(cohorts: Optional[List[str]], now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {'$match': {} if cohorts is None else {'cohort': {'$in': cohorts}}},
+        {'$group': {'_id': '$cohort', 'users': {'$sum': 1}}},
+        {'$project': {'cohort': '$_id', 'users': 1, 'updated_at': {'$literal': now.isoformat()}}},
+        _merge(COHORTS_COLLECTION),
+    ]
+
+
+def economy_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """Today's coin economy snapshot, summed over the (small) facts documents"""
+    return [
+        {'$group': {
+            '_id': None,
+            'users': {'$sum': 1},
+            'coins_in_circulation': {'$sum': '$coins'},
+            'coins_earned_total': {'$sum': '$coins_earned'},
+            'coins_spent_total': {'$sum': '$coins_spent'},
+            'promos_redeemed_total': {'$sum': '$promos_redeemed'},
+        }},
+        {'$project': {
+            '_id': {'$literal': now.date().isoformat()},
+            'day': {'$literal': now.date().isoformat()},
+            'users': 1,
+            'coins_in_circulation': 1,
+            'coins_earned_total': 1,
+            'coins_spent_total': 1,
+            'promos_redeemed_total': 1,
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        _merge(ECONOMY_COLLECTION),
+    ]
+
+
+def _redemption_rate(used: str, limit: str) -> Dict[str, Any]:
+    return {'$cond': [{'$gt': [limit, 0]}, {'$divide': [used, limit]}, None]}
+
+
+def promo_codes_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """Shared codes; the rate is against max_uses (null when unlimited)"""
+    return [
+        {'$project': {
+            '_id': {'$concat': ['code:', '$code']},
+            'kind': {'$literal': 'code'},
+            'name': '$code',
+            'type': '$type',
+            'amount': '$amount',
+            'active': '$active',
+            'redemptions': {'$ifNull': ['$used_count', 0]},
+            'limit': '$max_uses',
+            'redemption_rate': _redemption_rate({'$ifNull': ['$used_count', 0]}, {'$ifNull': ['$max_uses', 0]}),
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        _merge(PROMOS_COLLECTION),
+    ]
+
+
+def promo_batches_pipeline(now: datetime) -> List[Dict[str, Any]]:
+    """Single-use batches; the rate is against the number of generated codes"""
+    return [
+        {'$project': {
+            '_id': {'$concat': ['batch:', '$batch_id']},
+            'kind': {'$literal': 'batch'},
+            'name': '$name',
+            'type': '$type',
+            'amount': '$amount',
+            'active': '$active',
+            'redemptions': {'$ifNull': ['$used_count', 0]},
+            'limit': '$size',
+            'redemption_rate': _redemption_rate({'$ifNull': ['$used_count', 0]}, {'$ifNull': ['$size', 0]}),
+            'updated_at': {'$literal': now.isoformat()},
+        }},
+        _merge(PROMOS_COLLECTION),
+    ]
+
+
+async def _aggregate(db, collection: str, pipeline: List[Dict[str, Any]]) -> None:
+    await db.get_collection(collection, read_preference=ANALYTICS_READ_PREFERENCE).aggregate(pipeline).to_list(None)
+
+
+async def run_analytics(db, force: bool = False, full: bool = False) -> bool:
+    """
+    Incrementally refresh the analytics summaries
+
+    Args:
+        db: Database
+        force: Run even if another runner holds the lease
+        full: Ignore the watermark and rebuild from every user document
+
+    Returns:
+        True if the job ran, False if another runner holds the lease (or
+        took it over mid-run)
+    """
+    now = datetime.now(timezone.utc)
+    owner = None
+    if not force:
+        owner = await acquire_lease(db, ANALYTICS_JOB_ID, now, ANALYTICS_LEASE)
+        if owner is None:
+            return False
+
+    state = await db[JOB_STATE_COLLECTION].find_one({'_id': ANALYTICS_JOB_ID}) or {}
+    watermark = None if full else state.get('watermark')
+    if watermark is None:
+        since = days = months = None
+    else:
+        if watermark.tzinfo is None:
+            watermark = watermark.replace(tzinfo=timezone.utc)
+        since = watermark - WATERMARK_OVERLAP
+        days = days_between(since, now)
+        months = sorted({day[:7] for day in days})
+
+    stages = [
+        # Facts first: every later stage reads them (or what they produced)
+        ('users', user_facts_pipeline(since, now)),
+        (FACTS_COLLECTION, active_days_pipeline(now)),
+        (ACTIVE_DAYS_COLLECTION, daily_active_pipeline(days, now)),
+        (FACTS_COLLECTION, daily_signups_pipeline(days, now)),
+        (ACTIVE_DAYS_COLLECTION, retention_pipeline(months, now)),
+        # New signups only ever join the current months' cohorts
+        (FACTS_COLLECTION, cohort_sizes_pipeline(months, now)),
+        (FACTS_COLLECTION, economy_pipeline(now)),
+        ('promo_codes', promo_codes_pipeline(now)),
+        ('promo_batches', promo_batches_pipeline(now)),
+    ]
+    for collection, pipeline in stages:
+        await _aggregate(db, collection, pipeline)
+        if owner is not None and not await renew_lease(db, ANALYTICS_JOB_ID, owner, ANALYTICS_LEASE):
+            # Another runner took over after our lease ran out; it'll finish the job
+            logger.warning("📈 [Analytics] Lease lost after the %s stage; stopping", collection)
+            return False
+
+    await db[JOB_STATE_COLLECTION].update_one(
+        {'_id': ANALYTICS_JOB_ID},
+        {'$set': {'watermark': now, 'last_run_at': now, 'last_run_seconds': (datetime.now(timezone.utc) - now).total_seconds()}},
+        upsert=True,
+    )
+    return True
+
+
+async def analytics_loop(db, interval: int = ANALYTICS_INTERVAL_SECONDS) -> None:
+    """Background task: refresh the analytics every `interval` seconds"""
+    while True:
+        try:
+            if await run_analytics(db):
+                logger.info("📈 [Analytics] Summaries refreshed")
+        except Exception as e:
+            logger.error("Analytics refresh failed: %s: %s", type(e).__name__, e)
+        await asyncio.sleep(interval)
+
+
+async def _run_cli(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        await ensure_analytics_indexes(db)
+        await run_analytics(db, force=True, full=args.full)
+        print("✅ Analytics summaries refreshed")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Operator analytics')
+    sub = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = sub.add_parser('refresh', help='Refresh the summary collections')
+    refresh_parser.add_argument('--full', action='store_true', help='Rebuild from every user, ignoring the watermark')
+    asyncio.run(_run_cli(parser.parse_args()))
@@ -0,0 +1,263 @@
+# Cold-user archival tier
+#
+# Users with no write for USER_ARCHIVE_AFTER_DAYS are moved, in batches, into
+# `users_archive` as a single zlib-compressed BSON blob each. A small stub
+# (identity fields plus `archived: True`) stays in `users`, so the hot
+# collection and its indexes only grow with active users. The next load of
+# an archived user (login or profile fetch) rehydrates it transparently.
+#
+# Archived users must re-authenticate before touching their data, so keep
+# USER_ARCHIVE_AFTER_DAYS longer than the JWT lifetime (30 days by default).
+# Writes to user fields still filter on HOT_USER (see write_hot_user), so a
+# stub is never written to and its changes lost when it is rehydrated.
+#
+# Usage:
+#   python archive.py run [--days N] [--dry-run]
+#   python archive.py restore <google_id>
+import argparse
+import asyncio
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import bson
+from pymongo import ReplaceOne
+
+from activity import JOB_STATE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = 'users_archive'
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('USER_ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('USER_ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('USER_ARCHIVE_INTERVAL_SECONDS', 3600))
+
+# Fields kept on the stub in `users`
+STUB_FIELDS = ('google_id', 'email', 'name', 'avatar', 'memberSince', 'updated_at')
+
+# Full user documents, not archived stubs
+HOT_USER = {'archived': {'$ne': True}}
+
+# job_state marker for the one-off `archived: False` backfill
+ARCHIVED_FLAG_MIGRATION = 'users_archived_flag'
+
+
+async def ensure_archive_indexes(db) -> None:
+    """
+    The archiver selects hot users by last write; stubs stay out of the index
+
+    Partial indexes can't select on a missing field, so every user document
+    carries `archived`. Documents created before that get `archived: False`
+    once, here.
+    """
+    if not await db[JOB_STATE_COLLECTION].find_one({'_id': ARCHIVED_FLAG_MIGRATION}):
+        result = await db.users.update_many({'archived': {'$exists': False}}, {'$set': {'archived': False}})
+        await db[JOB_STATE_COLLECTION].update_one(
+            {'_id': ARCHIVED_FLAG_MIGRATION},
+            {'$set': {'done_at': datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        if result.modified_count:
+            logger.info("📦 [Archive] Flagged %d existing user(s) as not archived", result.modified_count)
+    await db.users.create_index(
+        'updated_at',
+        name='updated_at_hot',
+        partialFilterExpression={'archived': False}
+    )
+
+
+def _inactive_query(cutoff: datetime) -> Dict[str, Any]:
+    return {'updated_at': {'$lt': cutoff.isoformat()}, 'archived': False}
+
+
+def compress_user(user: Dict[str, Any]) -> bytes:
+    return zlib.compress(bson.encode(user), 6)
+
+
+def decompress_user(data: bytes) -> Dict[str, Any]:
+    return bson.decode(zlib.decompress(data))
+
+
+def build_stub(user: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Minimal document left in `users` for an archived user"""
+    stub = {field: user[field] for field in STUB_FIELDS if field in user}
+    stub['_id'] = user['_id']
+    stub['archived'] = True
+    stub['archived_at'] = now.isoformat()
+    return stub
+
+
+async def archive_batch(db, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Archive one batch of users whose last write is older than cutoff
+
+    Each stub replacement is conditional on `updated_at` being unchanged, so a
+    user who becomes active mid-batch simply stays hot.
+
+    Returns:
+        Number of users selected for this batch
+    """
+    users = await db.users.find(_inactive_query(cutoff)).limit(batch_size).to_list(batch_size)
+    if not users:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    archive_ops = []
+    stub_ops = []
+    for user in users:
+        data = compress_user(user)
+        archive_ops.append(ReplaceOne(
+            {'_id': user['google_id']},
+            {'_id': user['google_id'], 'data': bson.Binary(data), 'archived_at': now.isoformat(), 'size': len(data)},
+            upsert=True
+        ))
+        stub_ops.append(ReplaceOne(
+            {'_id': user['_id'], 'updated_at': user.get('updated_at'), 'archived': False},
+            build_stub(user, now)
+        ))
+
+    # Archive copies must be durable before the full documents are replaced
+    await db[ARCHIVE_COLLECTION].bulk_write(archive_ops, ordered=False)
+    result = await db.users.bulk_write(stub_ops, ordered=False)
+
+    if result.modified_count < len(users):
+        # Users written to since they were selected stay hot; drop the copies
+        # this run made of them (not ones another run has since replaced)
+        ids = [user['google_id'] for user in users]
+        stubbed = await db.users.distinct('google_id', {'google_id': {'$in': ids}, 'archived': True})
+        await db[ARCHIVE_COLLECTION].delete_many({
+            '_id': {'$in': list(set(ids) - set(stubbed))},
+            'archived_at': now.isoformat()
+        })
+    return len(users)
+
+
+async def archive_inactive_users(db, days: int = ARCHIVE_AFTER_DAYS, dry_run: bool = False) -> int:
+    """
+    Archive every user with no write in `days` days, batch by batch
+
+    Safe to run from several workers at once: both the archive upsert and the
+    conditional stub replacement are idempotent.
+
+    Returns:
+        Number of users archived (or that would be, with dry_run)
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    if dry_run:
+        return await db.users.count_documents(_inactive_query(cutoff))
+
+    total = 0
+    while True:
+        count = await archive_batch(db, cutoff)
+        total += count
+        if count < ARCHIVE_BATCH_SIZE:
+            return total
+
+
+async def rehydrate_user(db, google_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Restore an archived user into `users` and return it (without _id)
+
+    Fields written to the stub after archival win over the archived copy.
+    Returns the stored document unchanged if the user isn't archived.
+    """
+    stub = await db.users.find_one({'google_id': google_id})
+    if stub is None or not stub.get('archived'):
+        if stub is not None:
+            stub.pop('_id', None)
+        return stub
+
+    archived = await db[ARCHIVE_COLLECTION].find_one({'_id': google_id})
+    if archived is None:
+        logger.error("Archived user %s has no archive document", google_id)
+        stub.pop('_id', None)
+        return stub
+
+    user = decompress_user(archived['data'])
+    for field, value in stub.items():
+        if field not in ('archived', 'archived_at'):
+            user[field] = value
+    user['archived'] = False
+    # Counts as activity, so the next archiver run doesn't move it straight back
+    user['updated_at'] = datetime.now(timezone.utc).isoformat()
+
+    result = await db.users.replace_one({'_id': stub['_id'], 'archived': True}, user)
+    if result.matched_count == 0:
+        # Another request rehydrated it first
+        user = await db.users.find_one({'google_id': google_id})
+    else:
+        await db[ARCHIVE_COLLECTION].delete_one({'_id': google_id})
+        logger.info("📦 [Archive] Rehydrated user %s", google_id)
+
+    if user is not None:
+        user.pop('_id', None)
+    return user
+
+
+async def write_hot_user(db, google_id: str, write: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run a write to a user's fields, rehydrating the user first if archived
+
+    `write` must include HOT_USER in its filter. Only when it matches nothing
+    and the user turns out to be an archived stub is the user rehydrated and
+    the write run once more, so hot users pay nothing extra.
+
+    Returns:
+        The write's result (document, None or UpdateResult)
+    """
+    result = await write()
+    missed = result is None or getattr(result, 'matched_count', 1) == 0
+    if missed and await db.users.find_one({'google_id': google_id, 'archived': True}, {'_id': 1}):
+        await rehydrate_user(db, google_id)
+        result = await write()
+    return result
+
+
+async def archive_loop(db, interval: int = ARCHIVE_INTERVAL_SECONDS) -> None:
+    """Background task: archive inactive users every `interval` seconds"""
+    while True:
+        try:
+            archived = await archive_inactive_users(db)
+            if archived:
+                logger.info("📦 [Archive] Archived %d inactive user(s)", archived)
+        except Exception as e:
+            logger.error("User archival failed: %s: %s", type(e).__name__, e)
+        await asyncio.sleep(interval)
+
+
+async def _run_cli(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        if args.command == 'run':
+            await ensure_archive_indexes(db)
+            count = await archive_inactive_users(db, args.days, args.dry_run)
+            verb = 'Would archive' if args.dry_run else 'Archived'
+            print(f"✅ {verb} {count} user(s) inactive for {args.days}+ days")
+        else:
+            user = await rehydrate_user(db, args.google_id)
+            if user is None:
+                print(f"❌ User not found: {args.google_id}")
+            else:
+                print(f"✅ User {args.google_id} is in the hot collection")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cold-user archival')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help='Archive inactive users')
+    run_parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='Inactivity threshold')
+    run_parser.add_argument('--dry-run', action='store_true', help='Count without archiving')
+    restore_parser = sub.add_parser('restore', help='Rehydrate one archived user')
+    restore_parser.add_argument('google_id')
+    asyncio.run(_run_cli(parser.parse_args()))
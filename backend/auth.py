@@ -2,12 +2,10 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from fastapi import HTTPException, Security
+from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 # Load environment variables
@@ -20,6 +18,9 @@ JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION_MINUTES = int(os.environ.get('JWT_EXPIRATION_MINUTES', 43200))  # 30 days default
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 
+# Google IDs allowed to use /api/admin endpoints (comma-separated)
+ADMIN_GOOGLE_IDS = {g.strip() for g in os.environ.get('ADMIN_GOOGLE_IDS', '').split(',') if g.strip()}
+
 security = HTTPBearer()
 
 
@@ -36,6 +37,11 @@ def verify_google_token(token: str) -> dict:
     Raises:
         HTTPException: If token is invalid
     """
+    # google-auth pulls in a large dependency tree; import it on first login
+    # instead of at startup to keep worker cold starts fast
+    from google.oauth2 import id_token
+    from google.auth.transport import requests as google_requests
+
     try:
         # Verify the token
         idinfo = id_token.verify_oauth2_token(
@@ -87,6 +93,28 @@ def create_jwt_token(user_data: dict) -> str:
     return token
 
 
+def decode_jwt_token(token: str) -> dict:
+    """
+    Decode and validate a JWT token
+    
+    Args:
+        token: Encoded JWT
+        
+    Returns:
+        Decoded token payload
+        
+    Raises:
+        JWTError: If token is invalid or expired
+        ValueError: If JWT_SECRET is not configured
+    """
+    if not JWT_SECRET:
+        raise ValueError("JWT_SECRET is not configured")
+    
+    # Ensure secret is a string (not bytes) for python-jose
+    secret_key = JWT_SECRET if isinstance(JWT_SECRET, str) else JWT_SECRET.decode('utf-8')
+    return jwt.decode(token, secret_key, algorithms=[JWT_ALGORITHM])
+
+
 def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """
     Verify JWT token from Authorization header
@@ -100,16 +128,10 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(securi
     Raises:
         HTTPException: If token is invalid or expired
     """
-    if not JWT_SECRET:
-        raise ValueError("JWT_SECRET is not configured")
-    
     token = credentials.credentials
     
     try:
-        # Ensure secret is a string (not bytes) for python-jose
-        secret_key = JWT_SECRET if isinstance(JWT_SECRET, str) else JWT_SECRET.decode('utf-8')
-        payload = jwt.decode(token, secret_key, algorithms=[JWT_ALGORITHM])
-        return payload
+        return decode_jwt_token(token)
     except JWTError as e:
         raise HTTPException(
             status_code=401,
@@ -129,3 +151,37 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Security(sec
     """
     payload = verify_jwt_token(credentials)
     return payload.get('google_id')
+
+
+def google_id_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """
+    Best-effort google_id from a raw Authorization header (for middleware)
+    
+    Args:
+        authorization: Header value, e.g. "Bearer <jwt>"
+        
+    Returns:
+        Google ID string, or None if the header is missing or the token invalid
+    """
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return decode_jwt_token(token).get('google_id')
+    except (JWTError, ValueError):
+        return None
+
+
+def get_admin_user_id(current_user_id: str = Depends(get_current_user_id)) -> str:
+    """
+    Require a JWT belonging to one of ADMIN_GOOGLE_IDS
+    
+    Returns:
+        Google ID string
+        
+    Raises:
+        HTTPException: 403 if the user isn't an admin
+    """
+    if current_user_id not in ADMIN_GOOGLE_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user_id
@@ -0,0 +1,78 @@
+# Request body size cap
+#
+# Rejects oversized request bodies with 413 before they are buffered or
+# parsed: a declared Content-Length over the limit is refused up front, and
+# chunked/undeclared bodies are counted as they stream in and cut off as soon
+# as they pass the limit.
+import os
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+MAX_REQUEST_BODY_BYTES = int(os.environ.get('MAX_REQUEST_BODY_BYTES', 1024 * 1024))
+
+
+class RequestBodyTooLarge(HTTPException):
+    """
+    Raised from receive() once the streamed body passes the limit
+
+    An HTTPException, so FastAPI re-raises it from body parsing and its
+    exception handler turns it into a 413 response.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+
+
+def _too_large_response(max_bytes: int) -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"Request body exceeds {max_bytes} bytes"},
+        status_code=413
+    )
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware capping request body size"""
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope['headers']).get(b'content-length')
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                response = JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)
+                return await response(scope, receive, send)
+            if declared > self.max_bytes:
+                return await _too_large_response(self.max_bytes)(scope, receive, send)
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise RequestBodyTooLarge(self.max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestBodyTooLarge:
+            if response_started:
+                raise
+            await _too_large_response(self.max_bytes)(scope, receive, send)
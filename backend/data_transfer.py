@@ -0,0 +1,316 @@
+# Streaming export/import of user data for backups and migrations
+#
+# Collections are written as gzip-compressed NDJSON (one MongoDB extended-JSON
+# document per line) next to a manifest with document counts and SHA-256
+# checksums. Both directions stream in fixed-size batches, so memory use stays
+# constant no matter how many users there are.
+#
+# Usage:
+#   python data_transfer.py export ./backup
+#   python data_transfer.py import ./backup [--mode upsert|insert] [--resume]
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Collections handled by default, with the natural key used for upserts
+COLLECTION_KEYS = {
+    'users': 'google_id',
+    'promo_codes': 'code',
+    # Single-use code batches (see promo_batches.py); each code document is
+    # keyed by the code itself and carries its claim state
+    'promo_batches': 'batch_id',
+    'promo_batch_codes': '_id',
+    # Compressed documents of archived users (see archive.py); without them a
+    # backup only holds their stubs
+    'users_archive': '_id',
+}
+
+MANIFEST_NAME = 'manifest.json'
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _data_path(directory: Path, collection: str) -> Path:
+    return directory / f"{collection}.ndjson.gz"
+
+
+def _checkpoint_path(directory: Path, collection: str) -> Path:
+    return directory / f"{collection}.checkpoint"
+
+
+def _get_db():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client, client[os.environ.get('DB_NAME', 'test_database')]
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+async def export_collection(db, collection: str, directory: Path, batch_size: int) -> dict:
+    """
+    Stream one collection to <collection>.ndjson.gz
+
+    Args:
+        db: Motor database
+        collection: Collection name
+        directory: Output directory
+        batch_size: Cursor batch size
+
+    Returns:
+        Manifest entry with document count and checksum
+    """
+    digest = hashlib.sha256()
+    count = 0
+    cursor = db[collection].find({}).sort('_id', 1).batch_size(batch_size)
+
+    with gzip.open(_data_path(directory, collection), 'wb', compresslevel=6) as out:
+        async for doc in cursor:
+            line = (json_util.dumps(doc, json_options=RELAXED_JSON_OPTIONS) + '\n').encode('utf-8')
+            out.write(line)
+            digest.update(line)
+            count += 1
+            if count % 100000 == 0:
+                print(f"  … {collection}: {count} documents")
+
+    return {'count': count, 'sha256': digest.hexdigest()}
+
+
+async def export_data(directory: Path, collections: list, batch_size: int):
+    """Export collections and write the manifest"""
+    client, db = _get_db()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    manifest = {
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+        'db_name': db.name,
+        'collections': {},
+    }
+    try:
+        for collection in collections:
+            print(f"📤 Exporting {collection}...")
+            manifest['collections'][collection] = await export_collection(db, collection, directory, batch_size)
+            print(f"✅ {collection}: {manifest['collections'][collection]['count']} documents")
+    finally:
+        client.close()
+
+    with open(directory / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+# ============================================================================
+# IMPORT
+# ============================================================================
+
+def verify_checksum(directory: Path, collection: str, expected: dict):
+    """
+    Stream the export file once and compare against the manifest
+
+    Raises:
+        ValueError: If the count or checksum doesn't match
+    """
+    digest = hashlib.sha256()
+    count = 0
+    with gzip.open(_data_path(directory, collection), 'rb') as f:
+        for line in f:
+            digest.update(line)
+            count += 1
+    if count != expected['count'] or digest.hexdigest() != expected['sha256']:
+        raise ValueError(
+            f"Checksum mismatch for {collection}: expected {expected['count']} docs / {expected['sha256']}, "
+            f"got {count} docs / {digest.hexdigest()}"
+        )
+
+
+def _read_checkpoint(directory: Path, collection: str) -> int:
+    path = _checkpoint_path(directory, collection)
+    return int(path.read_text().strip() or 0) if path.exists() else 0
+
+
+def _write_checkpoint(directory: Path, collection: str, lines_done: int):
+    path = _checkpoint_path(directory, collection)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(str(lines_done))
+    tmp.replace(path)
+
+
+def _build_ops(docs: list, key: str, mode: str) -> list:
+    if mode == 'insert':
+        return [InsertOne(doc) for doc in docs]
+    ops = []
+    for doc in docs:
+        if key == '_id':
+            # No natural key: the _id is the identity, so keep it
+            ops.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+            continue
+        # Target clusters have their own _id values; match on the natural key
+        doc.pop('_id', None)
+        ops.append(ReplaceOne({key: doc[key]}, doc, upsert=True))
+    return ops
+
+
+async def _write_batch(db, collection: str, ops: list):
+    try:
+        await db[collection].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate keys are expected when resuming an insert-mode import
+        errors = [err for err in e.details.get('writeErrors', []) if err.get('code') != DUPLICATE_KEY_ERROR]
+        if errors or e.details.get('writeConcernErrors'):
+            raise
+
+
+async def import_collection(
+    db,
+    collection: str,
+    directory: Path,
+    mode: str,
+    batch_size: int,
+    concurrency: int,
+    resume: bool,
+) -> int:
+    """
+    Stream <collection>.ndjson.gz into the database with parallel bulk writes
+
+    At most `concurrency` batches are in flight at once. The checkpoint only
+    advances past batches whose predecessors have all completed, so a resumed
+    import never skips unwritten documents (it may replay a few, which is
+    harmless for upserts and ignored for inserts).
+
+    Returns:
+        Number of documents written in this run
+    """
+    key = COLLECTION_KEYS.get(collection, '_id')
+    skip = _read_checkpoint(directory, collection) if resume else 0
+    if skip:
+        print(f"  ↪ Resuming {collection} after {skip} documents")
+
+    in_flight = {}
+    completed = {}
+    state = {'committed': skip}
+    batch_end = skip
+    written = 0
+
+    def advance(task: asyncio.Task):
+        end = in_flight.pop(task)
+        completed[end[0]] = end[1]
+        # Move the checkpoint forward over contiguous completed batches
+        while state['committed'] in completed:
+            state['committed'] = completed.pop(state['committed'])
+        _write_checkpoint(directory, collection, state['committed'])
+
+    async def submit(docs: list, start: int, end: int):
+        while len(in_flight) >= concurrency:
+            done, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+                advance(task)
+        task = asyncio.ensure_future(_write_batch(db, collection, _build_ops(docs, key, mode)))
+        in_flight[task] = (start, end)
+
+    with gzip.open(_data_path(directory, collection), 'rb') as f:
+        batch = []
+        for line_no, line in enumerate(f):
+            if line_no < skip:
+                continue
+            batch.append(json_util.loads(line))
+            if len(batch) >= batch_size:
+                start, batch_end = batch_end, line_no + 1
+                await submit(batch, start, batch_end)
+                written += len(batch)
+                batch = []
+        if batch:
+            start, batch_end = batch_end, batch_end + len(batch)
+            await submit(batch, start, batch_end)
+            written += len(batch)
+
+    while in_flight:
+        done, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+            advance(task)
+
+    return written
+
+
+async def import_data(
+    directory: Path,
+    collections: list,
+    mode: str,
+    batch_size: int,
+    concurrency: int,
+    resume: bool,
+    verify: bool,
+):
+    """Verify and import every collection listed in the manifest"""
+    with open(directory / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+
+    client, db = _get_db()
+    try:
+        for collection in collections:
+            expected = manifest['collections'].get(collection)
+            if expected is None:
+                print(f"⚠️  {collection} not in manifest, skipping")
+                continue
+            if verify:
+                print(f"🔍 Verifying {collection} checksum...")
+                verify_checksum(directory, collection, expected)
+            print(f"📥 Importing {collection} ({expected['count']} documents, mode={mode})...")
+            written = await import_collection(db, collection, directory, mode, batch_size, concurrency, resume)
+            print(f"✅ {collection}: {written} documents written")
+            _checkpoint_path(directory, collection).unlink(missing_ok=True)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export/import Ascend collections as compressed NDJSON')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = sub.add_parser('export', help='Export collections to a directory')
+    export_parser.add_argument('directory', type=Path)
+    export_parser.add_argument('--collections', nargs='+', default=list(COLLECTION_KEYS))
+    export_parser.add_argument('--batch-size', type=int, default=1000)
+
+    import_parser = sub.add_parser('import', help='Import collections from an export directory')
+    import_parser.add_argument('directory', type=Path)
+    import_parser.add_argument('--collections', nargs='+', default=list(COLLECTION_KEYS))
+    import_parser.add_argument('--mode', choices=['upsert', 'insert'], default='upsert',
+                               help='upsert on the natural key (default) or plain inserts into an empty cluster')
+    import_parser.add_argument('--batch-size', type=int, default=1000)
+    import_parser.add_argument('--concurrency', type=int, default=4, help='Bulk writes in flight at once')
+    import_parser.add_argument('--resume', action='store_true', help='Continue from the last checkpoint')
+    import_parser.add_argument('--skip-verify', action='store_true', help="Don't verify checksums first")
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        asyncio.run(export_data(args.directory, args.collections, args.batch_size))
+    else:
+        try:
+            asyncio.run(import_data(
+                args.directory, args.collections, args.mode, args.batch_size,
+                args.concurrency, args.resume, not args.skip_verify,
+            ))
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
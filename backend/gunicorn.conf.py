@@ -0,0 +1,95 @@
+# Production launcher configuration for Gunicorn + Uvicorn workers
+#
+# Start with:  gunicorn server:app -c gunicorn.conf.py
+#
+# Every setting can be overridden from the environment so the same file works
+# on any instance size. Send SIGHUP to the master for a graceful reload: new
+# workers are booted with fresh code before the old ones finish their
+# in-flight requests and exit.
+import math
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _cgroup_cpu_limit():
+    """CPU quota of the container (cgroup v2, then v1), or None if unlimited"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may actually use
+
+    cpu_count() reports the host's cores; containers (Render, Docker, k8s)
+    are limited by CPU affinity and/or a cgroup quota, so take the smaller.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on macOS
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+# Bind to the platform-provided port (Render sets PORT)
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# One async worker per available CPU uses the instance's whole allowance.
+# Each worker also runs its own background loops (health, rollups, archive,
+# analytics) and in-process caches, so don't overcommit. Real-time change
+# notifications only reach other workers through Redis (REALTIME_REDIS_URL);
+# see when_ready below.
+workers = _env_int('WEB_CONCURRENCY', available_cpus())
+
+# UvicornWorker picks uvloop + httptools automatically when installed
+# (they ship with uvicorn[standard])
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Graceful shutdown / reload
+graceful_timeout = _env_int('GRACEFUL_TIMEOUT', 30)
+timeout = _env_int('WORKER_TIMEOUT', 60)
+keepalive = _env_int('KEEPALIVE', 5)
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at the same moment
+max_requests = _env_int('MAX_REQUESTS', 10000)
+max_requests_jitter = _env_int('MAX_REQUESTS_JITTER', 1000)
+
+# The Motor client is created at import time and is not fork-safe, so each
+# worker imports the app itself unless explicitly told otherwise
+preload_app = os.environ.get('PRELOAD_APP', 'false').lower() == 'true'
+
+
+def when_ready(server):
+    if workers > 1 and not os.environ.get('REALTIME_REDIS_URL'):
+        server.log.warning(
+            "Running %s workers without REALTIME_REDIS_URL: devices connected to "
+            "different workers won't see each other's changes in real time",
+            workers
+        )
+
+accesslog = os.environ.get('ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -0,0 +1,178 @@
+# Background health probing
+#
+# A single task per worker pings MongoDB, checks connection pool pressure and
+# measures event-loop lag every HEALTH_PROBE_INTERVAL_SECONDS. The health
+# endpoints only read the cached result, so platform probes and uptime
+# monitors add no database load and never wait on it. Readiness flips only
+# after several consecutive failed probes (and back after a few good ones),
+# so one slow ping doesn't drain an instance.
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL_SECONDS = float(os.environ.get('HEALTH_PROBE_INTERVAL_SECONDS', 5))
+PING_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PING_TIMEOUT_SECONDS', 2))
+MAX_LOOP_LAG_MS = float(os.environ.get('HEALTH_MAX_LOOP_LAG_MS', 500))
+FAILURE_THRESHOLD = int(os.environ.get('HEALTH_FAILURE_THRESHOLD', 3))
+RECOVERY_THRESHOLD = int(os.environ.get('HEALTH_RECOVERY_THRESHOLD', 2))
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection checkouts per pool (pass in the client's event_listeners)
+
+    A client keeps one pool per server address, each capped at maxPoolSize,
+    so pressure is counted per address. PyMongo calls these from its own
+    threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools: Dict[Tuple[str, int], Dict[str, int]] = {}
+        self.checkout_failures = 0
+
+    def _add(self, address, in_use: int = 0, waiting: int = 0, failures: int = 0) -> None:
+        with self._lock:
+            pool = self.pools.setdefault(address, {'in_use': 0, 'waiting': 0})
+            pool['in_use'] += in_use
+            pool['waiting'] += waiting
+            self.checkout_failures += failures
+
+    def connection_check_out_started(self, event):
+        self._add(event.address, waiting=1)
+
+    def connection_checked_out(self, event):
+        self._add(event.address, in_use=1, waiting=-1)
+
+    def connection_check_out_failed(self, event):
+        self._add(event.address, waiting=-1, failures=1)
+
+    def connection_checked_in(self, event):
+        self._add(event.address, in_use=-1)
+
+    def exhausted(self, max_pool_size: int) -> List[str]:
+        """Addresses whose pool is fully checked out with requests queued behind it"""
+        with self._lock:
+            return [
+                _format_address(address) for address, pool in self.pools.items()
+                if pool['in_use'] >= max_pool_size and pool['waiting'] > 0
+            ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = {_format_address(address): dict(pool) for address, pool in self.pools.items()}
+            return {
+                'in_use': sum(pool['in_use'] for pool in pools.values()),
+                'waiting': sum(pool['waiting'] for pool in pools.values()),
+                'checkout_failures': self.checkout_failures,
+                'pools': pools,
+            }
+
+    def _ignore(self, event):
+        pass
+
+    # Pool and connection lifecycle events aren't needed
+    pool_created = pool_ready = pool_cleared = pool_closed = _ignore
+    connection_created = connection_ready = connection_closed = _ignore
+
+
+def _format_address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class HealthMonitor:
+    """Probes dependencies in the background and caches the verdict"""
+
+    def __init__(
+        self,
+        get_db: Callable,
+        pool_stats: Optional[PoolStats] = None,
+        max_pool_size: Optional[int] = None,
+        interval: float = PROBE_INTERVAL_SECONDS,
+    ):
+        self.get_db = get_db
+        self.pool_stats = pool_stats
+        self.max_pool_size = max_pool_size
+        self.interval = interval
+        self.ready = False
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_probe_at: Optional[float] = None
+        self.state: Dict[str, Any] = {'status': 'starting'}
+
+    async def probe(self, loop_lag_ms: float = 0.0) -> Dict[str, Any]:
+        """Run one probe and update readiness"""
+        problems = []
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.get_db().command('ping'), timeout=PING_TIMEOUT_SECONDS)
+            database = 'connected'
+        except Exception as e:
+            database = 'unreachable'
+            problems.append(f"database: {type(e).__name__}")
+        ping_ms = (time.perf_counter() - started) * 1000
+
+        if loop_lag_ms > MAX_LOOP_LAG_MS:
+            problems.append(f"event loop lag {loop_lag_ms:.0f}ms")
+
+        pool = self.pool_stats.snapshot() if self.pool_stats else None
+        if self.pool_stats and self.max_pool_size:
+            exhausted = self.pool_stats.exhausted(self.max_pool_size)
+            if exhausted:
+                problems.append(f"connection pool exhausted: {', '.join(exhausted)}")
+
+        if problems:
+            self.consecutive_failures += 1
+            self.consecutive_successes = 0
+            if self.ready and self.consecutive_failures >= FAILURE_THRESHOLD:
+                self.ready = False
+                logger.error("🔴 [Health] Not ready: %s", ', '.join(problems))
+        else:
+            self.consecutive_successes += 1
+            self.consecutive_failures = 0
+            if not self.ready and (self.last_probe_at is None or self.consecutive_successes >= RECOVERY_THRESHOLD):
+                self.ready = True
+                logger.info("🟢 [Health] Ready")
+
+        self.last_probe_at = time.monotonic()
+        self.state = {
+            'status': 'healthy' if self.ready and not problems else ('degraded' if self.ready else 'unhealthy'),
+            'database': database,
+            'ping_ms': round(ping_ms, 1),
+            'loop_lag_ms': round(loop_lag_ms, 1),
+            'pool': pool,
+            'problems': problems,
+            'consecutive_failures': self.consecutive_failures,
+        }
+        return self.state
+
+    async def run(self) -> None:
+        """Background task; lag is how late the loop wakes from each sleep"""
+        await self.probe()
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.monotonic() - started - self.interval) * 1000)
+            try:
+                await self.probe(lag_ms)
+            except Exception as e:
+                logger.error("Health probe failed: %s: %s", type(e).__name__, e)
+
+    def is_live(self) -> bool:
+        """False if probing has stalled (the prober died or the loop is wedged)"""
+        if self.last_probe_at is None:
+            return True
+        return time.monotonic() - self.last_probe_at < 3 * self.interval + PING_TIMEOUT_SECONDS
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = None if self.last_probe_at is None else round(time.monotonic() - self.last_probe_at, 1)
+        return {'ok': self.ready, 'ready': self.ready, 'last_probe_age_seconds': age, **self.state}
@@ -0,0 +1,206 @@
+# Idempotency-Key support for mutating endpoints
+#
+# A POST/PUT/PATCH/DELETE carrying an `Idempotency-Key` header is executed at
+# most once per (user, key). The first response is stored in a TTL-indexed
+# collection (fronted by a small in-process LRU), and retries get that stored
+# response back without the handler running again. Each record keeps a
+# SHA-256 of the request body, and reusing a key with a different body is
+# rejected with 422 instead of replaying an unrelated response.
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from pymongo.errors import DuplicateKeyError
+from starlette.responses import JSONResponse, Response
+
+from auth import google_id_from_authorization
+from user_cache import LocalCacheBackend
+
+MUTATING_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+MAX_KEY_LENGTH = 255
+
+# Stored records expire after this long (TTL index on created_at)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+
+# A claim still in progress after this long is assumed abandoned (crashed worker)
+IN_PROGRESS_TIMEOUT = timedelta(seconds=60)
+
+# Responses larger than this aren't stored (the request still runs normally)
+MAX_STORED_BODY_BYTES = 64 * 1024
+
+
+async def ensure_idempotency_indexes(collection) -> None:
+    """TTL index so stored responses clean themselves up"""
+    await collection.create_index('created_at', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying stored responses for repeated Idempotency-Keys
+
+    Requests without the header, non-mutating methods and unauthenticated
+    requests pass straight through with no extra work.
+    """
+
+    def __init__(
+        self,
+        app,
+        get_collection: Callable,
+        cache_size: int = 10000,
+        cache_ttl: float = 300,
+    ):
+        self.app = app
+        self.get_collection = get_collection
+        self.cache = LocalCacheBackend(max_size=cache_size)
+        self.cache_ttl = cache_ttl
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in MUTATING_METHODS:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        raw_key = headers.get(b'idempotency-key')
+        if not raw_key:
+            return await self.app(scope, receive, send)
+
+        key = raw_key.decode('latin-1')
+        if len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)
+            return await response(scope, receive, send)
+
+        google_id = google_id_from_authorization(headers.get(b'authorization', b'').decode('latin-1'))
+        if google_id is None:
+            # Let the endpoint reject the request as usual
+            return await self.app(scope, receive, send)
+
+        # Buffer the body to fingerprint it (the body size limit applies as it streams in)
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        body_hash = hashlib.sha256(body).hexdigest()
+        receive = self._replay_receive(body, receive)
+
+        record_id = f"{google_id}:{key}"
+        request_path = f"{scope['method']} {scope['path']}"
+        collection = self.get_collection()
+
+        record = await self.cache.get(record_id)
+        if record is None:
+            record = await collection.find_one({'_id': record_id})
+        if record is not None and self._is_abandoned(record):
+            await collection.delete_one({'_id': record_id, 'state': 'in_progress'})
+            record = None
+        if record is not None:
+            response = self._replay(record, request_path, body_hash)
+            return await response(scope, receive, send)
+
+        # Claim the key; a concurrent duplicate loses the insert race
+        try:
+            await collection.insert_one({
+                '_id': record_id,
+                'request': request_path,
+                'body_hash': body_hash,
+                'state': 'in_progress',
+                'created_at': datetime.now(timezone.utc),
+            })
+        except DuplicateKeyError:
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is already in progress"},
+                status_code=409
+            )
+            return await response(scope, receive, send)
+
+        captured = {'status': 500, 'content_type': None, 'body': bytearray(), 'too_large': False}
+
+        async def capture_send(message):
+            if message['type'] == 'http.response.start':
+                captured['status'] = message['status']
+                for name, value in message.get('headers', []):
+                    if name.lower() == b'content-type':
+                        captured['content_type'] = value.decode('latin-1')
+            elif message['type'] == 'http.response.body' and not captured['too_large']:
+                captured['body'].extend(message.get('body', b''))
+                if len(captured['body']) > MAX_STORED_BODY_BYTES:
+                    captured['too_large'] = True
+                    captured['body'] = bytearray()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture_send)
+        except Exception:
+            await collection.delete_one({'_id': record_id})
+            raise
+
+        if captured['status'] >= 500 or captured['too_large']:
+            # Server errors are retryable; release the key
+            await collection.delete_one({'_id': record_id})
+            return
+
+        stored = {
+            'request': request_path,
+            'body_hash': body_hash,
+            'state': 'completed',
+            'status_code': captured['status'],
+            'content_type': captured['content_type'],
+            'body': bytes(captured['body']),
+        }
+        await collection.update_one({'_id': record_id}, {'$set': stored})
+        await self.cache.set(record_id, stored, self.cache_ttl)
+
+    @staticmethod
+    async def _read_body(receive):
+        """The whole request body, or None if the client disconnected first"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.extend(message.get('body', b''))
+            if not message.get('more_body', False):
+                return bytes(body)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive):
+        """receive() handing the buffered body to the app, then deferring to the client"""
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    def _is_abandoned(record: dict) -> bool:
+        if record.get('state') != 'in_progress':
+            return False
+        created_at = record.get('created_at')
+        if created_at is None:
+            return True
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - created_at > IN_PROGRESS_TIMEOUT
+
+    @staticmethod
+    def _replay(record: dict, request_path: str, body_hash: str) -> Response:
+        # Records stored before body hashing only compare the request path
+        if record.get('request') != request_path or record.get('body_hash', body_hash) != body_hash:
+            return JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status_code=422
+            )
+        if record.get('state') != 'completed':
+            return JSONResponse(
+                {"detail": "A request with this Idempotency-Key is already in progress"},
+                status_code=409
+            )
+        return Response(
+            content=record['body'],
+            status_code=record['status_code'],
+            media_type=record.get('content_type'),
+            headers={'Idempotent-Replayed': 'true'},
+        )
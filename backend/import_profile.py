@@ -0,0 +1,66 @@
+# Import-time profile report for the API server
+#
+# Runs `python -X importtime -c "import server"` in a fresh interpreter and
+# prints the slowest modules, so cold-start regressions are easy to spot.
+#
+# Usage:  python import_profile.py [--top 25] [--module server]
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+
+def profile_imports(module: str = 'server') -> list:
+    """
+    Import a module in a clean interpreter and collect -X importtime output
+
+    Args:
+        module: Module to import (default: server)
+
+    Returns:
+        List of (self_us, cumulative_us, module_name) tuples
+    """
+    env = dict(os.environ)
+    # server.py reads MONGO_URL at import; Motor does not connect until first use
+    env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        # The import itself failed; surface the traceback rather than a report
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(proc.returncode)
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report import-time cost of the API server')
+    parser.add_argument('--module', default='server', help='Module to import')
+    parser.add_argument('--top', type=int, default=25, help='Number of rows to show')
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    total_us = max((cumulative for _, cumulative, name in rows if name.strip() == args.module), default=0)
+
+    print(f"⏱️  Import of '{args.module}' took {total_us / 1000:.1f} ms ({len(rows)} modules)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
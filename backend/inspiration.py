@@ -0,0 +1,219 @@
+# Quest inspiration catalogue
+#
+# The suggestions live in inspiration_catalogue.json, each with a permanent
+# integer ID. IDs are never renumbered or reused: append new suggestions with
+# the next ID and retire old ones with "retired": true. At import the
+# catalogue is indexed into per-quest-type ID arrays, a lowercase text -> ID
+# map and ready-made catalogue responses, so requests never parse or scan it.
+#
+# Which suggestions a user has already used is stored on the user document as
+# a little-endian bitmap (bit N set = suggestion N used) in
+# `used_inspiration_bitmap`: 16 bytes for the current catalogue, however many
+# quests the user creates. Sampling draws random positions from the type's ID
+# array and rejects used ones, only falling back to enumerating the unused IDs
+# when most of the type has been used.
+import json
+import logging
+import random
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from pymongo import ReturnDocument
+
+from archive import HOT_USER, rehydrate_user
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_PATH = Path(__file__).parent / 'inspiration_catalogue.json'
+
+BITMAP_FIELD = 'used_inspiration_bitmap'
+# Older clients stored used suggestions as a list of lowercase strings; it is
+# folded into the bitmap (and removed) on the user's next mark
+LEGACY_FIELD = 'used_inspiration_suggestions'
+
+QUEST_TYPES = ('mainQuest', 'dailyQuest', 'weeklyQuest', 'sideQuest')
+
+MAX_SAMPLE_COUNT = 20
+# Random draws per requested suggestion before enumerating the unused IDs
+REJECTION_ATTEMPTS_PER_PICK = 4
+# Compare-and-swap retries when concurrent marks race on the bitmap
+MAX_MARK_ATTEMPTS = 5
+
+
+def _load_catalogue(path: Path):
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)['suggestions']
+
+    size = max((entry['id'] for entry in entries), default=-1) + 1
+    suggestions: List[Optional[Dict[str, Any]]] = [None] * size
+    ids_by_type: Dict[str, array] = {quest_type: array('H') for quest_type in QUEST_TYPES}
+    id_by_text: Dict[str, int] = {}
+    categories: Dict[str, Dict[str, List[Dict[str, Any]]]] = {quest_type: {} for quest_type in QUEST_TYPES}
+
+    for entry in entries:
+        suggestion_id = entry['id']
+        if suggestions[suggestion_id] is not None:
+            raise ValueError(f"Duplicate inspiration suggestion ID {suggestion_id}")
+        suggestions[suggestion_id] = entry
+        # Retired IDs still resolve (old quests may carry their text) but are never offered
+        id_by_text.setdefault(entry['text'].lower(), suggestion_id)
+        if entry.get('retired'):
+            continue
+        ids_by_type[entry['type']].append(suggestion_id)
+        categories[entry['type']].setdefault(entry['category'], []).append(
+            {'id': suggestion_id, 'text': entry['text']}
+        )
+
+    catalogues = {
+        quest_type: [{'name': name, 'suggestions': items} for name, items in by_category.items()]
+        for quest_type, by_category in categories.items()
+    }
+    return suggestions, ids_by_type, id_by_text, catalogues
+
+
+SUGGESTIONS, IDS_BY_TYPE, ID_BY_TEXT, CATALOGUES = _load_catalogue(CATALOGUE_PATH)
+
+
+def suggestion_id_for_text(text: str) -> Optional[int]:
+    """ID of the suggestion with this text (case-insensitive), if it is one"""
+    return ID_BY_TEXT.get(text.strip().lower())
+
+
+def used_bits(user: Dict[str, Any]) -> int:
+    """
+    Used suggestions of a user document as an int bitmask
+
+    Includes any legacy string list not yet folded into the bitmap.
+    """
+    bits = int.from_bytes(user.get(BITMAP_FIELD) or b'', 'little')
+    for text in user.get(LEGACY_FIELD) or []:
+        suggestion_id = suggestion_id_for_text(text)
+        if suggestion_id is not None:
+            bits |= 1 << suggestion_id
+    return bits
+
+
+def bits_to_bitmap(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def catalogue_with_used(quest_type: str, bits: int) -> List[Dict[str, Any]]:
+    """A type's catalogue grouped by category, flagging the user's used suggestions"""
+    return [
+        {
+            'name': category['name'],
+            'suggestions': [
+                {**item, 'used': bool(bits >> item['id'] & 1)} for item in category['suggestions']
+            ]
+        }
+        for category in CATALOGUES[quest_type]
+    ]
+
+
+def sample_unused(quest_type: str, bits: int, count: int, rng: random.Random = random) -> List[int]:
+    """
+    Pick up to `count` distinct random suggestions the user hasn't used
+
+    Args:
+        quest_type: One of QUEST_TYPES
+        bits: The user's used-suggestion bitmask
+        count: How many suggestions to return
+        rng: Random source (seedable for tests and scripts)
+
+    Returns:
+        Suggestion IDs; fewer than `count` once the type is nearly exhausted
+    """
+    ids = IDS_BY_TYPE[quest_type]
+    picked: List[int] = []
+    if not ids:
+        return picked
+    seen = 0
+    for _ in range(count * REJECTION_ATTEMPTS_PER_PICK):
+        if len(picked) == count:
+            return picked
+        suggestion_id = ids[rng.randrange(len(ids))]
+        mask = 1 << suggestion_id
+        if not (bits | seen) & mask:
+            picked.append(suggestion_id)
+            seen |= mask
+    if len(picked) == count:
+        return picked
+
+    # Mostly used up: draw the rest from the (short) list of what's left
+    remaining = [suggestion_id for suggestion_id in ids if not (bits | seen) >> suggestion_id & 1]
+    return picked + rng.sample(remaining, min(count - len(picked), len(remaining)))
+
+
+def unused_count(quest_type: str, bits: int) -> int:
+    return sum(1 for suggestion_id in IDS_BY_TYPE[quest_type] if not bits >> suggestion_id & 1)
+
+
+def describe(suggestion_id: int) -> Dict[str, Any]:
+    entry = SUGGESTIONS[suggestion_id]
+    return {'id': suggestion_id, 'text': entry['text'], 'category': entry['category']}
+
+
+async def load_used_bits(db, google_id: str) -> Optional[int]:
+    """The user's used-suggestion bitmask (None if the user doesn't exist)"""
+    user = await db.users.find_one(
+        {'google_id': google_id},
+        {'_id': 0, BITMAP_FIELD: 1, LEGACY_FIELD: 1, 'archived': 1}
+    )
+    if user is not None and user.get('archived'):
+        user = await rehydrate_user(db, google_id)
+    return None if user is None else used_bits(user)
+
+
+async def mark_used(db, google_id: str, suggestion_ids: Iterable[int]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Set the given suggestions' bits in the user's bitmap
+
+    The write is a compare-and-swap on the stored bitmap, so concurrent marks
+    from several devices never lose each other's bits.
+
+    Returns:
+        (user, changed): the user's `version` after the call (None if the user
+        doesn't exist) and whether anything was written
+    """
+    mask = 0
+    for suggestion_id in suggestion_ids:
+        mask |= 1 << suggestion_id
+
+    for _ in range(MAX_MARK_ATTEMPTS):
+        user = await db.users.find_one(
+            {'google_id': google_id},
+            {'_id': 0, BITMAP_FIELD: 1, LEGACY_FIELD: 1, 'version': 1, 'archived': 1}
+        )
+        if user is not None and user.get('archived'):
+            # Bits set on a stub would overwrite the archived bitmap on rehydration
+            user = await rehydrate_user(db, google_id)
+        if user is None:
+            return None, False
+
+        current = used_bits(user)
+        updated = current | mask
+        if updated == current and LEGACY_FIELD not in user:
+            return user, False
+
+        stored = user.get(BITMAP_FIELD)
+        before = await db.users.find_one_and_update(
+            {'google_id': google_id, BITMAP_FIELD: stored if stored is not None else {'$exists': False}, **HOT_USER},
+            {
+                '$set': {
+                    BITMAP_FIELD: bson.Binary(bits_to_bitmap(updated)),
+                    'updated_at': datetime.now(timezone.utc).isoformat()
+                },
+                '$unset': {LEGACY_FIELD: ''},
+                '$inc': {'version': 1}
+            },
+            projection={'_id': 0, 'version': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is not None:
+            return {'version': before.get('version', 0) + 1}, True
+
+    logger.warning("Marking inspiration suggestions for %s kept conflicting; giving up", google_id)
+    return user, False
@@ -0,0 +1,195 @@
+# Asynchronous structured logging
+#
+# Request handlers only put records on an in-memory queue; a QueueListener
+# thread does the JSON formatting, redaction and writing to stderr, so log
+# I/O stays out of request latency. Each record carries the request ID of the
+# request that produced it, high-volume info events can be sampled, and
+# tokens/emails never reach the output.
+#
+# Environment:
+#   LOG_LEVEL=INFO                                   root level
+#   LOG_LEVELS=server=WARNING,uvicorn.access=WARNING  per-module levels
+#   LOG_SAMPLE_RATE=0.1                              fraction of sampled INFO events kept
+#   LOG_FORMAT=json|text                             text is easier to read locally
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
+# Pass as `extra=SAMPLED` on high-volume info events (e.g. every autosave)
+SAMPLED = {'sampled': True}
+
+MAX_QUEUE_SIZE = 10000
+MAX_REQUEST_ID_LENGTH = 64
+
+_REDACTIONS = [
+    # JWTs (ours and Google ID tokens)
+    (re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]*'), '[token]'),
+    (re.compile(r'(?i)(bearer\s+)\S+'), r'\1[token]'),
+    (re.compile(r'(?i)([?&](?:token|access_token|id_token)=)[^&\s"]+'), r'\1[token]'),
+    # Keep the first character and the domain of emails
+    (re.compile(r'\b([\w.+-])[\w.+-]*@([\w-]+\.[\w.-]+)\b'), r'\1***@\2'),
+]
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse 'module=LEVEL,other=LEVEL' into a dict"""
+    levels = {}
+    for part in spec.split(','):
+        name, _, level = part.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs on the request side: stamps the request ID and drops sampled events
+
+    Records marked `sampled` at INFO or below are kept with probability
+    `sample_rate`; warnings and errors are always kept.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'sampled', False) and record.levelno <= logging.INFO:
+            if random.random() >= self.sample_rate:
+                return False
+            record.sample_rate = self.sample_rate
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line; runs on the listener thread
+
+    QueueHandler has already merged args and any traceback into the message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact(record.getMessage()),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        if getattr(record, 'sample_rate', None) is not None:
+            entry['sample_rate'] = record.sample_rate
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RedactingTextFormatter(logging.Formatter):
+    """Human-readable format for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, 'request_id'):
+            record.request_id = None
+        return redact(super().format(record))
+
+
+def configure_logging() -> QueueListener:
+    """
+    Route all logging through a queue to a background writer thread
+
+    Replaces existing root handlers (e.g. from basicConfig) and sends uvicorn's
+    loggers through the same pipeline. Call `.stop()` on the returned listener
+    at shutdown to flush.
+    """
+    log_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(float(os.environ.get('LOG_SAMPLE_RATE', 0.1))))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMAT', 'json') == 'text':
+        stream_handler.setFormatter(RedactingTextFormatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        ))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    # Re-route uvicorn's loggers; ones left without handlers (e.g. the access
+    # log when gunicorn's ACCESS_LOG is unset) stay disabled
+    for name in ('uvicorn', 'uvicorn.error', 'uvicorn.access'):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers = []
+            uvicorn_logger.propagate = True
+
+    for name, level in parse_levels(os.environ.get('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware assigning each request an ID (or reusing X-Request-ID)
+
+    The ID is available to every log record emitted while handling the
+    request and is echoed back in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope['headers']).get(b'x-request-id', b'').decode('latin-1')
+        request_id = incoming if 0 < len(incoming) <= MAX_REQUEST_ID_LENGTH else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'x-request-id', request_id.encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,17 @@
+# Server-side mini-game catalogue and cooldown rules
+#
+# Keep in sync with frontend/src/components/MiniGames.js (miniGamesData).
+# `stat` is the key used in the user's miniGamesPlayed counters, matching the
+# achievement conditions in achievements.py.
+from datetime import timedelta
+from typing import Any, Dict
+
+MINI_GAMES: Dict[str, Dict[str, Any]] = {
+    'dice': {'reward': 5, 'stat': 'dice'},
+    'focus-hunt': {'reward': 5, 'stat': 'focusHunt'},
+    'race-clock': {'reward': 5, 'stat': 'raceClock'},
+    'boss-battle': {'reward': 10, 'stat': 'bossBattle'},
+}
+
+# One cooldown shared by all mini-games
+MINI_GAME_COOLDOWN = timedelta(minutes=30)
@@ -1,9 +1,126 @@
 # Pydantic models for API request/response
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import Optional, Dict, List, Any
+from pydantic import (
+    BaseModel, BeforeValidator, Field, EmailStr, ConfigDict, StringConstraints, TypeAdapter,
+    model_serializer, model_validator
+)
+from typing import Optional, Dict, List, Any, Union, Literal
+from typing_extensions import Annotated
 from datetime import datetime
 import uuid
 
+# Size bounds for client-supplied game state; every list, string and
+# free-form field is capped so validation cost per request is bounded
+MAX_EXTRA_FIELDS = 8
+Text = Annotated[str, StringConstraints(max_length=500)]
+ShortText = Annotated[str, StringConstraints(max_length=100)]
+Timestamp = Annotated[str, StringConstraints(max_length=40)]  # ISO 8601
+ExtraValue = Union[None, bool, int, float, ShortText]
+
+# Lists the client only appends to. Long-time users outgrow any fixed cap, so
+# updates keep the newest entries instead of rejecting the whole autosave.
+MAX_INVENTORY_ITEMS = 500
+MAX_USED_PROMO_CODES = 500
+MAX_MAIN_QUEST_HISTORY = 500
+
+
+def keep_newest(limit: int) -> BeforeValidator:
+    """Trim a list to its last `limit` items before they are validated"""
+    return BeforeValidator(lambda value: value[-limit:] if isinstance(value, list) else value)
+
+
+class BoundedModel(BaseModel):
+    """
+    Typed model that tolerates a few extra scalar fields
+
+    The client adds ad-hoc fields to its state objects over time, so unknown
+    keys are kept (not silently dropped) but limited in number and to short
+    scalar values. Only fields the client actually sent are serialized back.
+    """
+    model_config = ConfigDict(extra="allow")
+    
+    @model_validator(mode="after")
+    def _bound_extra_fields(self):
+        extra = self.model_extra or {}
+        if len(extra) > MAX_EXTRA_FIELDS:
+            raise ValueError(f"at most {MAX_EXTRA_FIELDS} unknown fields are allowed")
+        _extra_value_adapter.validate_python(extra)
+        return self
+    
+    @model_serializer(mode="wrap")
+    def _serialize_set_fields(self, handler):
+        data = handler(self)
+        extra = self.model_extra or {}
+        return {k: v for k, v in data.items() if k in self.model_fields_set or k in extra}
+
+
+_extra_value_adapter = TypeAdapter(Dict[str, ExtraValue])
+
+
+class Objective(BoundedModel):
+    """Main quest objective"""
+    text: Text = ""
+    completed: bool = False
+
+
+class Quest(BoundedModel):
+    """Daily, weekly, side or main quest (fields depend on the quest type)"""
+    id: Optional[ShortText] = None
+    text: Optional[Text] = None
+    title: Optional[Text] = None
+    xp: Optional[int] = None
+    completed: Optional[bool] = None
+    completedAt: Optional[Timestamp] = None
+    # Daily quest XP bookkeeping (for undo)
+    baseXP: Optional[float] = None
+    totalXP: Optional[float] = None
+    multiplierApplied: Optional[float] = None
+    streak: Optional[int] = None
+    # Weekly quests
+    target: Optional[int] = None
+    current: Optional[int] = None
+    xpPerIncrement: Optional[int] = None
+    lastProgressAt: Optional[Timestamp] = None
+    # Main quests
+    objectives: Optional[List[Objective]] = Field(default=None, max_length=20)
+
+
+class HistoryEntry(Quest):
+    """Completed main quest"""
+    xpEarned: Optional[int] = None
+    status: Optional[ShortText] = None
+
+
+class InventoryItem(BoundedModel):
+    """Inventory entry (store purchase, promo reward or milestone reward)"""
+    id: Optional[ShortText] = None
+    name: Optional[ShortText] = None
+    icon: Optional[ShortText] = None
+    description: Optional[Text] = None
+    canUse: Optional[bool] = None
+    count: Optional[int] = None  # legacy dict-inventory migration
+
+
+class Effect(BoundedModel):
+    """Active effect (XP multiplier, streak freeze)"""
+    type: Optional[ShortText] = None
+    name: Optional[ShortText] = None
+    icon: Optional[ShortText] = None
+    active: Optional[bool] = None
+    multiplier: Optional[float] = None
+    usesLeft: Optional[int] = None
+    expiresAt: Optional[Timestamp] = None
+    timeRemaining: Optional[ShortText] = None
+
+
+class QuestStreak(BoundedModel):
+    """Per-quest streak record (keyed by quest ID)"""
+    questId: Optional[ShortText] = None
+    questText: Optional[Text] = None
+    streak: int = 0
+    lastCompleted: Optional[Timestamp] = None
+    milestones: List[int] = Field(default_factory=list, max_length=50)
+    totalCompletions: int = 0
+
 
 class GoogleAuthRequest(BaseModel):
     """Request model for Google OAuth login"""
@@ -18,6 +135,19 @@ class UserQuests(BaseModel):
     side: List[Dict[str, Any]] = Field(default_factory=list)
 
 
+class UserQuestsUpdate(BaseModel):
+    """
+    Quest data sent by the client (bounded)
+
+    Only incoming updates are bounded: stored documents are returned as they
+    are, whatever older clients or limits wrote into them.
+    """
+    daily: List[Quest] = Field(default_factory=list, max_length=50)
+    weekly: List[Quest] = Field(default_factory=list, max_length=50)
+    main: Optional[Quest] = None
+    side: List[Quest] = Field(default_factory=list, max_length=100)
+
+
 class UserData(BaseModel):
     """Complete user data model"""
     model_config = ConfigDict(extra="ignore")
@@ -43,11 +173,11 @@ class UserData(BaseModel):
     # Inventory & Effects
     inventory: List[Dict[str, Any]] = Field(default_factory=list)
     active_effects: List[Dict[str, Any]] = Field(default_factory=list)
+    unlocked_avatars: List[str] = Field(default_factory=list)
     
     # Settings & Metadata
     settings: Dict[str, Any] = Field(default_factory=dict)
     used_promo_codes: List[str] = Field(default_factory=list)
-    used_inspiration_suggestions: List[str] = Field(default_factory=list)
     
     # Quest creation limits
     daily_quest_creation_count: int = 0
@@ -61,7 +191,10 @@ class UserData(BaseModel):
     
     # History
     main_quest_history: List[Dict[str, Any]] = Field(default_factory=list)
-    achievements: List[Dict[str, Any]] = Field(default_factory=list)
+    achievements: List[Union[str, Dict[str, Any]]] = Field(default_factory=list)  # achievement IDs
+    
+    # Incremented on every server-side write (matches real-time change notifications)
+    version: int = 0
     
     # Timestamps
     created_at: datetime = Field(default_factory=lambda: datetime.now())
@@ -73,22 +206,110 @@ class UserUpdateRequest(BaseModel):
     xp: Optional[int] = None
     level: Optional[int] = None
     coins: Optional[int] = None
-    quests: Optional[Dict[str, Any]] = None
-    streaks: Optional[Dict[str, Any]] = None
-    quest_streaks: Optional[Dict[str, Any]] = None
-    inventory: Optional[List[Dict[str, Any]]] = None
-    active_effects: Optional[List[Dict[str, Any]]] = None
-    settings: Optional[Dict[str, Any]] = None
-    used_promo_codes: Optional[List[str]] = None
-    used_inspiration_suggestions: Optional[List[str]] = None
+    quests: Optional[UserQuestsUpdate] = None
+    streaks: Optional[Dict[ShortText, Optional[int]]] = Field(default=None, max_length=16)
+    quest_streaks: Optional[Dict[ShortText, QuestStreak]] = Field(default=None, max_length=500)
+    inventory: Optional[Annotated[List[InventoryItem], keep_newest(MAX_INVENTORY_ITEMS)]] = None
+    active_effects: Optional[List[Effect]] = Field(default=None, max_length=20)
+    settings: Optional[Dict[ShortText, ExtraValue]] = Field(default=None, max_length=32)
+    # merged with $addToSet, never replaced
+    used_promo_codes: Optional[Annotated[List[ShortText], keep_newest(MAX_USED_PROMO_CODES)]] = None
+    # Deprecated: sent by older clients, folded into the inspiration bitmap
+    used_inspiration_suggestions: Optional[List[Text]] = Field(default=None, max_length=2000)
     daily_quest_creation_count: Optional[int] = None
-    daily_quest_creation_date: Optional[str] = None
+    daily_quest_creation_date: Optional[Timestamp] = None
     weekly_quest_creation_count: Optional[int] = None
-    weekly_quest_creation_date: Optional[str] = None
-    main_quest_cooldown: Optional[str] = None
-    daily_check_in_date: Optional[str] = None
-    main_quest_history: Optional[List[Dict[str, Any]]] = None
-    achievements: Optional[List[Dict[str, Any]]] = None
+    weekly_quest_creation_date: Optional[Timestamp] = None
+    main_quest_cooldown: Optional[Timestamp] = None
+    daily_check_in_date: Optional[Timestamp] = None
+    main_quest_history: Optional[Annotated[List[HistoryEntry], keep_newest(MAX_MAIN_QUEST_HISTORY)]] = None
+    # merged with $addToSet, never replaced
+    achievements: Optional[List[Union[ShortText, Dict[ShortText, ExtraValue]]]] = Field(default=None, max_length=200)
+
+
+class StatsIncrementRequest(BaseModel):
+    """Request model for incrementing lifetime stat counters"""
+    # e.g. {"totalQuestsCompleted": 1, "miniGamesPlayed.dice": 1}
+    increments: Dict[str, int]
+
+
+class StatsIncrementResponse(BaseModel):
+    """Response model for stat increments"""
+    success: bool
+    unlocked_achievements: List[str] = Field(default_factory=list)
+
+
+class StorePurchaseRequest(BaseModel):
+    """Request model for buying a store item or avatar"""
+    item_id: str
+    kind: Literal['item', 'avatar'] = 'item'
+    # Retries with the same key are applied at most once
+    idempotency_key: Optional[str] = Field(default=None, max_length=64)
+
+
+class StorePurchaseResponse(BaseModel):
+    """Response model for store purchases"""
+    success: bool
+    message: str
+    coins: Optional[int] = None
+    item: Optional[Dict[str, Any]] = None
+    unlocked_achievements: List[str] = Field(default_factory=list)
+
+
+class StoreUseRequest(BaseModel):
+    """Request model for using up an inventory item"""
+    item_id: str = Field(max_length=64)
+
+
+class StoreUseResponse(BaseModel):
+    """Response model for using an inventory item"""
+    success: bool
+    message: str
+
+
+class ActivityEvent(BaseModel):
+    """A single activity event (see activity.py)"""
+    type: Literal['xp', 'coins', 'quest_completed', 'streak_change', 'minigame_played']
+    # Client-generated, so a batch that is sent again isn't counted twice
+    event_id: Optional[str] = Field(default=None, max_length=64)
+    amount: int = Field(default=0, ge=-100_000, le=100_000)
+    quest_type: Optional[Literal['daily', 'weekly', 'side', 'main']] = None
+    streak_type: Optional[Literal['daily', 'weekly']] = None
+    game: Optional[str] = Field(default=None, max_length=32)
+    ts: Optional[datetime] = None
+
+
+class ActivityBatchRequest(BaseModel):
+    """Request model for ingesting a batch of activity events"""
+    events: List[ActivityEvent] = Field(max_length=500)
+
+
+class MiniGamePlayRequest(BaseModel):
+    """Request model for claiming a mini-game reward"""
+    game_id: str
+
+
+class MiniGamePlayResponse(BaseModel):
+    """Response model for mini-game plays and cooldown lookups"""
+    success: bool
+    message: str
+    reward: int = 0
+    coins: Optional[int] = None
+    next_eligible_at: Optional[datetime] = None
+    unlocked_achievements: List[str] = Field(default_factory=list)
+
+
+class InspirationUsedRequest(BaseModel):
+    """Request model for marking inspiration suggestions used (see inspiration.py)"""
+    suggestion_ids: List[int] = Field(default_factory=list, max_length=50)
+    # Quest titles; ones that aren't catalogue suggestions are ignored
+    texts: List[Text] = Field(default_factory=list, max_length=50)
+
+
+class InspirationSampleResponse(BaseModel):
+    """Response model for random unused inspiration suggestions"""
+    suggestions: List[Dict[str, Any]]
+    remaining: int  # unused suggestions left for the quest type
 
 
 class AuthResponse(BaseModel):
@@ -108,6 +329,9 @@ class PromoCode(BaseModel):
     active: bool = True
     max_uses: Optional[int] = None
     used_count: int = 0
+    starts_at: Optional[str] = None  # ISO timestamp, redeemable from
+    ends_at: Optional[str] = None  # ISO timestamp, redeemable until
+    managed_by: Optional[str] = None  # 'catalogue' for codes synced by seed_promos.py
 
 
 class PromoRedeemRequest(BaseModel):
@@ -122,3 +346,12 @@ class PromoRedeemResponse(BaseModel):
     reward_type: Optional[str] = None
     reward_amount: Optional[int] = None
     item_id: Optional[str] = None
+
+
+class ProfilingConfigRequest(BaseModel):
+    """Admin request to profile matching requests (see profiling.py)"""
+    sample_rate: float = Field(default=0.0, ge=0.0, le=1.0)
+    routes: List[ShortText] = Field(default_factory=list, max_length=20)  # path prefixes
+    google_ids: List[ShortText] = Field(default_factory=list, max_length=50)
+    # Reverts to the environment defaults afterwards
+    ttl_seconds: int = Field(default=3600, gt=0, le=86400)
@@ -0,0 +1,223 @@
+# On-demand per-request profiling
+#
+# Off by default. When enabled, matching requests (a sampled fraction, a
+# route prefix, or a specific google_id) are profiled and written to
+# PROFILE_DIR:
+#   - pyinstrument (in requirements.txt): wall-clock sampling including time
+#     spent awaiting Motor/HTTP calls, saved as *.speedscope.json (open at
+#     https://www.speedscope.app)
+#   - if it's missing from the environment anyway: cProfile CPU profile saved
+#     as *.prof (snakeviz/flameprof); cProfile doesn't see await time, so a
+#     warning is logged
+#
+# Settings come from the environment at startup and can be changed at runtime
+# through the admin API, which stores them in MongoDB so every worker picks
+# them up within PROFILE_CONFIG_REFRESH_SECONDS.
+#
+# Environment:
+#   PROFILE_SAMPLE_RATE=0.01      fraction of all requests
+#   PROFILE_ROUTES=/api/user/update,/api/auth/google
+#   PROFILE_GOOGLE_IDS=1234,5678
+#   PROFILE_DIR=profiles          PROFILE_MAX_FILES=200
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from auth import google_id_from_authorization
+from logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', Path(__file__).parent / 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+PROFILE_CONFIG_REFRESH_SECONDS = int(os.environ.get('PROFILE_CONFIG_REFRESH_SECONDS', 15))
+RUNTIME_CONFIG_COLLECTION = 'runtime_config'
+PROFILING_CONFIG_ID = 'profiling'
+
+# pyinstrument's sampling interval
+SAMPLE_INTERVAL_SECONDS = 0.001
+
+
+def _split(value: str) -> list:
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+class ProfilingConfig:
+    """Which requests to profile; `active` is the only check on the hot path"""
+
+    def __init__(self, sample_rate: float = 0.0, routes=(), google_ids=(), expires_at: Optional[datetime] = None):
+        self.sample_rate = sample_rate
+        self.routes = tuple(routes)
+        self.google_ids = frozenset(google_ids)
+        self.expires_at = expires_at
+        self.active = bool(sample_rate > 0 or self.routes or self.google_ids)
+
+    @classmethod
+    def from_env(cls) -> 'ProfilingConfig':
+        return cls(
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+            routes=_split(os.environ.get('PROFILE_ROUTES', '')),
+            google_ids=_split(os.environ.get('PROFILE_GOOGLE_IDS', '')),
+        )
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> 'ProfilingConfig':
+        expires_at = doc.get('expires_at')
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return cls(doc.get('sample_rate', 0.0), doc.get('routes', []), doc.get('google_ids', []), expires_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'sample_rate': self.sample_rate,
+            'routes': list(self.routes),
+            'google_ids': sorted(self.google_ids),
+            'expires_at': self.expires_at,
+        }
+
+    def matches(self, scope) -> bool:
+        path = scope['path']
+        if self.routes and path.startswith(self.routes):
+            return True
+        if self.google_ids:
+            authorization = dict(scope['headers']).get(b'authorization', b'').decode('latin-1')
+            if google_id_from_authorization(authorization) in self.google_ids:
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+_warned_cprofile = False
+
+
+def _warn_cprofile_fallback() -> None:
+    global _warned_cprofile
+    if not _warned_cprofile:
+        _warned_cprofile = True
+        logger.warning(
+            "⚠️ [Profiling] pyinstrument is not installed; falling back to cProfile, "
+            "which doesn't measure time spent awaiting I/O"
+        )
+
+
+class _Capture:
+    """Wraps pyinstrument (wall clock, async-aware) or falls back to cProfile"""
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self.profiler = Profiler(interval=SAMPLE_INTERVAL_SECONDS, async_mode='enabled')
+            self.kind = 'pyinstrument'
+        except ImportError:
+            import cProfile
+            _warn_cprofile_fallback()
+            self.profiler = cProfile.Profile()
+            self.kind = 'cprofile'
+
+    def start(self) -> None:
+        if self.kind == 'pyinstrument':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self) -> None:
+        if self.kind == 'pyinstrument':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def write(self, base_path: Path) -> Path:
+        if self.kind == 'pyinstrument':
+            from pyinstrument.renderers import SpeedscopeRenderer
+            path = base_path.with_name(base_path.name + '.speedscope.json')
+            path.write_text(self.profiler.output(renderer=SpeedscopeRenderer()))
+        else:
+            path = base_path.with_name(base_path.name + '.prof')
+            self.profiler.dump_stats(str(path))
+        return path
+
+
+def _prune(directory: Path, keep: int) -> None:
+    files = sorted(directory.glob('*.*'), key=lambda p: p.stat().st_mtime)
+    for old in files[:-keep] if keep > 0 else files:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests selected by the current ProfilingConfig"""
+
+    def __init__(self, app, output_dir: Path = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.max_files = max_files
+        # Profilers hook the whole thread, so only one capture runs at a time
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        config = profiling_state.config
+        if not config.active or scope['type'] != 'http' or self._busy or not config.matches(scope):
+            return await self.app(scope, receive, send)
+
+        self._busy = True
+        capture = _Capture()
+        started = time.perf_counter()
+        capture.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            capture.stop()
+            self._busy = False
+            duration_ms = (time.perf_counter() - started) * 1000
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', scope['path']).strip('_') or 'root'
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+            name = f"{stamp}-{scope['method']}-{slug}-{duration_ms:.0f}ms-{request_id_var.get() or 'none'}"
+            try:
+                path = await asyncio.to_thread(self._write, capture, name)
+                logger.info("🔬 [Profile] %s %s took %.0fms -> %s", scope['method'], scope['path'], duration_ms, path.name)
+            except Exception as e:
+                logger.error("Writing profile failed: %s: %s", type(e).__name__, e)
+
+    def _write(self, capture: _Capture, name: str) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = capture.write(self.output_dir / name)
+        _prune(self.output_dir, self.max_files)
+        return path
+
+
+class ProfilingState:
+    """Current config: env defaults, overridden by the admin toggle while it's unexpired"""
+
+    def __init__(self):
+        self.env_config = ProfilingConfig.from_env()
+        self.config = self.env_config
+
+    def apply(self, doc: Optional[Dict[str, Any]]) -> None:
+        if doc is None:
+            self.config = self.env_config
+            return
+        override = ProfilingConfig.from_doc(doc)
+        if override.expires_at is not None and override.expires_at <= datetime.now(timezone.utc):
+            self.config = self.env_config
+        else:
+            self.config = override
+
+    async def refresh(self, db) -> None:
+        self.apply(await db[RUNTIME_CONFIG_COLLECTION].find_one({'_id': PROFILING_CONFIG_ID}))
+
+    async def refresh_loop(self, get_db: Callable, interval: int = PROFILE_CONFIG_REFRESH_SECONDS) -> None:
+        """Background task: pick up admin changes made through any worker"""
+        while True:
+            try:
+                await self.refresh(get_db())
+            except Exception as e:
+                logger.error("Profiling config refresh failed: %s: %s", type(e).__name__, e)
+            await asyncio.sleep(interval)
+
+
+profiling_state = ProfilingState()
@@ -0,0 +1,207 @@
+# Bulk generation of single-use promo codes
+#
+# A batch (e.g. a 100k-code partner campaign) is one document in
+# `promo_batches` holding the reward and schedule, plus one tiny document per
+# code in `promo_batch_codes`. The code itself is the `_id`, so lookups use
+# the built-in unique index (O(log n) at any size) without a second index,
+# and unclaimed codes carry nothing but their batch id.
+#
+# Usage:
+#   python promo_batches.py create "Partner X" --count 100000 --type coins --amount 50 \
+#       --prefix PARTNERX --out partnerx_codes.txt
+#   python promo_batches.py deactivate <batch_id>
+import argparse
+import asyncio
+import os
+import secrets
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+from seed_promos import normalize_timestamp, validate_reward
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# 32 symbols without look-alikes (no 0/O, 1/I); 256 is a multiple of 32, so
+# masking random bytes keeps every symbol equally likely
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CODE_LENGTH = 10  # 32^10 ≈ 1.1e15 possible codes per prefix
+INSERT_CHUNK_SIZE = 5000
+INSERT_CONCURRENCY = 4
+DUPLICATE_KEY_ERROR = 11000
+
+
+def generate_codes(count: int, prefix: str = '', length: int = CODE_LENGTH) -> set:
+    """
+    Generate `count` distinct random codes
+
+    Args:
+        count: Number of codes
+        prefix: Optional prefix, joined with a dash (e.g. PARTNERX-7KQ2M9WX4D)
+        length: Number of random characters per code
+
+    Returns:
+        Set of uppercase code strings
+    """
+    prefix = f"{prefix.upper()}-" if prefix else ''
+    codes = set()
+    while len(codes) < count:
+        needed = count - len(codes)
+        raw = secrets.token_bytes(needed * length)
+        for i in range(needed):
+            chunk = raw[i * length:(i + 1) * length]
+            codes.add(prefix + ''.join(CODE_ALPHABET[b & 31] for b in chunk))
+    return codes
+
+
+async def _insert_chunk(db, batch_id: str, codes: list) -> list:
+    """Insert one chunk and return the codes that collided with existing ones"""
+    try:
+        await db.promo_batch_codes.insert_many(
+            [{'_id': code, 'batch_id': batch_id} for code in codes],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != DUPLICATE_KEY_ERROR for err in errors):
+            raise
+        return [codes[err['index']] for err in errors]
+    return []
+
+
+async def insert_codes(db, batch_id: str, codes: set, prefix: str = '') -> list:
+    """
+    Bulk-insert codes in parallel chunks, replacing any that already exist
+
+    Returns:
+        List of all codes inserted for the batch
+    """
+    pending = list(codes)
+    inserted = []
+    semaphore = asyncio.Semaphore(INSERT_CONCURRENCY)
+
+    async def run(chunk: list) -> list:
+        async with semaphore:
+            return await _insert_chunk(db, batch_id, chunk)
+
+    while pending:
+        chunks = [pending[i:i + INSERT_CHUNK_SIZE] for i in range(0, len(pending), INSERT_CHUNK_SIZE)]
+        collisions = [code for result in await asyncio.gather(*(run(c) for c in chunks)) for code in result]
+        collided = set(collisions)
+        inserted.extend(code for code in pending if code not in collided)
+        # Astronomically rare, but regenerate anything that clashed
+        pending = list(generate_codes(len(collisions), prefix)) if collisions else []
+
+    return inserted
+
+
+async def create_batch(
+    name: str,
+    count: int,
+    reward_type: str,
+    amount: int = None,
+    item_id: str = None,
+    prefix: str = '',
+    starts_at: str = None,
+    ends_at: str = None,
+    out: Path = None,
+) -> str:
+    """
+    Create a batch of single-use codes
+
+    Returns:
+        The new batch_id
+    """
+    # Validate before any code exists: codes are claimed before the reward is
+    # applied, so an unredeemable reward would burn every code it touches
+    validate_reward(f"batch '{name}'", reward_type, amount, item_id)
+    if count <= 0:
+        raise ValueError(f"Batch size must be positive, got {count}")
+
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    batch_id = str(uuid.uuid4())
+    try:
+        await db.promo_batch_codes.create_index('batch_id')
+
+        started = datetime.now(timezone.utc)
+        codes = generate_codes(count, prefix)
+        inserted = await insert_codes(db, batch_id, codes, prefix)
+
+        # The batch becomes redeemable only once all of its codes exist
+        await db.promo_batches.insert_one({
+            'batch_id': batch_id,
+            'name': name,
+            'type': reward_type,
+            'amount': amount,
+            'item_id': item_id,
+            'active': True,
+            'starts_at': normalize_timestamp(starts_at),
+            'ends_at': normalize_timestamp(ends_at),
+            'size': len(inserted),
+            'used_count': 0,
+            'created_at': started.isoformat(),
+        })
+
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+        print(f"✅ Created batch {batch_id} ('{name}') with {len(inserted)} codes in {elapsed:.1f}s")
+
+        if out:
+            with open(out, 'w') as f:
+                f.write('\n'.join(sorted(inserted)) + '\n')
+            print(f"📄 Codes written to {out}")
+    finally:
+        client.close()
+
+    return batch_id
+
+
+async def deactivate_batch(batch_id: str):
+    """Disable every code in a batch with a single write"""
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        result = await db.promo_batches.update_one({'batch_id': batch_id}, {'$set': {'active': False}})
+        print("✅ Batch deactivated" if result.matched_count else "❌ Batch not found")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage single-use promo code batches')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = sub.add_parser('create', help='Generate a new batch of single-use codes')
+    create_parser.add_argument('name')
+    create_parser.add_argument('--count', type=int, required=True)
+    create_parser.add_argument('--type', dest='reward_type', choices=['xp', 'coins', 'item'], required=True)
+    create_parser.add_argument('--amount', type=int)
+    create_parser.add_argument('--item-id')
+    create_parser.add_argument('--prefix', default='')
+    create_parser.add_argument('--starts-at', help='ISO timestamp the codes become valid')
+    create_parser.add_argument('--ends-at', help='ISO timestamp the codes expire')
+    create_parser.add_argument('--out', type=Path, help='File to write the generated codes to')
+
+    deactivate_parser = sub.add_parser('deactivate', help='Disable every code in a batch')
+    deactivate_parser.add_argument('batch_id')
+
+    args = parser.parse_args()
+    if args.command == 'create':
+        try:
+            asyncio.run(create_batch(
+                args.name, args.count, args.reward_type, args.amount, args.item_id,
+                args.prefix, args.starts_at, args.ends_at, args.out,
+            ))
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+    else:
+        asyncio.run(deactivate_batch(args.batch_id))
@@ -0,0 +1,193 @@
+# Real-time change notifications for multi-device sync
+#
+# Whenever a user's document is written, a compact notification (changed
+# field names, small scalar values and the new version) is published. Each
+# worker fans notifications out to its connected Server-Sent Events streams
+# through an in-process pub/sub. A broker carries them between workers: the
+# default LocalBroker stays in-process (single worker, tests), RedisBroker
+# uses Redis pub/sub (optional dependency) so every worker sees every write.
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Values of these types are small enough to include in the notification
+_SCALAR_TYPES = (int, float, str, bool, type(None))
+
+MAX_QUEUE_SIZE = 100
+MAX_STREAMS_PER_USER = 10
+
+
+def build_change(
+    fields: Iterable[str],
+    version: Optional[int],
+    values: Optional[Dict[str, Any]] = None,
+    origin: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build a compact change notification
+
+    Args:
+        fields: Names of the fields that changed
+        version: New document version (None if unknown)
+        values: New values; only scalars are included, bulky ones are named only
+        origin: Client ID of the device that made the change, if sent
+    """
+    fields = sorted(set(fields) - {'updated_at'})
+    scalars = {
+        k: v for k, v in (values or {}).items()
+        if k in fields and isinstance(v, _SCALAR_TYPES)
+    }
+    change = {'version': version, 'fields': fields}
+    if scalars:
+        change['values'] = scalars
+    if origin:
+        change['origin'] = origin
+    return change
+
+
+class PubSub:
+    """In-process fan-out of messages to per-user subscriber queues"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, google_id: str) -> asyncio.Queue:
+        """
+        Register a new stream for a user
+
+        Raises:
+            RuntimeError: If the user already has too many open streams
+        """
+        if len(self._subscribers[google_id]) >= MAX_STREAMS_PER_USER:
+            raise RuntimeError("Too many open event streams")
+        queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        self._subscribers[google_id].add(queue)
+        return queue
+
+    def unsubscribe(self, google_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(google_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[google_id]
+
+    def dispatch(self, google_id: str, message: Dict[str, Any]) -> None:
+        """Deliver to local subscribers; slow consumers drop their oldest message"""
+        for queue in self._subscribers.get(google_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+class LocalBroker:
+    """Delivers published messages straight to this process's subscribers"""
+
+    def __init__(self):
+        self._dispatch: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+    async def start(self, dispatch: Callable[[str, Dict[str, Any]], None]) -> None:
+        self._dispatch = dispatch
+
+    async def publish(self, google_id: str, message: Dict[str, Any]) -> None:
+        if self._dispatch is not None:
+            self._dispatch(google_id, message)
+
+    async def stop(self) -> None:
+        self._dispatch = None
+
+
+class RedisBroker:
+    """
+    Cross-worker broker over Redis pub/sub
+
+    Requires the optional `redis` package (redis>=4.2 for redis.asyncio).
+    """
+
+    def __init__(self, url: str, channel: str = 'ascend:user-changes'):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("REALTIME_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._redis = redis_asyncio.from_url(url)
+        self._channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, dispatch: Callable[[str, Dict[str, Any]], None]) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel)
+
+        async def listen():
+            async for item in pubsub.listen():
+                if item.get('type') != 'message':
+                    continue
+                try:
+                    payload = json.loads(item['data'])
+                    dispatch(payload['google_id'], payload['message'])
+                except (ValueError, KeyError) as e:
+                    logger.error("Bad realtime message: %s: %s", type(e).__name__, e)
+
+        self._task = asyncio.create_task(listen())
+
+    async def publish(self, google_id: str, message: Dict[str, Any]) -> None:
+        await self._redis.publish(self._channel, json.dumps({'google_id': google_id, 'message': message}))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        await self._redis.close()
+
+
+class ChangeNotifier:
+    """Publishes user document changes and serves subscriptions"""
+
+    def __init__(self, broker=None):
+        self.pubsub = PubSub()
+        self.broker = broker if broker is not None else LocalBroker()
+        # Called with the google_id of every change this worker receives
+        self.listeners: List[Callable[[str], None]] = []
+
+    async def start(self) -> None:
+        await self.broker.start(self._dispatch)
+
+    def _dispatch(self, google_id: str, message: Dict[str, Any]) -> None:
+        for listener in self.listeners:
+            listener(google_id)
+        self.pubsub.dispatch(google_id, message)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    async def notify(self, google_id: str, change: Dict[str, Any]) -> None:
+        """Publish a change; never fails the write path"""
+        try:
+            await self.broker.publish(google_id, change)
+        except Exception as e:
+            logger.error("Realtime publish failed: %s: %s", type(e).__name__, e)
+
+
+def create_notifier_from_env() -> ChangeNotifier:
+    """REALTIME_REDIS_URL selects the Redis broker; otherwise in-process only"""
+    redis_url = os.environ.get('REALTIME_REDIS_URL')
+    if redis_url:
+        return ChangeNotifier(RedisBroker(redis_url))
+
+    # gunicorn.conf.py and uvicorn --workers both default to WEB_CONCURRENCY
+    try:
+        workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    except ValueError:
+        workers = 1
+    if workers > 1:
+        logger.warning(
+            "⚠️ [Realtime] WEB_CONCURRENCY=%d without REALTIME_REDIS_URL: change "
+            "notifications stay inside each worker, so other devices may miss them",
+            workers
+        )
+    return ChangeNotifier(LocalBroker())
@@ -1,6 +1,18 @@
-# Seed promo codes into MongoDB
+# Sync promo codes in MongoDB with the declarative catalogue
+#
+# The catalogue (promo_catalogue.json, or YAML if PyYAML is installed) is the
+# source of truth. Only the differences are written, in a single bulk_write:
+# new codes are upserted, changed codes are updated in place, and catalogue
+# codes that were removed from the file are deactivated. `used_count` is never
+# touched, and there is no window where valid codes are missing.
+#
+# Usage:  python seed_promos.py [catalogue_path] [--dry-run]
+import argparse
 import asyncio
+import json
+from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -8,58 +20,182 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-async def seed_promo_codes():
-    """Seed initial promo codes"""
+DEFAULT_CATALOGUE = ROOT_DIR / 'promo_catalogue.json'
+
+# Marks codes owned by the catalogue, so removing one from the file only
+# deactivates catalogue codes and never touches codes created elsewhere
+MANAGED_BY = 'catalogue'
+
+# Fields the catalogue controls; everything else (used_count, ...) is left alone
+CATALOGUE_FIELDS = ('type', 'amount', 'item_id', 'active', 'max_uses', 'starts_at', 'ends_at')
+
+
+def normalize_timestamp(value):
+    """Store schedule timestamps as UTC ISO strings like the rest of the data"""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def validate_reward(label: str, reward_type, amount, item_id) -> None:
+    """
+    Check a promo reward is redeemable
+
+    Args:
+        label: Code or batch name for the error message
+        reward_type: 'xp', 'coins' or 'item'
+        amount: Positive integer (xp/coins rewards)
+        item_id: Inventory item granted (item rewards)
+
+    Raises:
+        ValueError: If redeeming the reward would fail
+    """
+    if reward_type not in ('xp', 'coins', 'item'):
+        raise ValueError(f"Invalid type for {label}: {reward_type}")
+    if reward_type == 'item':
+        if not isinstance(item_id, str) or not item_id:
+            raise ValueError(f"Item promo {label} needs an item_id")
+    elif isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+        raise ValueError(f"Promo {label} needs a positive integer amount, got {amount!r}")
+
+
+def load_catalogue(path: Path) -> dict:
+    """
+    Load and normalize the promo catalogue
+
+    Args:
+        path: JSON or YAML catalogue file
+
+    Returns:
+        dict of code -> desired promo document (catalogue fields only)
+
+    Raises:
+        ValueError: If an entry is invalid or a code is listed twice
+    """
+    with open(path) as f:
+        if path.suffix in ('.yaml', '.yml'):
+            import yaml  # optional dependency, only needed for YAML catalogues
+            raw = yaml.safe_load(f)
+        else:
+            raw = json.load(f)
+
+    catalogue = {}
+    for entry in raw.get('promo_codes', []):
+        code = entry['code'].upper()
+        if code in catalogue:
+            raise ValueError(f"Duplicate promo code in catalogue: {code}")
+        # Any invalid entry rejects the whole sync, before anything is written
+        validate_reward(code, entry.get('type'), entry.get('amount'), entry.get('item_id'))
+        max_uses = entry.get('max_uses')
+        if max_uses is not None and (isinstance(max_uses, bool) or not isinstance(max_uses, int) or max_uses <= 0):
+            raise ValueError(f"Promo {code} max_uses must be a positive integer, got {max_uses!r}")
+
+        catalogue[code] = {
+            'type': entry['type'],
+            'amount': entry.get('amount'),
+            'item_id': entry.get('item_id'),
+            'active': entry.get('active', True),
+            'max_uses': entry.get('max_uses'),
+            'starts_at': normalize_timestamp(entry.get('starts_at')),
+            'ends_at': normalize_timestamp(entry.get('ends_at')),
+        }
+    return catalogue
+
+
+def diff_catalogue(catalogue: dict, existing: dict) -> list:
+    """
+    Work out the updates needed to make the database match the catalogue
+
+    Args:
+        catalogue: code -> desired fields (from load_catalogue)
+        existing: code -> current document for codes already in the database
+
+    Returns:
+        List of (code, update, upsert) tuples (empty if nothing changed)
+    """
+    changes = []
+    for code, desired in catalogue.items():
+        current = existing.get(code)
+        if current is None:
+            changes.append((
+                code,
+                {
+                    '$set': {**desired, 'managed_by': MANAGED_BY},
+                    '$setOnInsert': {'used_count': 0},
+                },
+                True,
+            ))
+            continue
+
+        fields = {
+            field: value for field, value in desired.items()
+            if current.get(field) != value
+        }
+        if current.get('managed_by') != MANAGED_BY:
+            fields['managed_by'] = MANAGED_BY
+        if fields:
+            changes.append((code, {'$set': fields}, False))
+
+    for code, current in existing.items():
+        if code not in catalogue and current.get('managed_by') == MANAGED_BY and current.get('active'):
+            changes.append((code, {'$set': {'active': False}}, False))
+
+    return changes
+
+
+def to_operations(changes: list) -> list:
+    """pymongo bulk operations for the output of diff_catalogue"""
+    return [UpdateOne({'code': code}, update, upsert=upsert) for code, update, upsert in changes]
+
+
+async def sync_promo_codes(catalogue_path: Path = DEFAULT_CATALOGUE, dry_run: bool = False):
+    """Apply the catalogue to the promo_codes collection"""
+    catalogue = load_catalogue(catalogue_path)
+
     mongo_url = os.environ['MONGO_URL']
     client = AsyncIOMotorClient(mongo_url)
     db = client[os.environ.get('DB_NAME', 'test_database')]
-    
-    promo_codes = [
-        {
-            "code": "WELCOME100",
-            "type": "xp",
-            "amount": 100,
-            "active": True,
-            "max_uses": None,
-            "used_count": 0
-        },
-        {
-            "code": "ASCEND500",
-            "type": "xp",
-            "amount": 500,
-            "active": True,
-            "max_uses": 100,
-            "used_count": 0
-        },
-        {
-            "code": "COINS50",
-            "type": "coins",
-            "amount": 50,
-            "active": True,
-            "max_uses": None,
-            "used_count": 0
-        },
-        {
-            "code": "BOOST2024",
-            "type": "xp",
-            "amount": 250,
-            "active": True,
-            "max_uses": 50,
-            "used_count": 0
-        }
-    ]
-    
-    # Clear existing promo codes
-    await db.promo_codes.delete_many({})
-    
-    # Insert new promo codes
-    result = await db.promo_codes.insert_many(promo_codes)
-    
-    print(f"✅ Seeded {len(result.inserted_ids)} promo codes:")
-    for code in promo_codes:
-        print(f"  - {code['code']}: {code['amount']} {code['type'].upper()}")
-    
-    client.close()
+
+    try:
+        # Only catalogue codes (or same-named legacy codes) are read back,
+        # so generated code batches don't make the diff expensive
+        projection = {'_id': 0, 'code': 1, 'managed_by': 1, **{field: 1 for field in CATALOGUE_FIELDS}}
+        cursor = db.promo_codes.find(
+            {'$or': [{'managed_by': MANAGED_BY}, {'code': {'$in': list(catalogue)}}]},
+            projection,
+        )
+        existing = {doc['code']: doc async for doc in cursor}
+
+        changes = diff_catalogue(catalogue, existing)
+        if not changes:
+            print("✅ Promo codes already match the catalogue")
+            return
+
+        for code, update, _ in changes:
+            print(f"  - {code}: {update}")
+        if dry_run:
+            print(f"🔍 Dry run: {len(changes)} change(s) not applied")
+            return
+
+        result = await db.promo_codes.bulk_write(to_operations(changes), ordered=False)
+        print(
+            f"✅ Synced promo codes: {result.upserted_count} added, "
+            f"{result.modified_count} updated/deactivated"
+        )
+    finally:
+        client.close()
+
 
 if __name__ == "__main__":
-    asyncio.run(seed_promo_codes())
+    parser = argparse.ArgumentParser(description='Sync promo codes with the catalogue')
+    parser.add_argument('catalogue', nargs='?', type=Path, default=DEFAULT_CATALOGUE)
+    parser.add_argument('--dry-run', action='store_true', help='Show changes without applying them')
+    args = parser.parse_args()
+    try:
+        asyncio.run(sync_promo_codes(args.catalogue, args.dry_run))
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
@@ -1,18 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+import asyncio
+import json
 import os
+import re
 import logging
 from pathlib import Path
 from typing import Optional
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 # Import our custom modules
-from auth import verify_google_token, create_jwt_token, get_current_user_id
+from jose import JWTError
+from auth import (
+    verify_google_token, create_jwt_token, decode_jwt_token, get_current_user_id, get_admin_user_id,
+    google_id_from_authorization
+)
+from user_cache import LocalCacheBackend, create_user_cache_from_env
+from achievements import achievement_engine
+from store import PURCHASE_KEY_HISTORY, get_catalogue_entry, inventory_entry, without_one
+from minigames import MINI_GAMES, MINI_GAME_COOLDOWN
+from idempotency import IdempotencyMiddleware, ensure_idempotency_indexes
+from body_limit import BodySizeLimitMiddleware
+from health import HealthMonitor, PoolStats
+from logging_config import SAMPLED, RequestIdMiddleware, configure_logging
+from profiling import (
+    PROFILING_CONFIG_ID, RUNTIME_CONFIG_COLLECTION, ProfilingMiddleware, profiling_state
+)
+from archive import (
+    ARCHIVE_INTERVAL_SECONDS, HOT_USER, archive_loop, ensure_archive_indexes, rehydrate_user, write_hot_user
+)
+from analytics import (
+    ANALYTICS_INTERVAL_SECONDS, ANALYTICS_JOB_ID, COHORTS_COLLECTION, DAILY_STATS_COLLECTION, ECONOMY_COLLECTION,
+    PROMOS_COLLECTION, RETENTION_COLLECTION, UNKNOWN_COHORT, analytics_loop, ensure_analytics_indexes
+)
+from realtime import build_change, create_notifier_from_env
+from inspiration import (
+    BITMAP_FIELD, CATALOGUES, MAX_SAMPLE_COUNT, SUGGESTIONS, catalogue_with_used, describe,
+    load_used_bits, mark_used, sample_unused, suggestion_id_for_text, unused_count
+)
+from activity import (
+    DAILY_COLLECTION, EVENTS_COLLECTION, JOB_STATE_COLLECTION, ROLLUP_INTERVAL_SECONDS, WEEKLY_COLLECTION,
+    build_event_docs, drop_seen_events, ensure_activity_collections, rollup_loop
+)
 from models import (
     GoogleAuthRequest, AuthResponse, UserData, UserUpdateRequest,
-    PromoCode, PromoRedeemRequest, PromoRedeemResponse, UserQuests
+    PromoCode, PromoRedeemRequest, PromoRedeemResponse, UserQuests,
+    StatsIncrementRequest, StatsIncrementResponse,
+    StorePurchaseRequest, StorePurchaseResponse, StoreUseRequest, StoreUseResponse, ActivityBatchRequest,
+    MiniGamePlayRequest, MiniGamePlayResponse, ProfilingConfigRequest,
+    InspirationUsedRequest, InspirationSampleResponse
 )
 
 ROOT_DIR = Path(__file__).parent
@@ -20,23 +61,106 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+pool_stats = PoolStats()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[pool_stats])
 db = client[os.environ.get('DB_NAME', 'test_database')]
 
+# Probes Mongo, pool pressure and loop lag in the background; health
+# endpoints answer from its cached state
+health_monitor = HealthMonitor(
+    get_db=lambda: db,
+    pool_stats=pool_stats,
+    max_pool_size=client.options.pool_options.max_pool_size
+)
+
+# Read-through cache of user documents (invalidated on every write path)
+user_cache = create_user_cache_from_env()
+
+
+async def _fetch_user(google_id: str) -> Optional[dict]:
+    user = await db.users.find_one({"google_id": google_id}, {"_id": 0})
+    if user is not None and user.get('archived'):
+        # Cold user coming back: restore the full document from the archive
+        user = await rehydrate_user(db, google_id)
+    return user
+
+
+async def load_user(google_id: str) -> Optional[dict]:
+    """Get a user document, served from the cache when possible"""
+    return await user_cache.get(google_id, _fetch_user)
+
+
+# Single-use promo batches are few and rarely change; deactivating a batch
+# takes effect within PROMO_BATCH_CACHE_TTL seconds
+PROMO_BATCH_CACHE_TTL = 60
+promo_batch_cache = LocalCacheBackend(max_size=1000)
+
+
+async def load_promo_batch(batch_id: str) -> Optional[dict]:
+    """Get a promo batch (reward + schedule for its single-use codes)"""
+    batch = await promo_batch_cache.get(batch_id)
+    if batch is None:
+        batch = await db.promo_batches.find_one({"batch_id": batch_id}, {"_id": 0})
+        if batch is not None:
+            await promo_batch_cache.set(batch_id, batch, PROMO_BATCH_CACHE_TTL)
+    return batch
+
+
+# Pushes compact change notifications to the user's other devices
+notifier = create_notifier_from_env()
+# Every write publishes a change, so other workers' local cache copies are
+# dropped as soon as the notification arrives (with the Redis broker)
+notifier.listeners.append(user_cache.forget_local)
+
+
+async def publish_user_change(
+    google_id: str,
+    fields,
+    user: dict,
+    values: Optional[dict] = None,
+    unlocked: Optional[list] = None,
+    client_id: Optional[str] = None
+):
+    """
+    Notify connected devices that a user document was written
+
+    Args:
+        google_id: Owner of the document
+        fields: Names of the fields the write changed
+        user: Document returned by the write (provides the new version)
+        values: New values of changed fields (only scalars are sent)
+        unlocked: Achievements unlocked by the write
+        client_id: X-Client-Id of the device that made the change
+    """
+    fields = list(fields) + (['achievements'] if unlocked else [])
+    await notifier.notify(google_id, build_change(fields, user.get('version'), values, client_id))
+
+
 # Create the main app without a prefix
 app = FastAPI(title="Ascend API", version="1.0.0")
-@app.get("/health")
-def health():
+
+
+@app.get("/live")
+async def live():
+    """Liveness: the worker is serving and its health prober is running"""
+    if not health_monitor.is_live():
+        return JSONResponse({"ok": False}, status_code=503)
     return {"ok": True}
 
+
+@app.get("/ready")
+@app.get("/health")
+async def ready():
+    """Readiness from the last background probe (503 drains this instance)"""
+    snapshot = health_monitor.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot['ready'] else 503)
+
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (JSON via a background writer thread, see logging_config.py)
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -52,18 +176,15 @@ async def google_auth(auth_request: GoogleAuthRequest):
     - Creates new user if first login
     - Returns JWT token and user data
     """
-    logger.info("🔵 [Auth] Received Google auth request")
-    logger.info(f"🔵 [Auth] Token preview: {auth_request.token[:50]}...")
-    
     try:
         # Verify Google token
-        logger.info("🔵 [Auth] Verifying Google token...")
         google_user = verify_google_token(auth_request.token)
         google_id = google_user['google_id']
-        logger.info(f"🟢 [Auth] Google token verified: {google_user['email']}")
+        logger.debug("🟢 [Auth] Google token verified: %s", google_user['email'])
         
-        # Check if user exists
-        existing_user = await db.users.find_one({"google_id": google_id}, {"_id": 0})
+        # Check if user exists (read from Mongo: login returns the document to
+        # the client, and a cached copy may be stale on this worker)
+        existing_user = await _fetch_user(google_id)
         
         if existing_user:
             # User exists - update last login and return
@@ -72,7 +193,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
             # MIGRATION: Convert inventory from object to array if needed
             inventory_needs_migration = False
             if 'inventory' in existing_user and not isinstance(existing_user['inventory'], list):
-                logger.info(f"🔧 [Migration] Converting inventory from dict to array for {google_user['email']}")
+                logger.info("🔧 [Migration] Converting inventory from dict to array for %s", google_user['email'])
                 old_inventory = existing_user['inventory']
                 # Convert object to array of items
                 existing_user['inventory'] = []
@@ -84,7 +205,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 inventory_needs_migration = True
             elif 'inventory' not in existing_user:
                 # Add inventory field if missing
-                logger.info(f"🔧 [Migration] Adding missing inventory field for {google_user['email']}")
+                logger.info("🔧 [Migration] Adding missing inventory field for %s", google_user['email'])
                 existing_user['inventory'] = []
                 inventory_needs_migration = True
             
@@ -100,6 +221,8 @@ async def google_auth(auth_request: GoogleAuthRequest):
                     {"$set": {"updated_at": existing_user['updated_at']}}
                 )
             
+            await user_cache.invalidate(google_id)
+            
             # Convert datetime strings back to datetime objects for Pydantic
             if isinstance(existing_user.get('created_at'), str):
                 existing_user['created_at'] = datetime.fromisoformat(existing_user['created_at'])
@@ -107,7 +230,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 existing_user['updated_at'] = datetime.fromisoformat(existing_user['updated_at'])
             
             user_data = UserData(**existing_user)
-            logger.info(f"🟢 [Auth] Existing user logged in: {google_user['email']}")
+            logger.info("🟢 [Auth] Existing user logged in: %s", google_user['email'], extra=SAMPLED)
         else:
             # New user - create account
             new_user_data = {
@@ -123,9 +246,9 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 'quest_streaks': {},
                 'inventory': [],  # Array, not object!
                 'active_effects': [],
+                'unlocked_avatars': [],
                 'settings': {},
                 'used_promo_codes': [],
-                'used_inspiration_suggestions': [],
                 'daily_quest_creation_count': 0,
                 'daily_quest_creation_date': None,
                 'weekly_quest_creation_count': 0,
@@ -154,9 +277,13 @@ async def google_auth(auth_request: GoogleAuthRequest):
             doc = user_data.model_dump()
             doc['created_at'] = doc['created_at'].isoformat() if isinstance(doc['created_at'], datetime) else doc['created_at']
             doc['updated_at'] = doc['updated_at'].isoformat() if isinstance(doc['updated_at'], datetime) else doc['updated_at']
+            # Keeps the user in the archiver's partial index
+            doc['archived'] = False
             
             await db.users.insert_one(doc)
-            logger.info(f"New user created: {google_user['email']}")
+            doc.pop('_id', None)
+            await user_cache.set(google_id, doc)
+            logger.info("New user created: %s", google_user['email'])
         
         # Generate JWT token
         try:
@@ -164,11 +291,8 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 'google_id': google_id,
                 'email': google_user['email']
             })
-            logger.info(f"JWT token created successfully for user: {google_user['email']}")
         except Exception as jwt_error:
-            logger.error(f"JWT token creation failed: {type(jwt_error).__name__}: {str(jwt_error)}")
-            import traceback
-            logger.error(f"JWT traceback: {traceback.format_exc()}")
+            logger.exception("JWT token creation failed: %s", type(jwt_error).__name__)
             raise
         
         return AuthResponse(token=jwt_token, user=user_data)
@@ -176,9 +300,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Auth error: {type(e).__name__}: {str(e)}")
-        import traceback
-        logger.error(f"Auth traceback: {traceback.format_exc()}")
+        logger.exception("Auth error: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=500, detail=f"Authentication failed: {str(e)}")
 
 
@@ -196,7 +318,7 @@ async def get_user(google_id: str, current_user_id: str = Depends(get_current_us
     if google_id != current_user_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    user = await db.users.find_one({"google_id": google_id}, {"_id": 0})
+    user = await load_user(google_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -210,38 +332,612 @@ async def get_user(google_id: str, current_user_id: str = Depends(get_current_us
     return UserData(**user)
 
 
+# List fields that updates add to instead of replacing
+MERGED_UPDATE_FIELDS = ('achievements', 'used_promo_codes')
+
+
 @api_router.post("/user/update")
 async def update_user(
     update_data: UserUpdateRequest,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
 ):
     """
     Update user data
+    Body size is capped by BodySizeLimitMiddleware before it is parsed
     Requires valid JWT token
     """
     # Build update dict with only provided fields
     update_dict = {
-        k: v for k, v in update_data.model_dump(exclude_none=True).items()
+        k: v for k, v in update_data.model_dump(exclude_unset=True).items() if v is not None
     }
     
+    # Older clients still sync used suggestions as strings; they go into the bitmap
+    legacy_suggestions = update_dict.pop('used_inspiration_suggestions', None)
+    if legacy_suggestions:
+        await mark_inspiration_used(current_user_id, _suggestion_ids_for_texts(legacy_suggestions), client_id)
+    
     if not update_dict:
+        if legacy_suggestions is not None:
+            return {"success": True, "message": "User updated successfully", "unlocked_achievements": []}
         raise HTTPException(status_code=400, detail="No update data provided")
     
     # Add updated_at timestamp
     update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    # Update user
-    result = await db.users.update_one(
-        {"google_id": current_user_id},
-        {"$set": update_dict}
+    # Achievements and redeemed promo codes are merged, so a stale client can't
+    # drop server-side unlocks or make a redeemed code redeemable again
+    update_ops = {}
+    merged = {}
+    for field in MERGED_UPDATE_FIELDS:
+        values = update_dict.pop(field, None)
+        if values:
+            merged[field] = {"$each": values}
+    if merged:
+        update_ops["$addToSet"] = merged
+    update_ops["$set"] = update_dict
+    update_ops["$inc"] = {"version": 1}
+    
+    # Update user, reading back only what the affected achievements need
+    affected = achievement_engine.affected(update_dict.keys())
+    user = await write_hot_user(db, current_user_id, lambda: db.users.find_one_and_update(
+        {"google_id": current_user_id, **HOT_USER},
+        update_ops,
+        projection={**achievement_engine.projection(affected), "version": 1},
+        return_document=ReturnDocument.AFTER
+    ))
+    
+    if user is None:
+        await user_cache.invalidate(current_user_id)
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    unlocked = achievement_engine.evaluate(user, affected)
+    await achievement_engine.unlock(db, current_user_id, unlocked)
+    await user_cache.invalidate(current_user_id)
+    
+    changed = list(update_dict.keys()) + list(merged)
+    await publish_user_change(current_user_id, changed, user, update_dict, unlocked, client_id)
+    
+    logger.info("User %s updated: %s", current_user_id, list(update_dict.keys()), extra=SAMPLED)
+    
+    return {"success": True, "message": "User updated successfully", "unlocked_achievements": unlocked}
+
+
+# Lifetime counters that may be incremented directly
+STAT_COUNTER_FIELDS = {
+    'totalXPEarned', 'totalQuestsCompleted', 'totalCoinsEarned',
+    'totalCoinsSpent', 'totalPurchases', 'mainQuestsCompleted'
+}
+MINI_GAME_COUNTER = re.compile(r'^miniGamesPlayed\.[A-Za-z0-9_]{1,32}$')
+# Coins earned on the client (quests, streak rewards); spending only goes
+# through /store/purchase, so these increments must be positive
+EARNED_BALANCE_FIELDS = {'coins'}
+
+
+@api_router.post("/stats/increment", response_model=StatsIncrementResponse)
+async def increment_stats(
+    increment_request: StatsIncrementRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
+):
+    """
+    Atomically increment lifetime stat counters (and coins earned) and unlock achievements
+    Only achievements depending on the incremented fields are evaluated
+    Requires valid JWT token
+    """
+    increments = increment_request.increments
+    if not increments:
+        raise HTTPException(status_code=400, detail="No increments provided")
+    
+    invalid = [
+        f for f, delta in increments.items()
+        if not (f in STAT_COUNTER_FIELDS or MINI_GAME_COUNTER.match(f) or (f in EARNED_BALANCE_FIELDS and delta > 0))
+    ]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid stat fields: {', '.join(invalid)}")
+    
+    affected = achievement_engine.affected(increments.keys())
+    user = await write_hot_user(db, current_user_id, lambda: db.users.find_one_and_update(
+        {"google_id": current_user_id, **HOT_USER},
+        {"$inc": {**increments, "version": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={**achievement_engine.projection(affected), "version": 1},
+        return_document=ReturnDocument.AFTER
+    ))
+    
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    unlocked = achievement_engine.evaluate(user, affected)
+    await achievement_engine.unlock(db, current_user_id, unlocked)
+    await user_cache.invalidate(current_user_id)
+    await publish_user_change(current_user_id, increments.keys(), user, unlocked=unlocked, client_id=client_id)
+    
+    return StatsIncrementResponse(success=True, unlocked_achievements=unlocked)
+
+
+# ============================================================================
+# REAL-TIME ENDPOINTS
+# ============================================================================
+
+# Comment lines keep idle connections from being closed by proxies
+SSE_KEEPALIVE_SECONDS = 25
+
+
+@api_router.get("/events")
+async def user_events(
+    token: Optional[str] = None,
+    authorization: Optional[str] = Header(default=None)
+):
+    """
+    Server-Sent Events stream of changes to the current user's document
+    - `ready` event first, carrying the current version (refetch if behind)
+    - `change` events: {"version", "fields", "values"?, "origin"?}
+    EventSource can't set headers, so the JWT may be passed as ?token=
+    """
+    scheme, _, bearer = (authorization or '').partition(' ')
+    if scheme.lower() == 'bearer' and bearer:
+        token = bearer
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        google_id = decode_jwt_token(token).get('google_id')
+    except JWTError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid or expired token: {str(e)}")
+    
+    try:
+        queue = notifier.pubsub.subscribe(google_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    # The ready version decides whether the client refetches, so read it from
+    # Mongo (this worker's cache may predate a write made through another
+    # worker), and only after subscribing so no later change can slip between
+    try:
+        user = await db.users.find_one({"google_id": google_id}, {"_id": 0, "version": 1, "archived": 1})
+        if user is not None and user.get('archived'):
+            user = await rehydrate_user(db, google_id)
+    except Exception:
+        notifier.pubsub.unsubscribe(google_id, queue)
+        raise
+    if not user:
+        notifier.pubsub.unsubscribe(google_id, queue)
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    async def stream():
+        try:
+            yield f"retry: 5000\nevent: ready\ndata: {json.dumps({'version': user.get('version', 0)})}\n\n"
+            # Starlette cancels this generator when the client disconnects
+            while True:
+                try:
+                    change = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: change\ndata: {json.dumps(change)}\n\n"
+        finally:
+            notifier.pubsub.unsubscribe(google_id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+
+# ============================================================================
+# STORE ENDPOINTS
+# ============================================================================
+
+@api_router.post("/store/purchase", response_model=StorePurchaseResponse)
+async def store_purchase(
+    purchase_request: StorePurchaseRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=64),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
+):
+    """
+    Buy a store item or premium avatar
+    - Price comes from the server-side catalogue
+    - Balance check, deduction and grant happen in one conditional write
+    - Retries with the same Idempotency-Key are applied at most once
+    Requires valid JWT token
+    """
+    kind = purchase_request.kind
+    item_id = purchase_request.item_id
+    entry = get_catalogue_entry(kind, item_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    price = entry['price']
+    key = idempotency_key or purchase_request.idempotency_key
+    
+    query = {"google_id": current_user_id, "coins": {"$gte": price}, **HOT_USER}
+    update = {
+        "$inc": {"coins": -price, "totalCoinsSpent": price, "totalPurchases": 1, "version": 1},
+        "$set": {"updated_at": datetime.now(timezone.utc).isoformat()},
+        "$push": {}
+    }
+    if kind == 'avatar':
+        query["unlocked_avatars"] = {"$ne": item_id}
+        update["$addToSet"] = {"unlocked_avatars": item_id}
+        granted = {'id': item_id, 'name': entry['name']}
+    else:
+        granted = inventory_entry(entry)
+        update["$push"]["inventory"] = granted
+    if key:
+        query["store_purchase_keys"] = {"$ne": key}
+        update["$push"]["store_purchase_keys"] = {"$each": [key], "$slice": -PURCHASE_KEY_HISTORY}
+    if not update["$push"]:
+        del update["$push"]
+    
+    affected = achievement_engine.affected(["totalPurchases"])
+    user = await write_hot_user(db, current_user_id, lambda: db.users.find_one_and_update(
+        query,
+        update,
+        projection={**achievement_engine.projection(affected), "coins": 1, "version": 1},
+        return_document=ReturnDocument.AFTER
+    ))
+    
+    if user is None:
+        # Work out which condition failed (nothing was written)
+        current = await db.users.find_one(
+            {"google_id": current_user_id},
+            {"_id": 0, "coins": 1, "unlocked_avatars": 1, "store_purchase_keys": 1}
+        )
+        if not current:
+            raise HTTPException(status_code=404, detail="User not found")
+        if key and key in current.get('store_purchase_keys', []):
+            return StorePurchaseResponse(
+                success=True,
+                message="Purchase already applied",
+                coins=current.get('coins'),
+                item=granted
+            )
+        if kind == 'avatar' and item_id in current.get('unlocked_avatars', []):
+            return StorePurchaseResponse(success=False, message="You already own this avatar!", coins=current.get('coins'))
+        return StorePurchaseResponse(success=False, message="Not enough coins!", coins=current.get('coins'))
+    
+    unlocked = achievement_engine.evaluate(user, affected)
+    await achievement_engine.unlock(db, current_user_id, unlocked)
+    await user_cache.invalidate(current_user_id)
+    
+    changed = ['coins', 'totalCoinsSpent', 'totalPurchases', 'unlocked_avatars' if kind == 'avatar' else 'inventory']
+    await publish_user_change(current_user_id, changed, user, user, unlocked, client_id)
+    
+    logger.info("User %s purchased %s %s for %s coins", current_user_id, kind, item_id, price)
+    
+    return StorePurchaseResponse(
+        success=True,
+        message=f"{entry['name']} purchased!",
+        coins=user.get('coins'),
+        item=granted,
+        unlocked_achievements=unlocked
+    )
+
+
+# Attempts at the version-checked inventory rewrite before giving up
+USE_ITEM_ATTEMPTS = 3
+
+
+@api_router.post("/store/use", response_model=StoreUseResponse)
+async def store_use(
+    use_request: StoreUseRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
+):
+    """
+    Use up one inventory item (the item's effect runs on the client)
+    The inventory is only rewritten if the document's version is unchanged
+    since it was read, so a concurrent purchase is never dropped
+    Requires valid JWT token
+    """
+    for _ in range(USE_ITEM_ATTEMPTS):
+        current = await db.users.find_one(
+            {"google_id": current_user_id},
+            {"_id": 0, "inventory": 1, "version": 1, "archived": 1}
+        )
+        if current is not None and current.get('archived'):
+            current = await rehydrate_user(db, current_user_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        inventory = without_one(current.get('inventory') or [], use_request.item_id)
+        if inventory is None:
+            return StoreUseResponse(success=False, message="Item not in inventory")
+        
+        result = await db.users.update_one(
+            {"google_id": current_user_id, "version": current.get('version'), **HOT_USER},
+            {
+                "$set": {"inventory": inventory, "updated_at": datetime.now(timezone.utc).isoformat()},
+                "$inc": {"version": 1}
+            }
+        )
+        if result.modified_count:
+            break
+    else:
+        raise HTTPException(status_code=409, detail="Inventory changed, please retry")
+    
+    await user_cache.invalidate(current_user_id)
+    # The version was pinned by the write, so this is the new one
+    user = {"version": (current.get('version') or 0) + 1}
+    await publish_user_change(current_user_id, ['inventory'], user, client_id=client_id)
+    
+    logger.info("User %s used %s", current_user_id, use_request.item_id)
+    
+    return StoreUseResponse(success=True, message="Item used")
+
+
+# ============================================================================
+# MINI-GAME ENDPOINTS
+# ============================================================================
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Motor returns naive datetimes (UTC)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@api_router.post("/minigames/play", response_model=MiniGamePlayResponse)
+async def play_minigame(
+    play_request: MiniGamePlayRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
+):
+    """
+    Claim a mini-game reward
+    - Checks and sets the global cooldown in one conditional write
+    - Counts the play and awards coins with $inc
+    - Returns when the next play is allowed
+    Requires valid JWT token
+    """
+    game = MINI_GAMES.get(play_request.game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Mini-game not found")
+    
+    now = datetime.now(timezone.utc)
+    next_eligible_at = now + MINI_GAME_COOLDOWN
+    stat_field = f"miniGamesPlayed.{game['stat']}"
+    affected = achievement_engine.affected([stat_field])
     
-    if result.matched_count == 0:
+    user = await write_hot_user(db, current_user_id, lambda: db.users.find_one_and_update(
+        {
+            "google_id": current_user_id,
+            "$or": [
+                {"minigame_cooldown_until": None},
+                {"minigame_cooldown_until": {"$lte": now}}
+            ],
+            **HOT_USER
+        },
+        {
+            "$set": {"minigame_cooldown_until": next_eligible_at, "updated_at": now.isoformat()},
+            "$inc": {stat_field: 1, "coins": game['reward'], "totalCoinsEarned": game['reward'], "version": 1}
+        },
+        projection={**achievement_engine.projection(affected), "coins": 1, "version": 1},
+        return_document=ReturnDocument.AFTER
+    ))
+    
+    if user is None:
+        current = await db.users.find_one(
+            {"google_id": current_user_id},
+            {"_id": 0, "coins": 1, "minigame_cooldown_until": 1}
+        )
+        if not current:
+            raise HTTPException(status_code=404, detail="User not found")
+        return MiniGamePlayResponse(
+            success=False,
+            message="Mini-games are on cooldown",
+            coins=current.get('coins'),
+            next_eligible_at=_as_utc(current.get('minigame_cooldown_until'))
+        )
+    
+    unlocked = achievement_engine.evaluate(user, affected)
+    await achievement_engine.unlock(db, current_user_id, unlocked)
+    await user_cache.invalidate(current_user_id)
+    
+    changed = ['coins', 'totalCoinsEarned', stat_field, 'minigame_cooldown_until']
+    await publish_user_change(current_user_id, changed, user, user, unlocked, client_id)
+    
+    return MiniGamePlayResponse(
+        success=True,
+        message=f"+{game['reward']} Coins",
+        reward=game['reward'],
+        coins=user.get('coins'),
+        next_eligible_at=next_eligible_at,
+        unlocked_achievements=unlocked
+    )
+
+
+@api_router.get("/minigames/cooldown", response_model=MiniGamePlayResponse)
+async def get_minigame_cooldown(current_user_id: str = Depends(get_current_user_id)):
+    """
+    Get when mini-games can next be played (null if available now)
+    Requires valid JWT token
+    """
+    user = await load_user(current_user_id)
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    logger.info(f"User {current_user_id} updated: {list(update_dict.keys())}")
+    cooldown_until = user.get('minigame_cooldown_until')
+    if isinstance(cooldown_until, str):
+        # Shared cache backends store datetimes as strings
+        cooldown_until = datetime.fromisoformat(cooldown_until)
+    cooldown_until = _as_utc(cooldown_until)
+    available = cooldown_until is None or cooldown_until <= datetime.now(timezone.utc)
     
-    return {"success": True, "message": "User updated successfully"}
+    return MiniGamePlayResponse(
+        success=available,
+        message="Available" if available else "Mini-games are on cooldown",
+        next_eligible_at=None if available else cooldown_until
+    )
+
+
+# ============================================================================
+# ACTIVITY ENDPOINTS
+# ============================================================================
+
+@api_router.post("/activity/events")
+async def ingest_activity_events(
+    batch: ActivityBatchRequest,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Append a batch of activity events to the time-series log
+    Events already stored under the same event_id are skipped
+    Rollups are refreshed in the background
+    Requires valid JWT token
+    """
+    if not batch.events:
+        return {"success": True, "accepted": 0}
+    
+    now = datetime.now(timezone.utc)
+    docs = build_event_docs(current_user_id, [event.model_dump() for event in batch.events], now)
+    docs = await drop_seen_events(db, current_user_id, docs, now)
+    if docs:
+        await db[EVENTS_COLLECTION].insert_many(docs, ordered=False)
+    
+    return {"success": True, "accepted": len(docs)}
+
+
+@api_router.get("/activity/today")
+async def get_activity_today(current_user_id: str = Depends(get_current_user_id)):
+    """
+    Get today's pre-aggregated activity summary (UTC day)
+    Requires valid JWT token
+    """
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    summary = await db[DAILY_COLLECTION].find_one({"_id": f"{current_user_id}:{today}"}, {"_id": 0})
+    
+    return summary or {
+        "google_id": current_user_id,
+        "day": today,
+        "xp": 0,
+        "coins": 0,
+        "completed": {"daily": 0, "weekly": 0, "side": 0, "main": 0},
+        "streakChanges": {"daily": 0, "weekly": 0},
+        "miniGamesPlayed": 0,
+        "events": 0
+    }
+
+
+@api_router.get("/activity/daily")
+async def get_activity_daily(days: int = 7, current_user_id: str = Depends(get_current_user_id)):
+    """
+    Get daily activity rollups for the last `days` days (max 90), newest first
+    Requires valid JWT token
+    """
+    days = max(1, min(days, 90))
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    cursor = db[DAILY_COLLECTION].find(
+        {"google_id": current_user_id, "day": {"$gte": since}},
+        {"_id": 0}
+    ).sort("day", -1)
+    
+    return {"days": await cursor.to_list(days)}
+
+
+@api_router.get("/activity/weekly")
+async def get_activity_weekly(weeks: int = 4, current_user_id: str = Depends(get_current_user_id)):
+    """
+    Get weekly (ISO week) activity rollups, newest first (max 52)
+    Requires valid JWT token
+    """
+    weeks = max(1, min(weeks, 52))
+    cursor = db[WEEKLY_COLLECTION].find(
+        {"google_id": current_user_id},
+        {"_id": 0}
+    ).sort("week", -1).limit(weeks)
+    
+    return {"weeks": await cursor.to_list(weeks)}
+
+
+# ============================================================================
+# QUEST INSPIRATION ENDPOINTS
+# ============================================================================
+
+def _suggestion_ids_for_texts(texts) -> set:
+    ids = (suggestion_id_for_text(text) for text in texts)
+    return {suggestion_id for suggestion_id in ids if suggestion_id is not None}
+
+
+async def mark_inspiration_used(google_id: str, suggestion_ids, client_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Record inspiration suggestions as used and notify the user's other devices
+
+    Returns:
+        The user's new version (None if the user doesn't exist)
+    """
+    user, changed = await mark_used(db, google_id, suggestion_ids)
+    if changed:
+        await user_cache.invalidate(google_id)
+        await publish_user_change(google_id, [BITMAP_FIELD], user, client_id=client_id)
+    return user
+
+
+def _check_quest_type(quest_type: str):
+    if quest_type not in CATALOGUES:
+        raise HTTPException(status_code=404, detail="Unknown quest type")
+
+
+@api_router.get("/inspiration/{quest_type}")
+async def get_inspiration_catalogue(quest_type: str, authorization: Optional[str] = Header(default=None)):
+    """
+    Get the suggestion catalogue for a quest type, grouped by category
+    With a valid JWT each suggestion is flagged `used` for that user
+    """
+    _check_quest_type(quest_type)
+    
+    google_id = google_id_from_authorization(authorization)
+    bits = await load_used_bits(db, google_id) if google_id else None
+    if bits is None:
+        return {"quest_type": quest_type, "categories": CATALOGUES[quest_type]}
+    
+    return {"quest_type": quest_type, "categories": catalogue_with_used(quest_type, bits)}
+
+
+@api_router.get("/inspiration/{quest_type}/sample", response_model=InspirationSampleResponse)
+async def sample_inspiration(quest_type: str, count: int = 3, current_user_id: str = Depends(get_current_user_id)):
+    """
+    Get up to `count` (max 20) random suggestions the user hasn't used yet
+    Requires valid JWT token
+    """
+    _check_quest_type(quest_type)
+    
+    bits = await load_used_bits(db, current_user_id)
+    if bits is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    picked = sample_unused(quest_type, bits, max(1, min(count, MAX_SAMPLE_COUNT)))
+    return InspirationSampleResponse(
+        suggestions=[describe(suggestion_id) for suggestion_id in picked],
+        remaining=unused_count(quest_type, bits)
+    )
+
+
+@api_router.post("/inspiration/used")
+async def mark_inspiration_suggestions_used(
+    used_request: InspirationUsedRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
+):
+    """
+    Mark suggestions used, by ID or by quest title
+    Titles that aren't catalogue suggestions are ignored
+    Requires valid JWT token
+    """
+    suggestion_ids = {
+        suggestion_id for suggestion_id in used_request.suggestion_ids
+        if 0 <= suggestion_id < len(SUGGESTIONS) and SUGGESTIONS[suggestion_id] is not None
+    } | _suggestion_ids_for_texts(used_request.texts)
+    
+    if not suggestion_ids:
+        return {"success": True, "marked": []}
+    
+    user = await mark_inspiration_used(current_user_id, suggestion_ids, client_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"success": True, "marked": sorted(suggestion_ids)}
 
 
 # ============================================================================
@@ -251,7 +947,8 @@ async def update_user(
 @api_router.post("/promo/redeem", response_model=PromoRedeemResponse)
 async def redeem_promo(
     redeem_request: PromoRedeemRequest,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client_id: Optional[str] = Header(default=None, alias="X-Client-Id", max_length=64)
 ):
     """
     Redeem a promo code
@@ -260,7 +957,7 @@ async def redeem_promo(
     code = redeem_request.code.upper()
     
     # Get user
-    user = await db.users.find_one({"google_id": current_user_id}, {"_id": 0})
+    user = await load_user(current_user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -275,12 +972,39 @@ async def redeem_promo(
     # Find promo code
     promo = await db.promo_codes.find_one({"code": code, "active": True}, {"_id": 0})
     
+    # Fall back to single-use codes generated by promo_batches.py
+    batch_code = None
+    if not promo:
+        batch_code = await db.promo_batch_codes.find_one({"_id": code})
+        if batch_code:
+            if batch_code.get('claimed_by'):
+                return PromoRedeemResponse(
+                    success=False,
+                    message="This promo code has already been redeemed"
+                )
+            batch = await load_promo_batch(batch_code['batch_id'])
+            if batch and batch.get('active'):
+                promo = batch
+    
     if not promo:
         return PromoRedeemResponse(
             success=False,
             message="Invalid or expired promo code"
         )
     
+    # Check schedule window
+    now = datetime.now(timezone.utc)
+    if promo.get('starts_at') and now < datetime.fromisoformat(promo['starts_at']):
+        return PromoRedeemResponse(
+            success=False,
+            message="This promo code isn't active yet"
+        )
+    if promo.get('ends_at') and now >= datetime.fromisoformat(promo['ends_at']):
+        return PromoRedeemResponse(
+            success=False,
+            message="Invalid or expired promo code"
+        )
+    
     # Check max uses
     if promo.get('max_uses') and promo.get('used_count', 0) >= promo['max_uses']:
         return PromoRedeemResponse(
@@ -288,51 +1012,91 @@ async def redeem_promo(
             message="This promo code has reached its usage limit"
         )
     
-    # Apply reward
-    update_dict = {}
+    # Claim single-use codes atomically so only one redemption can win
+    if batch_code:
+        claimed = await db.promo_batch_codes.find_one_and_update(
+            {"_id": code, "claimed_by": {"$exists": False}},
+            {"$set": {"claimed_by": current_user_id, "claimed_at": now.isoformat()}},
+            projection={"_id": 1}
+        )
+        if not claimed:
+            return PromoRedeemResponse(
+                success=False,
+                message="This promo code has already been redeemed"
+            )
+    
+    # Apply reward atomically against the stored document: the cached copy can
+    # be stale on another worker, so the "not used yet" check is part of the
+    # write filter and balances are incremented rather than overwritten
     reward_type = promo['type']
+    now_iso = datetime.now(timezone.utc).isoformat()
+    update_ops = {
+        "$push": {"used_promo_codes": code},
+        "$set": {"updated_at": now_iso},
+        "$inc": {"version": 1}
+    }
     
     if reward_type == 'xp':
-        update_dict['xp'] = user.get('xp', 0) + promo['amount']
         reward_amount = promo['amount']
+        update_ops["$inc"]["xp"] = reward_amount
         message = f"Redeemed! +{reward_amount} XP"
     elif reward_type == 'coins':
-        update_dict['coins'] = user.get('coins', 0) + promo['amount']
         reward_amount = promo['amount']
+        update_ops["$inc"]["coins"] = reward_amount
         message = f"Redeemed! +{reward_amount} Coins"
     elif reward_type == 'item':
-        # Add item to inventory (inventory is an array)
-        inventory = user.get('inventory', [])
-        if not isinstance(inventory, list):
-            # Migration: convert old dict inventory to array
-            inventory = []
-        
         item_id = promo['item_id']
-        # Add item as object to array
-        inventory.append({'name': item_id, 'count': 1})
-        update_dict['inventory'] = inventory
+        update_ops["$push"]["inventory"] = {'name': item_id, 'count': 1}
         reward_amount = 1
         message = f"Redeemed! {item_id} added to inventory"
     else:
         raise HTTPException(status_code=500, detail="Invalid promo code type")
     
-    # Update user
-    used_codes.append(code)
-    update_dict['used_promo_codes'] = used_codes
-    update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
+    # BEFORE, because the updated document no longer matches the filter
+    before = await write_hot_user(db, current_user_id, lambda: db.users.find_one_and_update(
+        {"google_id": current_user_id, "used_promo_codes": {"$ne": code}, **HOT_USER},
+        update_ops,
+        projection={"_id": 0, "xp": 1, "coins": 1, "version": 1},
+        return_document=ReturnDocument.BEFORE
+    ))
+    await user_cache.invalidate(current_user_id)
     
-    await db.users.update_one(
-        {"google_id": current_user_id},
-        {"$set": update_dict}
+    if before is None:
+        # Redeemed concurrently (or from a stale cache entry): give the code back
+        if batch_code:
+            await db.promo_batch_codes.update_one(
+                {"_id": code, "claimed_by": current_user_id},
+                {"$unset": {"claimed_by": "", "claimed_at": ""}}
+            )
+        return PromoRedeemResponse(
+            success=False,
+            message="You've already used this promo code!"
+        )
+    
+    changed = ['used_promo_codes', 'updated_at']
+    values = {'updated_at': now_iso}
+    if reward_type == 'item':
+        changed.append('inventory')
+    else:
+        changed.append(reward_type)
+        values[reward_type] = before.get(reward_type, 0) + reward_amount
+    await publish_user_change(
+        current_user_id, changed, {'version': before.get('version', 0) + 1}, values, client_id=client_id
     )
     
     # Increment promo code usage
-    await db.promo_codes.update_one(
-        {"code": code},
-        {"$inc": {"used_count": 1}}
-    )
+    if batch_code:
+        await db.promo_batches.update_one(
+            {"batch_id": batch_code['batch_id']},
+            {"$inc": {"used_count": 1}}
+        )
+    else:
+        await db.promo_codes.update_one(
+            {"code": code},
+            {"$inc": {"used_count": 1}}
+        )
     
-    logger.info(f"User {current_user_id} redeemed promo: {code}")
+    logger.info("User %s redeemed promo: %s", current_user_id, code)
     
     return PromoRedeemResponse(
         success=True,
@@ -343,6 +1107,134 @@ async def redeem_promo(
     )
 
 
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+@api_router.get("/admin/profiling")
+async def get_profiling(admin_id: str = Depends(get_admin_user_id)):
+    """
+    Current request profiling settings
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    return profiling_state.config.to_dict()
+
+
+@api_router.put("/admin/profiling")
+async def set_profiling(
+    config_request: ProfilingConfigRequest,
+    admin_id: str = Depends(get_admin_user_id)
+):
+    """
+    Profile a sampled fraction of requests, route prefixes or users
+    Applies to every worker within PROFILE_CONFIG_REFRESH_SECONDS and
+    expires after ttl_seconds
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    doc = {
+        'sample_rate': config_request.sample_rate,
+        'routes': config_request.routes,
+        'google_ids': config_request.google_ids,
+        'expires_at': datetime.now(timezone.utc) + timedelta(seconds=config_request.ttl_seconds),
+        'updated_by': admin_id,
+    }
+    await db[RUNTIME_CONFIG_COLLECTION].replace_one({'_id': PROFILING_CONFIG_ID}, doc, upsert=True)
+    profiling_state.apply(doc)
+    logger.info("🔬 [Profile] Profiling settings changed by %s: %s", admin_id, profiling_state.config.to_dict())
+    return profiling_state.config.to_dict()
+
+
+@api_router.delete("/admin/profiling")
+async def reset_profiling(admin_id: str = Depends(get_admin_user_id)):
+    """
+    Revert profiling to the environment defaults
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    await db[RUNTIME_CONFIG_COLLECTION].delete_one({'_id': PROFILING_CONFIG_ID})
+    profiling_state.apply(None)
+    return profiling_state.config.to_dict()
+
+
+@api_router.get("/admin/analytics")
+async def get_analytics_status(admin_id: str = Depends(get_admin_user_id)):
+    """
+    When the analytics summaries were last refreshed
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    state = await db[JOB_STATE_COLLECTION].find_one(
+        {"_id": ANALYTICS_JOB_ID},
+        {"_id": 0, "watermark": 1, "last_run_at": 1, "last_run_seconds": 1}
+    )
+    return state or {"last_run_at": None}
+
+
+@api_router.get("/admin/analytics/daily")
+async def get_analytics_daily(days: int = 30, admin_id: str = Depends(get_admin_user_id)):
+    """
+    Daily active users and signups for the last `days` days (max 366), newest first
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    days = max(1, min(days, 366))
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    cursor = db[DAILY_STATS_COLLECTION].find({"_id": {"$gte": since}}, {"_id": 0}).sort("_id", -1)
+    
+    return {"days": await cursor.to_list(days)}
+
+
+@api_router.get("/admin/analytics/retention")
+async def get_analytics_retention(cohorts: int = 12, admin_id: str = Depends(get_admin_user_id)):
+    """
+    Monthly retention of the latest `cohorts` signup-month cohorts (max 60)
+    Each month lists the cohort's active users and their share of the cohort
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    cohorts = max(1, min(cohorts, 60))
+    cohort_docs = await db[COHORTS_COLLECTION].find(
+        {"_id": {"$ne": UNKNOWN_COHORT}}, {"_id": 0}
+    ).sort("_id", -1).to_list(cohorts)
+    
+    names = [doc['cohort'] for doc in cohort_docs]
+    months = {}
+    async for doc in db[RETENTION_COLLECTION].find({"cohort": {"$in": names}}, {"_id": 0}):
+        months.setdefault(doc['cohort'], []).append(doc)
+    
+    for doc in cohort_docs:
+        doc['months'] = [
+            {
+                "month": month['month'],
+                "active_users": month['active_users'],
+                "retention": round(month['active_users'] / doc['users'], 4) if doc['users'] else None
+            }
+            for month in sorted(months.get(doc['cohort'], []), key=lambda m: m['month'])
+        ]
+    
+    return {"cohorts": cohort_docs}
+
+
+@api_router.get("/admin/analytics/promos")
+async def get_analytics_promos(admin_id: str = Depends(get_admin_user_id)):
+    """
+    Redemptions and redemption rate of every promo code and batch
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    cursor = db[PROMOS_COLLECTION].find({}, {"_id": 0}).sort("redemptions", -1)
+    
+    return {"promos": await cursor.to_list(None)}
+
+
+@api_router.get("/admin/analytics/economy")
+async def get_analytics_economy(days: int = 30, admin_id: str = Depends(get_admin_user_id)):
+    """
+    Daily coin economy snapshots for the last `days` days (max 366), newest first
+    Requires an admin JWT (ADMIN_GOOGLE_IDS)
+    """
+    days = max(1, min(days, 366))
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    cursor = db[ECONOMY_COLLECTION].find({"_id": {"$gte": since}}, {"_id": 0}).sort("_id", -1)
+    
+    return {"days": await cursor.to_list(days)}
+
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -356,7 +1248,10 @@ async def root():
             "auth": "/api/auth/google",
             "user": "/api/user/{google_id}",
             "update": "/api/user/update",
-            "promo": "/api/promo/redeem"
+            "promo": "/api/promo/redeem",
+            "store": "/api/store/purchase",
+            "events": "/api/events",
+            "inspiration": "/api/inspiration/{quest_type}"
         }
     }
 
@@ -364,45 +1259,82 @@ async def root():
 async def health_check():
     """
     Health check endpoint for production monitoring
-    Returns OK if service is running and DB is accessible
+    Answers from the background prober's cached state (no DB round trip)
+    Returns 503 once the instance is no longer ready
     """
-    try:
-        # Ping MongoDB to verify connection
-        await db.command('ping')
-        
-        return {
-            "ok": True,
-            "status": "healthy",
-            "environment": os.environ.get('ENVIRONMENT', 'production'),
-            "database": "connected",
-            "version": "1.0.0"
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        raise HTTPException(
-            status_code=503,
-            detail={"ok": False, "status": "unhealthy", "error": str(e)}
-        )
+    snapshot = health_monitor.snapshot()
+    if not snapshot['ready']:
+        raise HTTPException(status_code=503, detail=snapshot)
+    
+    return {
+        **snapshot,
+        "environment": os.environ.get('ENVIRONMENT', 'production'),
+        "version": "1.0.0"
+    }
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
-# CORS middleware
+# Replay stored responses for retried mutating requests (Idempotency-Key header)
+app.add_middleware(IdempotencyMiddleware, get_collection=lambda: db.idempotency_keys)
+
+# Reject oversized request bodies while they stream in
+app.add_middleware(BodySizeLimitMiddleware)
+
+# CORS middleware (added last so it wraps replayed responses too)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Opt-in profiling (no-op unless enabled by env or the admin API)
+app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so every log line (including CORS/413 rejections) has an ID
+app.add_middleware(RequestIdMiddleware)
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Redemption and catalogue sync both look codes up by value
+    await db.promo_codes.create_index("code", unique=True)
+    await db.promo_batches.create_index("batch_id", unique=True)
+    await ensure_activity_collections(db)
+    await ensure_idempotency_indexes(db.idempotency_keys)
+    await ensure_archive_indexes(db)
+    await ensure_analytics_indexes(db)
+
+
+background_tasks = []
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await notifier.start()
+    background_tasks.append(asyncio.create_task(health_monitor.run()))
+    background_tasks.append(asyncio.create_task(profiling_state.refresh_loop(lambda: db)))
+    if ROLLUP_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(rollup_loop(db)))
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(archive_loop(db)))
+    if ANALYTICS_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(analytics_loop(db)))
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await notifier.stop()
     client.close()
     logger.info("MongoDB connection closed")
+    log_listener.stop()
 
-import logging
-for r in app.router.routes:
-    logging.getLogger(__name__).info(f"Route: {getattr(r, 'path', '')} – {getattr(r, 'methods', '')}")
+if logger.isEnabledFor(logging.DEBUG):
+    for r in app.router.routes:
+        logger.debug("Route: %s – %s", getattr(r, 'path', ''), getattr(r, 'methods', ''))
  
\ No newline at end of file
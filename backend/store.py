@@ -0,0 +1,73 @@
+# Server-side reward store catalogue
+#
+# Keep in sync with frontend/src/components/RewardStore.js (storeItems) and
+# frontend/src/utils/avatars.js (PAID_AVATARS). Prices are authoritative here;
+# the client-side copies are only for display. The catalogue is built once at
+# import into dicts keyed by ID, so purchases never touch the database for it.
+from typing import Any, Dict, List, Optional
+
+STORE_ITEMS: Dict[str, Dict[str, Any]] = {
+    item['id']: item for item in [
+        {
+            'id': 'streak_freeze',
+            'icon': '❄️',
+            'name': 'Streak Freeze',
+            'description': 'Freeze your streak! When your streak would break, you have 24 hours to complete your quests and maintain it.',
+            'price': 20,
+        },
+        {
+            'id': 'xp_multiplier',
+            'icon': '⚡',
+            'name': 'XP Multiplier',
+            'description': '2x XP for 2 Hours! All quests give double experience points.',
+            'price': 15,
+        },
+    ]
+}
+
+STORE_AVATARS: Dict[str, Dict[str, Any]] = {
+    avatar['id']: avatar for avatar in [
+        {'id': 'troll', 'name': 'Troll', 'price': 5},
+        {'id': 'vampire-male', 'name': 'Vampire', 'price': 10},
+        {'id': 'vampire-female', 'name': 'Vampire Woman', 'price': 10},
+        {'id': 'prince', 'name': 'Prince', 'price': 10},
+        {'id': 'princess', 'name': 'Princess', 'price': 10},
+        {'id': 'superhero-male', 'name': 'Superhero', 'price': 10},
+        {'id': 'superhero-female', 'name': 'Superhero Woman', 'price': 10},
+        {'id': 'fairy', 'name': 'Fairy', 'price': 10},
+        {'id': 'zombie-male', 'name': 'Zombie', 'price': 10},
+        {'id': 'zombie-female', 'name': 'Zombie Woman', 'price': 10},
+        {'id': 'levitating-male', 'name': 'Levitating', 'price': 15},
+        {'id': 'levitating-female', 'name': 'Levitating Woman', 'price': 15},
+        {'id': 'ninja', 'name': 'Ninja', 'price': 45},
+        {'id': 'mage', 'name': 'Mage', 'price': 50},
+    ]
+}
+
+# How many recent purchase idempotency keys are remembered per user
+PURCHASE_KEY_HISTORY = 50
+
+
+def get_catalogue_entry(kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+    """Look up an item or avatar by ID"""
+    catalogue = STORE_AVATARS if kind == 'avatar' else STORE_ITEMS
+    return catalogue.get(item_id)
+
+
+def inventory_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Inventory record for a purchased item (same shape the client creates)"""
+    return {
+        'id': item['id'],
+        'name': item['name'],
+        'icon': item['icon'],
+        'description': item['description'],
+        'canUse': True,
+    }
+
+
+def without_one(inventory: List[Dict[str, Any]], item_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Inventory with the first `item_id` entry removed, or None if there is none"""
+    for index, entry in enumerate(inventory):
+        if isinstance(entry, dict) and entry.get('id') == item_id:
+            return inventory[:index] + inventory[index + 1:]
+    return None
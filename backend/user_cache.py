@@ -0,0 +1,170 @@
+# Read-through cache for user documents
+#
+# Repeat reads of the same user (login followed by GET /api/user, promo
+# redemption, ...) are served from memory instead of a MongoDB round trip.
+# Every write path must call `invalidate` (or `set` with the fresh document).
+# A load that overlaps an invalidation is returned but not cached, so a
+# concurrent write can't leave the pre-write document cached for a whole TTL.
+# With the local backend and several workers, writes made by other workers
+# reach this worker's cache through the realtime notifier (see server.py).
+import copy
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class LocalCacheBackend:
+    """
+    Per-process, size-bounded LRU with per-entry TTL
+
+    Also serves as the stand-in for the shared backend in tests.
+    """
+
+    def __init__(self, max_size: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self.discard(key)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Shared cache backend so all workers/instances see the same invalidations
+
+    Requires the optional `redis` package (redis>=4.2 for redis.asyncio).
+    """
+
+    def __init__(self, url: str, prefix: str = 'ascend:user:'):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("USER_CACHE_REDIS_URL is set but the 'redis' package is not installed") from e
+        self._redis = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        await self._redis.set(self._prefix + key, json.dumps(value, default=str), px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
+
+
+class UserCache:
+    """
+    Read-through cache of user documents keyed by google_id
+
+    Documents are copied on the way in and out so callers can mutate what
+    they get back without corrupting the cached entry.
+    """
+
+    def __init__(self, backend=None, ttl: float = 30.0):
+        self.backend = backend if backend is not None else LocalCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # google_id -> token of the load in flight; invalidate() drops it
+        self._loads: Dict[str, object] = {}
+
+    async def get(
+        self,
+        google_id: str,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the user document, loading and caching it on a miss
+
+        Args:
+            google_id: User's Google ID
+            loader: Coroutine function fetching the document from the database
+
+        Returns:
+            A private copy of the user document, or None if it doesn't exist
+        """
+        if self.ttl > 0:
+            cached = await self.backend.get(google_id)
+            if cached is not None:
+                self.hits += 1
+                return copy.deepcopy(cached)
+
+        self.misses += 1
+        token = object()
+        self._loads[google_id] = token
+        try:
+            user = await loader(google_id)
+            # Only cache it if no write invalidated the key while we loaded
+            if user is not None and self._loads.get(google_id) is token:
+                await self.set(google_id, user)
+        finally:
+            if self._loads.get(google_id) is token:
+                del self._loads[google_id]
+        return user
+
+    async def set(self, google_id: str, user: Dict[str, Any]) -> None:
+        """Store a fresh copy of a user document (call after a full write)"""
+        if self.ttl > 0:
+            await self.backend.set(google_id, copy.deepcopy(user), self.ttl)
+
+    async def invalidate(self, google_id: str) -> None:
+        """Drop a user document (call after any partial write)"""
+        self._loads.pop(google_id, None)
+        await self.backend.delete(google_id)
+
+    def forget_local(self, google_id: str) -> None:
+        """
+        Drop this process's copy after a write made elsewhere (another worker)
+
+        Synchronous so it can run from the realtime dispatcher. A shared
+        backend was already invalidated by the writer, so only local state
+        is touched.
+        """
+        self._loads.pop(google_id, None)
+        if isinstance(self.backend, LocalCacheBackend):
+            self.backend.discard(google_id)
+
+
+def create_user_cache_from_env() -> UserCache:
+    """
+    Build the user cache from environment variables
+
+    USER_CACHE_TTL_SECONDS  entry lifetime, 0 disables the cache (default 30)
+    USER_CACHE_SIZE         max entries in the local LRU (default 10000)
+    USER_CACHE_REDIS_URL    use a shared Redis backend instead of the local LRU
+    """
+    ttl = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+    redis_url = os.environ.get('USER_CACHE_REDIS_URL')
+    if redis_url:
+        backend = RedisCacheBackend(redis_url)
+    else:
+        backend = LocalCacheBackend(max_size=int(os.environ.get('USER_CACHE_SIZE', 10000)))
+    return UserCache(backend=backend, ttl=ttl)
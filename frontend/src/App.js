@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Gamepad2, Settings as SettingsIcon, User, ShoppingBag, Wifi, WifiOff } from 'lucide-react';
 import { Toaster } from './components/ui/sonner';
@@ -24,20 +24,37 @@ import WelcomeModal from './components/WelcomeModal';
 import TodaySummaryCard from './components/TodaySummaryCard';
 import PhoenixUnlockModal from './components/PhoenixUnlockModal';
 import { loadGameData, saveGameData, getInitialGameState } from './utils/localStorage';
-import { logXPGain, logCoinsEarned, logQuestCompletion, logStreakChange, cleanOldLogs } from './utils/dailyLogs';
+import { logXPGain, logCoinsEarned, logQuestCompletion, logStreakChange, cleanOldLogs, getTodayLog, updateTodayLog, emitDailyLogsUpdate } from './utils/dailyLogs';
 import { checkLevelUp, checkStreakStatus, getWeekStart, calculateLevel } from './utils/gameLogic';
 import { checkAchievements } from './utils/achievements';
 import { soundManager } from './utils/soundEffects';
-import { getXPMultiplier, activateXPMultiplier, activateStreakFreeze, isStreakFreezeActive, useStreakFreeze, migrateStreakSaverToFreeze } from './utils/effectsUtils';
+import { getXPMultiplier, activateXPMultiplier, activateStreakFreeze, isStreakFreezeActive, useStreakFreeze, migrateStreakSaverToFreeze, setGlobalMiniGameCooldownUntil } from './utils/effectsUtils';
 import { applyFluentEmoji, preloadEmojis, COMMON_EMOJI } from './utils/fluentEmoji';
 import FluentEmoji from './components/FluentEmoji';
 import { updateQuestStreak, checkMilestoneRewards, getActiveStreaks } from './utils/streakSystem';
 import { redeemPromoCode } from './utils/promoCodes';
-import { authenticateWithGoogle, updateUserData, checkOnlineStatus } from './utils/api';
+import { authenticateWithGoogle, getUserData, updateUserData, checkOnlineStatus, newIdempotencyKey, purchaseStoreItem, consumeStoreItem, playMiniGame, subscribeToUserChanges, markInspirationUsed, incrementStats, sendActivityEvents, getTodayActivity } from './utils/api';
 import { normalizeGameState, mergeGameStates } from './utils/stateNormalizer';
 import { triggerLevelUpConfetti, triggerStreakConfetti, triggerPhoenixConfetti } from './utils/confettiEffects';
 import '@/App.css';
 
+// Lifetime counters kept on the server with $inc (purchases and mini-game
+// plays are counted by their own endpoints)
+const STAT_COUNTERS = ['totalXPEarned', 'totalQuestsCompleted', 'totalCoinsEarned', 'mainQuestsCompleted'];
+// Balances reported the same way, but only ever added to (spending goes
+// through /api/store/purchase, which returns the new balance)
+const EARNED_BALANCES = ['coins'];
+
+// Server limits on /api/activity/events requests (events per batch, and
+// the magnitude of an event's amount)
+const ACTIVITY_BATCH_SIZE = 500;
+const ACTIVITY_MAX_AMOUNT = 100000;
+
+const pickStatCounters = (state) =>
+  Object.fromEntries([...STAT_COUNTERS, ...EARNED_BALANCES].map(field => [field, state[field] || 0]));
+
+const pickStreaks = (state) => ({ daily: state.dailyStreak || 0, weekly: state.weeklyStreak || 0 });
+
 function App() {
   const [gameState, setGameState] = useState(null);
   const [showMiniGames, setShowMiniGames] = useState(false);
@@ -56,6 +73,13 @@ function App() {
   const [isOnline, setIsOnline] = useState(false);
   const [syncStatus, setSyncStatus] = useState('synced'); // 'synced' | 'saving' | 'offline'
   const [hasUnsyncedChanges, setHasUnsyncedChanges] = useState(false);
+  const serverVersionRef = useRef(null); // last user doc version seen from the server
+  const remoteUpdateRef = useRef(false); // next state change came from another device
+  const statsBaselineRef = useRef(null); // lifetime counters as last reported to the server
+  const activityQueueRef = useRef([]); // activity events waiting to be sent
+  const streaksRef = useRef(null); // daily/weekly streaks as last logged
+  const pendingPurchaseKeysRef = useRef({}); // Idempotency-Keys of unconfirmed purchases, by item
+  const pendingPlayKeysRef = useRef({}); // Idempotency-Keys of unconfirmed mini-game claims, by game
 
   // Initialize game state and check login
   useEffect(() => {
@@ -84,6 +108,8 @@ function App() {
     
     const savedData = loadGameData(); // Already normalized by loadGameData
     if (savedData) {
+      // Streak resets below are logged against the saved streaks
+      streaksRef.current = pickStreaks(savedData);
       console.log('🔵 [App] Loaded data - inventory is array:', Array.isArray(savedData.inventory));
       
       // Check if tutorial completed
@@ -190,6 +216,7 @@ function App() {
       localStorage.setItem('user', JSON.stringify(userData));
       setUser(userData);
       setShowWelcome(false);
+      serverVersionRef.current = response.user.version ?? null;
       
       // Merge server data with local data using normalizer
       const localData = loadGameData() || getInitialGameState();
@@ -199,6 +226,8 @@ function App() {
       
       const mergedState = mergeGameStates(serverData, localData);
       
+      statsBaselineRef.current = null; // the merged counters already reflect the server
+      streaksRef.current = null;
       setGameState(mergedState);
       saveGameData(mergedState);
       
@@ -263,7 +292,6 @@ function App() {
       await updateUserData({
         xp: state.xp,
         level: state.level,
-        coins: state.coins,
         quests: {
           daily: state.dailyQuests,
           weekly: state.weeklyQuests,
@@ -277,14 +305,12 @@ function App() {
           longestWeeklyStreak: state.longestWeeklyStreak
         },
         quest_streaks: state.questStreaks || {},
-        inventory: state.inventory || {},
         active_effects: state.activeEffects || [],
         settings: {
           tutorialCompleted: state.tutorialCompleted,
           soundEnabled: state.soundEnabled
         },
         used_promo_codes: state.usedPromoCodes || [],
-        used_inspiration_suggestions: state.usedInspirationSuggestions || [],
         daily_quest_creation_count: state.dailyQuestCreationCount,
         daily_quest_creation_date: state.dailyQuestCreationDate,
         weekly_quest_creation_count: state.weeklyQuestCreationCount,
@@ -305,6 +331,113 @@ function App() {
     }
   };
 
+  // Send lifetime counter changes since the last report as increments, so
+  // concurrent devices add to the server totals instead of overwriting them
+  const reportStatChanges = (state, token) => {
+    const baseline = statsBaselineRef.current;
+    statsBaselineRef.current = pickStatCounters(state);
+    if (!baseline || !token) return;
+    
+    const increments = {};
+    Object.keys(baseline).forEach(field => {
+      const delta = Math.round((state[field] || 0) - baseline[field]);
+      if (delta > 0 || (delta < 0 && !EARNED_BALANCES.includes(field))) increments[field] = delta;
+    });
+    if (Object.keys(increments).length === 0) return;
+    
+    incrementStats(increments, token).catch(error => {
+      // Keep the unsent deltas for the next report
+      const current = statsBaselineRef.current;
+      if (current) {
+        Object.entries(increments).forEach(([field, delta]) => { current[field] -= delta; });
+      }
+      console.error('Stats update failed:', error);
+    });
+  };
+
+  // Queue an activity event for the server's daily/weekly rollups; the
+  // event_id lets the server skip events that are sent again after a failure
+  const trackActivity = (event) => {
+    if (!user?.token) return;
+    const amount = Math.max(-ACTIVITY_MAX_AMOUNT, Math.min(ACTIVITY_MAX_AMOUNT, event.amount || 0));
+    activityQueueRef.current.push({ ...event, amount, event_id: newIdempotencyKey(), ts: new Date().toISOString() });
+  };
+
+  // Record progress in today's local log and the server activity log
+  const recordXPGain = (amount) => {
+    logXPGain(amount);
+    trackActivity({ type: 'xp', amount: Math.round(amount) });
+  };
+
+  const recordCoinsEarned = (amount) => {
+    logCoinsEarned(amount);
+    trackActivity({ type: 'coins', amount });
+  };
+
+  const recordQuestCompletion = (questType) => {
+    logQuestCompletion(questType);
+    trackActivity({ type: 'quest_completed', quest_type: questType });
+  };
+
+  // Log streak changes (completions, resets, undos) against the streaks
+  // last logged, like the stat counters
+  const recordStreakChanges = (state) => {
+    const previous = streaksRef.current;
+    streaksRef.current = pickStreaks(state);
+    if (!previous) return;
+    
+    Object.entries(streaksRef.current).forEach(([streakType, value]) => {
+      const change = value - previous[streakType];
+      if (change !== 0) {
+        logStreakChange(streakType, change);
+        trackActivity({ type: 'streak_change', streak_type: streakType, amount: change });
+      }
+    });
+  };
+
+  // Send queued activity events in batches (every 30 seconds and on logout)
+  useEffect(() => {
+    if (!user?.token) return;
+    const token = user.token;
+    
+    const flush = () => {
+      const events = activityQueueRef.current.splice(0, ACTIVITY_BATCH_SIZE);
+      if (events.length === 0) return;
+      sendActivityEvents(events, token).catch(error => {
+        // Put them back for the next flush (the server clamps old timestamps)
+        activityQueueRef.current.unshift(...events);
+        console.error('Activity upload failed:', error);
+      });
+    };
+    
+    const interval = setInterval(flush, 30000);
+    return () => {
+      clearInterval(interval);
+      flush();
+    };
+  }, [user?.token]);
+
+  // Fold today's server rollup into the local log, so progress made on
+  // other devices shows up in today's summary
+  useEffect(() => {
+    if (!user?.token) return;
+    
+    getTodayActivity(user.token)
+      .then(summary => {
+        const local = getTodayLog();
+        const maxBy = (a = {}, b = {}) =>
+          Object.fromEntries(Object.keys({ ...a, ...b }).map(key => [key, Math.max(a[key] || 0, b[key] || 0)]));
+        updateTodayLog({
+          xp: Math.max(local.xp, summary.xp || 0),
+          coins: Math.max(local.coins, summary.coins || 0),
+          completed: maxBy(local.completed, summary.completed),
+          streakChanges: maxBy(local.streakChanges, summary.streakChanges)
+        });
+        emitDailyLogsUpdate();
+      })
+      .catch(error => console.error('Failed to load today\'s activity:', error));
+  }, [user?.token]);
+
   // Periodic autosave (every 60 seconds)
   useEffect(() => {
     if (!user?.token) return;
@@ -319,15 +452,73 @@ function App() {
     return () => clearInterval(interval);
   }, [user, hasUnsyncedChanges, gameState]);
 
+  // Pull the full user doc (only when another device changed non-scalar fields)
+  const refreshFromServer = async () => {
+    try {
+      const serverData = await getUserData(user.google_id, user.token);
+      serverVersionRef.current = serverData.version;
+      remoteUpdateRef.current = true;
+      setGameState(prev => prev && {
+        ...mergeGameStates(serverData, prev),
+        xp: serverData.xp,
+        level: serverData.level,
+        coins: serverData.coins
+      });
+    } catch (error) {
+      console.error('Refresh failed:', error);
+    }
+  };
+
+  // Live changes from the user's other devices
+  useEffect(() => {
+    if (!user?.token) return;
+    
+    return subscribeToUserChanges(user.token, {
+      onReady: ({ version }) => {
+        // Catch up on anything missed while disconnected
+        if (serverVersionRef.current !== null && version > serverVersionRef.current) {
+          refreshFromServer();
+        }
+        serverVersionRef.current = version;
+      },
+      onChange: (change) => {
+        serverVersionRef.current = change.version;
+        const values = change.values || {};
+        if (change.fields.some(field => !(field in values))) {
+          refreshFromServer();
+          return;
+        }
+        const scalars = {};
+        ['xp', 'level', 'coins'].forEach(field => {
+          if (field in values) scalars[field] = values[field];
+        });
+        if (Object.keys(scalars).length > 0) {
+          remoteUpdateRef.current = true;
+          setGameState(prev => prev && { ...prev, ...scalars });
+        }
+      }
+    });
+  }, [user?.token]);
+
   // Auto-save and sync whenever game state changes
   useEffect(() => {
     if (gameState && gameState.tutorialCompleted) {
       saveGameData(gameState);
-      setHasUnsyncedChanges(true); // Mark as having unsynced changes
       
-      // Sync to server if logged in (debounced by periodic autosave)
-      if (user?.token) {
-        syncToServer(gameState, user.token);
+      if (remoteUpdateRef.current) {
+        // Already on the server; syncing it back would echo between devices
+        remoteUpdateRef.current = false;
+        statsBaselineRef.current = pickStatCounters(gameState);
+        streaksRef.current = pickStreaks(gameState);
+      } else {
+        setHasUnsyncedChanges(true); // Mark as having unsynced changes
+        
+        // Sync to server if logged in (debounced by periodic autosave)
+        if (user?.token) {
+          syncToServer(gameState, user.token);
+        }
+        reportStatChanges(gameState, user?.token);
+        recordStreakChanges(gameState);
       }
       
       // Check for new achievements
@@ -444,28 +635,75 @@ function App() {
     toast.success('Profile updated!');
   };
 
+  // Adopt a coin balance returned by the server, keeping coins earned on this
+  // device that haven't been reported yet; `update` adds other changes
+  const applyServerCoins = (serverCoins, update = () => ({})) => {
+    const baseline = statsBaselineRef.current;
+    const unreported = baseline ? Math.max(0, gameState.coins - baseline.coins) : 0;
+    if (baseline) baseline.coins = serverCoins;
+    setGameState(prev => ({ ...prev, ...update(prev), coins: serverCoins + unreported }));
+  };
+
+  // Buy on the server when logged in; returns the purchase result (with the
+  // authoritative coin balance), or null for guests, who buy locally. Throws
+  // if the server can't be reached, keeping the Idempotency-Key so buying the
+  // same item again retries that purchase instead of paying twice
+  const purchaseOnServer = async (itemId, kind) => {
+    if (!user?.token) return null;
+    const pendingId = `${kind}:${itemId}`;
+    const idempotencyKey = pendingPurchaseKeysRef.current[pendingId] || newIdempotencyKey();
+    pendingPurchaseKeysRef.current[pendingId] = idempotencyKey;
+    const result = await purchaseStoreItem(itemId, kind, idempotencyKey, user.token);
+    delete pendingPurchaseKeysRef.current[pendingId];
+    return result;
+  };
+
+  // Run a purchase, telling the user why it didn't go through; returns the
+  // server result, null for guests, or undefined if it failed
+  const tryPurchase = async (itemId, kind) => {
+    try {
+      const result = await purchaseOnServer(itemId, kind);
+      if (result && !result.success) {
+        toast.error(result.message);
+        if (result.coins != null) applyServerCoins(result.coins);
+        return undefined;
+      }
+      return result;
+    } catch (error) {
+      console.error('Purchase failed:', error);
+      toast.error('Purchase failed. Check your connection and try again.');
+      return undefined;
+    }
+  };
+
   // Store purchase
-  const handlePurchase = (item) => {
+  const handlePurchase = async (item) => {
     if (gameState.coins < item.price) {
       toast.error('Not enough coins!');
       return;
     }
 
-    const newItem = {
+    const result = await tryPurchase(item.id, 'item');
+    if (result === undefined) return;
+
+    const newItem = result?.item || {
       id: item.id,
       name: item.name,
       icon: item.icon,
       description: item.description,
       canUse: true
     };
-
-    setGameState(prev => ({
-      ...prev,
-      coins: prev.coins - item.price,
+    const grant = prev => ({
       totalCoinsSpent: prev.totalCoinsSpent + item.price,
       totalPurchases: prev.totalPurchases + 1,
       inventory: [...prev.inventory, newItem]
-    }));
+    });
+
+    if (result) {
+      applyServerCoins(result.coins, grant);
+    } else {
+      setGameState(prev => ({ ...prev, ...grant(prev), coins: prev.coins - item.price }));
+    }
 
     soundManager.play('itemPurchase');
     toast.success(`${item.name} added to inventory! ✨`, {
@@ -473,11 +711,11 @@ function App() {
     });
     
     // Log coins spent
-    logCoinsEarned(-item.price);
+    recordCoinsEarned(-item.price);
   };
 
   // Avatar purchase handler
-  const handlePurchaseAvatar = (avatar) => {
+  const handlePurchaseAvatar = async (avatar) => {
     if (gameState.coins < avatar.price) {
       toast.error('Not enough coins!');
       return;
@@ -488,13 +726,20 @@ function App() {
       return;
     }
 
-    setGameState(prev => ({
-      ...prev,
-      coins: prev.coins - avatar.price,
+    const result = await tryPurchase(avatar.id, 'avatar');
+    if (result === undefined) return;
+
+    const grant = prev => ({
       totalCoinsSpent: prev.totalCoinsSpent + avatar.price,
       totalPurchases: prev.totalPurchases + 1,
       unlockedAvatars: [...(prev.unlockedAvatars || []), avatar.id]
-    }));
+    });
+
+    if (result) {
+      applyServerCoins(result.coins, grant);
+    } else {
+      setGameState(prev => ({ ...prev, ...grant(prev), coins: prev.coins - avatar.price }));
+    }
 
     soundManager.play('itemPurchase');
     toast.success(`${avatar.name} avatar unlocked! 🎉`, {
@@ -502,6 +747,14 @@ function App() {
     });
   };
 
+  // Tell the server an inventory item was used up (its effect is local)
+  const consumeItemOnServer = (itemId) => {
+    if (!user?.token) return;
+    consumeStoreItem(itemId, user.token).catch(error => {
+      console.error('Failed to record item use:', error);
+    });
+  };
+
   // Streak mode toggle handler
   const handleToggleStreakMode = (enabled) => {
     setGameState(prev => ({
@@ -530,6 +783,7 @@ function App() {
 
     // Activate multiplier
     activateXPMultiplier();
+    consumeItemOnServer('xp_multiplier');
 
     // Remove from inventory (filter out one xp_multiplier item)
     setGameState(prev => {
@@ -560,6 +814,8 @@ function App() {
 
     // Activate streak freeze
     activateStreakFreeze();
+    const freeze = (gameState.inventory || []).find(item => item.id === 'streak_freeze' || item.id === 'streak_saver');
+    if (freeze) consumeItemOnServer(freeze.id);
 
     // Remove from inventory (filter out one streak_freeze item)
     setGameState(prev => {
@@ -622,8 +878,8 @@ function App() {
     toast.success('Main Quest Completed! 🎉', { description: '+200 XP earned!' });
     
     // Log to daily logs
-    logXPGain(200);
-    logQuestCompletion('main');
+    recordXPGain(200);
+    recordQuestCompletion('main');
   };
 
   const handleToggleObjective = (index) => {
@@ -800,11 +1056,11 @@ function App() {
       // Don't show manual multiplier toast here since addXP handles it
       
       // Log to daily logs
-      logXPGain(totalXP + totalMilestoneXP);
-      logQuestCompletion('daily');
+      recordXPGain(totalXP + totalMilestoneXP);
+      recordQuestCompletion('daily');
     } else {
       // Undo - subtract from daily logs
-      logXPGain(-(totalXP || baseXP));
+      recordXPGain(-(totalXP || baseXP));
     }
   };
 
@@ -974,12 +1230,12 @@ function App() {
     toast.success('Progress Updated! 💪', { description: `+${xpGained} XP earned!` });
     
     // Log to daily logs
-    logXPGain(xpGained);
+    recordXPGain(xpGained);
     
     // Check if quest is complete
     const updatedQuest = gameState.weeklyQuests[index];
     if (updatedQuest && updatedQuest.current >= updatedQuest.target) {
-      logQuestCompletion('weekly');
+      recordQuestCompletion('weekly');
     }
   };
 
@@ -1068,8 +1324,8 @@ function App() {
     toast.success('Side Quest Completed! ✅', { description: `+${quest.xp} XP earned!` });
     
     // Log to daily logs
-    logXPGain(quest.xp);
-    logQuestCompletion('side');
+    recordXPGain(quest.xp);
+    recordQuestCompletion('side');
     
     // Auto-remove after 5 minutes
     setTimeout(() => {
@@ -1105,8 +1361,37 @@ function App() {
   };
 
   // Mini-game handlers
-  const handleClaimReward = (coins) => {
-    const gameId = 'general'; // You can track specific games if needed
+  const handleClaimReward = async (coins, miniGameId) => {
+    // Stat key matches achievements (e.g. 'focus-hunt' -> 'focusHunt')
+    const gameId = miniGameId
+      ? miniGameId.replace(/-([a-z])/g, (_, c) => c.toUpperCase())
+      : 'general';
+    
+    // The server owns the cooldown and the reward when logged in. A claim
+    // that fails keeps its Idempotency-Key, so claiming again can't pay twice
+    let serverResult = null;
+    if (user?.token && miniGameId) {
+      const pendingKeys = pendingPlayKeysRef.current;
+      pendingKeys[miniGameId] = pendingKeys[miniGameId] || newIdempotencyKey();
+      try {
+        const result = await playMiniGame(miniGameId, user.token, pendingKeys[miniGameId]);
+        delete pendingKeys[miniGameId];
+        setGlobalMiniGameCooldownUntil(result.next_eligible_at);
+        if (!result.success) {
+          toast.error(result.message);
+          return;
+        }
+        serverResult = result;
+        // The play endpoint already counted these coins in totalCoinsEarned
+        if (statsBaselineRef.current) {
+          statsBaselineRef.current.totalCoinsEarned += result.reward;
+        }
+      } catch (error) {
+        console.error('Mini-game claim failed on server:', error);
+        toast.error('Could not claim the reward. Check your connection and try again.');
+        return;
+      }
+    }
     
     // Set cooldown
     const cooldownEnd = Date.now() + (60 * 60 * 1000); // 1 hour
@@ -1122,7 +1407,20 @@ function App() {
       }
     }));
     
-    addCoins(coins);
+    if (serverResult) {
+      // Take the server's balance rather than adding our own reward to a possibly stale one
+      soundManager.play('coinCollect');
+      const earned = prev => ({ totalCoinsEarned: prev.totalCoinsEarned + serverResult.reward });
+      if (serverResult.coins != null) {
+        applyServerCoins(serverResult.coins, earned);
+      } else {
+        setGameState(prev => ({ ...prev, ...earned(prev), coins: prev.coins + serverResult.reward }));
+      }
+      toast.success(`+${serverResult.reward} Coins earned! 🪙`);
+    } else {
+      addCoins(coins);
+    }
+    trackActivity({ type: 'minigame_played', game: gameId, amount: serverResult ? serverResult.reward : coins });
   };
 
   // Daily Check-In handler
@@ -1197,9 +1495,9 @@ function App() {
       
       // Log rewards
       if (reward.type === 'xp') {
-        logXPGain(reward.amount);
+        recordXPGain(reward.amount);
       } else if (reward.type === 'coins') {
-        logCoinsEarned(reward.amount);
+        recordCoinsEarned(reward.amount);
       }
     }
     
@@ -1212,6 +1510,12 @@ function App() {
       ...prev,
       usedSuggestions: [...(prev.usedSuggestions || []), suggestion.toLowerCase()]
     }));
+    // The server keeps the authoritative used set (ignores titles that aren't suggestions)
+    if (user?.token) {
+      markInspirationUsed([suggestion], user.token).catch(error => {
+        console.error('Failed to mark suggestion used:', error);
+      });
+    }
   };
 
   if (!gameState) {
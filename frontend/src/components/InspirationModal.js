@@ -1,26 +1,56 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from './ui/dialog';
 import { Button } from './ui/button';
 import { Lightbulb, Shuffle, Check } from 'lucide-react';
-import { 
-  getSuggestionsForType, 
-  getRandomSuggestion, 
-  getQuestTypeTitle,
-  QUEST_DEFINITIONS 
-} from '../utils/questInspiration';
+import { getQuestTypeTitle, QUEST_DEFINITIONS } from '../utils/questInspiration';
+import { getInspirationCatalogue, getSavedToken, sampleInspiration } from '../utils/api';
 
 const InspirationModal = ({ isOpen, onClose, questType, onSelectSuggestion, usedSuggestions = [] }) => {
   const [selectedSuggestion, setSelectedSuggestion] = useState(null);
+  const [categories, setCategories] = useState([]);
+  const [loadError, setLoadError] = useState(null);
   
-  const suggestions = getSuggestionsForType(questType);
   const title = getQuestTypeTitle(questType);
   const definition = QUEST_DEFINITIONS[questType];
 
-  const handleRandomSuggestion = () => {
-    const random = getRandomSuggestion(questType);
-    setSelectedSuggestion(random);
-    onSelectSuggestion(random);
+  // The catalogue (with this user's used flags) comes from the server
+  useEffect(() => {
+    if (!isOpen) return;
+    let cancelled = false;
+    setLoadError(null);
+    getInspirationCatalogue(questType, getSavedToken())
+      .then(data => { if (!cancelled) setCategories(data.categories); })
+      .catch(error => { if (!cancelled) setLoadError(error.message); });
+    return () => { cancelled = true; };
+  }, [isOpen, questType]);
+
+  const isSuggestionUsed = (item) => {
+    return item.used || usedSuggestions.includes(item.text.toLowerCase());
+  };
+
+  const handleRandomSuggestion = async () => {
+    const token = getSavedToken();
+    let random = null;
+    if (token) {
+      try {
+        const { suggestions } = await sampleInspiration(questType, 1, token);
+        random = suggestions[0]?.text || null;
+      } catch (error) {
+        console.error('Failed to sample inspiration:', error);
+      }
+    }
+    if (!random) {
+      // Signed out or offline: pick locally from what's loaded
+      const items = categories.flatMap(category => category.suggestions);
+      const unused = items.filter(item => !isSuggestionUsed(item));
+      const pool = unused.length ? unused : items;
+      random = pool.length ? pool[Math.floor(Math.random() * pool.length)].text : null;
+    }
+    if (random) {
+      setSelectedSuggestion(random);
+      onSelectSuggestion(random);
+    }
   };
 
   const handleSelectSuggestion = (suggestion) => {
@@ -28,10 +58,6 @@ const InspirationModal = ({ isOpen, onClose, questType, onSelectSuggestion, used
     onSelectSuggestion(suggestion);
   };
 
-  const isSuggestionUsed = (suggestion) => {
-    return usedSuggestions.includes(suggestion.toLowerCase());
-  };
-
   return (
     <Dialog open={isOpen} onOpenChange={onClose}>
       <DialogContent className="max-w-3xl max-h-[85vh] bg-gray-900/90 backdrop-blur-lg border border-gray-700/50 overflow-hidden flex flex-col">
@@ -61,19 +87,24 @@ const InspirationModal = ({ isOpen, onClose, questType, onSelectSuggestion, used
             🎲 Random Suggestion
           </Button>
 
+          {loadError && (
+            <p className="text-sm text-red-400 mb-4">Couldn't load suggestions: {loadError}</p>
+          )}
+
           {/* Suggestions Section */}
           <div className="space-y-4">
-            {Object.entries(suggestions).map(([category, items]) => (
+            {categories.map(({ name: category, suggestions: items }) => (
               <div key={category}>
                 <h3 className="text-lg font-semibold text-gray-300 mb-2">{category}</h3>
                 <div className="space-y-2">
-                  {items.map((suggestion, index) => {
-                    const isUsed = isSuggestionUsed(suggestion);
+                  {items.map((item) => {
+                    const suggestion = item.text;
+                    const isUsed = isSuggestionUsed(item);
                     const isSelected = selectedSuggestion === suggestion;
                     
                     return (
                       <motion.button
-                        key={index}
+                        key={item.id}
                         onClick={() => handleSelectSuggestion(suggestion)}
                         whileHover={{ scale: 1.02 }}
                         whileTap={{ scale: 0.98 }}
@@ -75,37 +75,37 @@ const MiniGames = ({ isOpen, onClose, onClaimReward }) => {
   const [claimingGame, setClaimingGame] = useState(null);
   const [globalCooldown, setGlobalCooldown] = useState({ isAvailable: true });
 
-  // Update GLOBAL cooldown every second
+  // Read the GLOBAL cooldown and schedule a single timer for when it ends
   useEffect(() => {
     if (!isOpen) return;
 
-    const updateCooldown = () => {
-      const cooldownInfo = getGlobalMiniGameCooldown(); // Global cooldown for ALL games
-      setGlobalCooldown(cooldownInfo);
-    };
+    const cooldownInfo = getGlobalMiniGameCooldown(); // Global cooldown for ALL games
+    setGlobalCooldown(cooldownInfo);
+    if (cooldownInfo.isAvailable) return;
 
-    updateCooldown();
-    const interval = setInterval(updateCooldown, 1000);
-    return () => clearInterval(interval);
-  }, [isOpen]);
+    const timeout = setTimeout(() => {
+      setGlobalCooldown(getGlobalMiniGameCooldown());
+    }, cooldownInfo.timeRemaining);
+    return () => clearTimeout(timeout);
+  }, [isOpen, globalCooldown.nextAvailableAt]);
 
   const handleClaim = (gameId, reward) => {
     setClaimingGame({ id: gameId, reward });
   };
 
-  const confirmClaim = () => {
+  const confirmClaim = async () => {
     if (claimingGame) {
+      const game = claimingGame;
+      setClaimingGame(null);
+
       // Set GLOBAL cooldown (affects ALL mini-games)
       setGlobalMiniGameCooldown();
+      setGlobalCooldown(getGlobalMiniGameCooldown());
       
-      // Award coins
-      onClaimReward(claimingGame.reward);
+      // Award coins (the server may adjust the cooldown)
+      await onClaimReward(game.reward, game.id);
       
-      // Update cooldown display immediately
-      const cooldownInfo = getGlobalMiniGameCooldown();
-      setGlobalCooldown(cooldownInfo);
-      
-      setClaimingGame(null);
+      setGlobalCooldown(getGlobalMiniGameCooldown());
     }
   };
 
@@ -178,7 +178,9 @@ const MiniGames = ({ isOpen, onClose, onClaimReward }) => {
                         <div className="w-full">
                           <div className="flex items-center justify-center gap-2 text-orange-400 mb-2 text-sm">
                             <Clock className="w-4 h-4" />
-                            <span>Available in: {globalCooldown.formattedTime}</span>
+                            <span>
+                              Available at: {new Date(globalCooldown.nextAvailableAt).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                            </span>
                           </div>
                           <Button
                             disabled
@@ -1,6 +1,35 @@
 // API utility for backend communication
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// Identifies this tab in real-time change notifications, so it can ignore its own writes
+export const CLIENT_ID = (() => {
+  let id = sessionStorage.getItem('clientId');
+  if (!id) {
+    id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    sessionStorage.setItem('clientId', id);
+  }
+  return id;
+})();
+
+/**
+ * A fresh Idempotency-Key; reuse it when retrying the same request
+ */
+export const newIdempotencyKey = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+
+/**
+ * fetch a request carrying an Idempotency-Key, retrying once with the same
+ * key if the network drops it (the server applies the request at most once)
+ */
+const fetchIdempotent = async (url, options) => {
+  try {
+    return await fetch(url, options);
+  } catch (networkError) {
+    console.warn('🟡 [API] Request failed, retrying with the same Idempotency-Key:', networkError.message);
+    return fetch(url, options);
+  }
+};
+
 /**
  * Authenticate with Google OAuth token
  */
@@ -71,12 +100,14 @@ export const getUserData = async (googleId, jwtToken) => {
 /**
  * Update user data
  */
-export const updateUserData = async (updateData, jwtToken) => {
-  const response = await fetch(`${API_BASE_URL}/api/user/update`, {
+export const updateUserData = async (updateData, jwtToken, idempotencyKey = newIdempotencyKey()) => {
+  const response = await fetchIdempotent(`${API_BASE_URL}/api/user/update`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
       'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+      'Idempotency-Key': idempotencyKey,
     },
     body: JSON.stringify(updateData),
   });
@@ -93,12 +124,14 @@ export const updateUserData = async (updateData, jwtToken) => {
 /**
  * Redeem promo code
  */
-export const redeemPromoCode = async (code, jwtToken) => {
-  const response = await fetch(`${API_BASE_URL}/api/promo/redeem`, {
+export const redeemPromoCode = async (code, jwtToken, idempotencyKey = newIdempotencyKey()) => {
+  const response = await fetchIdempotent(`${API_BASE_URL}/api/promo/redeem`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
       'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+      'Idempotency-Key': idempotencyKey,
     },
     body: JSON.stringify({ code }),
   });
@@ -112,6 +145,237 @@ export const redeemPromoCode = async (code, jwtToken) => {
   return data;
 };
 
+/**
+ * Purchase a store item or avatar
+ * The server checks the balance and applies the purchase in one atomic write;
+ * reusing the same idempotencyKey on retry never charges twice.
+ */
+export const purchaseStoreItem = async (itemId, kind, idempotencyKey, jwtToken) => {
+  const response = await fetchIdempotent(`${API_BASE_URL}/api/store/purchase`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+      'Idempotency-Key': idempotencyKey,
+    },
+    body: JSON.stringify({ item_id: itemId, kind }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to complete purchase');
+  }
+
+  return data;
+};
+
+/**
+ * Record that an inventory item was used up (its effect runs on the client)
+ */
+export const consumeStoreItem = async (itemId, jwtToken, idempotencyKey = newIdempotencyKey()) => {
+  const response = await fetchIdempotent(`${API_BASE_URL}/api/store/use`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+      'Idempotency-Key': idempotencyKey,
+    },
+    body: JSON.stringify({ item_id: itemId }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to use item');
+  }
+
+  return data;
+};
+
+/**
+ * Claim a mini-game reward; the server enforces the global cooldown
+ * Reusing the same idempotencyKey on retry never pays out twice.
+ */
+export const playMiniGame = async (gameId, jwtToken, idempotencyKey = newIdempotencyKey()) => {
+  const response = await fetchIdempotent(`${API_BASE_URL}/api/minigames/play`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+      'Idempotency-Key': idempotencyKey,
+    },
+    body: JSON.stringify({ game_id: gameId }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to claim mini-game reward');
+  }
+
+  return data;
+};
+
+/**
+ * Atomically add to lifetime stat counters (e.g. { totalQuestsCompleted: 1 })
+ * The server unlocks any achievements the new totals reach
+ */
+export const incrementStats = async (increments, jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/stats/increment`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+    },
+    body: JSON.stringify({ increments }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to update stats');
+  }
+
+  return data;
+};
+
+/**
+ * Send a batch of activity events (xp, coins, quest_completed, streak_change, minigame_played)
+ * Each event carries an event_id, so resending a batch never counts it twice
+ */
+export const sendActivityEvents = async (events, jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/activity/events`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+    },
+    body: JSON.stringify({ events }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to send activity events');
+  }
+
+  return data;
+};
+
+/**
+ * Get today's pre-aggregated activity summary
+ */
+export const getTodayActivity = async (jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/activity/today`, {
+    headers: {
+      'Authorization': `Bearer ${jwtToken}`,
+    },
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to fetch activity summary');
+  }
+
+  return data;
+};
+
+/**
+ * Get the JWT of the signed-in user, if any (for components without a user prop)
+ */
+export const getSavedToken = () => {
+  try {
+    return JSON.parse(localStorage.getItem('user') || 'null')?.token || null;
+  } catch {
+    return null;
+  }
+};
+
+/**
+ * Get the inspiration catalogue for a quest type, grouped by category
+ * With a token, each suggestion carries a `used` flag for this user
+ */
+export const getInspirationCatalogue = async (questType, jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/inspiration/${questType}`, {
+    headers: jwtToken ? { 'Authorization': `Bearer ${jwtToken}` } : {},
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to fetch inspiration');
+  }
+
+  return data;
+};
+
+/**
+ * Get up to `count` random suggestions this user hasn't used yet
+ */
+export const sampleInspiration = async (questType, count, jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/inspiration/${questType}/sample?count=${count}`, {
+    headers: {
+      'Authorization': `Bearer ${jwtToken}`,
+    },
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to fetch inspiration');
+  }
+
+  return data;
+};
+
+/**
+ * Mark suggestions used by quest title (non-suggestion titles are ignored)
+ */
+export const markInspirationUsed = async (texts, jwtToken) => {
+  const response = await fetch(`${API_BASE_URL}/api/inspiration/used`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${jwtToken}`,
+      'X-Client-Id': CLIENT_ID,
+    },
+    body: JSON.stringify({ texts }),
+  });
+
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.detail || 'Failed to mark suggestion used');
+  }
+
+  return data;
+};
+
+/**
+ * Subscribe to changes made to this user from other devices (Server-Sent Events)
+ * onReady receives { version } on every (re)connect; onChange receives
+ * { version, fields, values?, origin? }. Returns a function that closes the stream.
+ */
+export const subscribeToUserChanges = (jwtToken, { onReady, onChange }) => {
+  const source = new EventSource(`${API_BASE_URL}/api/events?token=${encodeURIComponent(jwtToken)}`);
+
+  source.addEventListener('ready', (event) => onReady?.(JSON.parse(event.data)));
+  source.addEventListener('change', (event) => {
+    const change = JSON.parse(event.data);
+    if (change.origin !== CLIENT_ID) {
+      onChange?.(change);
+    }
+  });
+
+  return () => source.close();
+};
+
 /**
  * Check if user is online (can reach backend)
  */
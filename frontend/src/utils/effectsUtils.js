@@ -177,19 +177,20 @@ export const migrateStreakSaverToFreeze = () => {
 
 /**
  * Get GLOBAL mini-game cooldown status (applies to ALL mini-games)
- * @returns {object} { isAvailable, timeRemaining, formattedTime }
+ * @returns {object} { isAvailable, timeRemaining, formattedTime, nextAvailableAt }
  */
 export const getGlobalMiniGameCooldown = () => {
   const cooldownData = JSON.parse(localStorage.getItem('miniGameCooldown') || '{}');
   
-  if (!cooldownData.lastPlayedAt) {
+  if (!cooldownData.lastPlayedAt && !cooldownData.nextAvailableAt) {
     return { isAvailable: true, timeRemaining: 0, formattedTime: null };
   }
 
-  const lastPlayed = new Date(cooldownData.lastPlayedAt);
+  // Server-provided deadline wins over the locally computed one
   const now = new Date();
-  const cooldownMs = (cooldownData.cooldownMinutes || 30) * 60 * 1000;
-  const nextAvailable = new Date(lastPlayed.getTime() + cooldownMs);
+  const nextAvailable = cooldownData.nextAvailableAt
+    ? new Date(cooldownData.nextAvailableAt)
+    : new Date(new Date(cooldownData.lastPlayedAt).getTime() + (cooldownData.cooldownMinutes || 30) * 60 * 1000);
   const timeRemaining = nextAvailable - now;
 
   if (timeRemaining <= 0) {
@@ -214,6 +215,7 @@ export const getGlobalMiniGameCooldown = () => {
     isAvailable: false,
     timeRemaining,
     formattedTime,
+    nextAvailableAt: nextAvailable.toISOString(),
   };
 };
 
@@ -227,3 +229,14 @@ export const setGlobalMiniGameCooldown = () => {
   };
   localStorage.setItem('miniGameCooldown', JSON.stringify(cooldownData));
 };
+
+/**
+ * Set GLOBAL mini-game cooldown from the server's next-eligible timestamp
+ */
+export const setGlobalMiniGameCooldownUntil = (nextAvailableAt) => {
+  if (!nextAvailableAt) {
+    localStorage.removeItem('miniGameCooldown');
+    return;
+  }
+  localStorage.setItem('miniGameCooldown', JSON.stringify({ nextAvailableAt }));
+};
@@ -149,7 +149,8 @@ export function normalizeGameState(state = {}) {
 
 /**
  * Merge server data with local data
- * Keeps highest values for XP, coins, levels, streaks
+ * Keeps highest values for XP, levels, streaks
+ * Coins and inventory come from the server, which applies purchases
  * Uses arrays from server if they have data, otherwise local
  */
 export function mergeGameStates(serverData, localData) {
@@ -174,10 +175,7 @@ export function mergeGameStates(serverData, localData) {
       Number(localData?.level ?? 1), 
       Number(serverData?.level ?? 1)
     ),
-    coins: Math.max(
-      Number(localData?.coins ?? 0), 
-      Number(serverData?.coins ?? 0)
-    ),
+    coins: Number(serverData?.coins ?? localData?.coins ?? 0),
     dailyStreak: Math.max(
       Number(localData?.dailyStreak ?? 0), 
       Number(serverData?.dailyStreak ?? serverData?.streaks?.dailyStreak ?? 0)
@@ -199,11 +197,9 @@ export function mergeGameStates(serverData, localData) {
       ? (serverData?.quests?.side || serverData?.sideQuests)
       : (localData?.sideQuests || []),
     
-    // Merge arrays (union)
-    inventory: [
-      ...toArray(localData?.inventory),
-      ...toArray(serverData?.inventory)
-    ],
+    inventory: serverData?.inventory !== undefined
+      ? toArray(serverData.inventory)
+      : toArray(localData?.inventory),
     
     // Tutorial completed if either says so
     tutorialCompleted: Boolean(
@@ -0,0 +1,73 @@
+# Unit tests for the backend modules (no running server or MongoDB needed)
+#
+# Run from the repository root:  python -m pytest tests
+# (pytest, mongomock, mongomock-motor and httpx are in backend/requirements.txt)
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('JWT_SECRET', 'test-secret')
+
+
+def _find_and_modify_keeping_id(original):
+    """
+    mongomock reads the AFTER document back by _id only when the projection
+    keeps _id, and otherwise re-runs the filter, which misses once the update
+    has changed a filtered field (e.g. a cooldown). MongoDB returns the
+    updated document either way, so fetch _id and drop it afterwards.
+    """
+    def find_and_modify(self, query, projection=None, *args, **kwargs):
+        if not isinstance(projection, dict) or projection.get('_id', 1):
+            return original(self, query, projection, *args, **kwargs)
+        doc = original(self, query, {**projection, '_id': 1} if len(projection) > 1 else None, *args, **kwargs)
+        if doc is not None:
+            doc.pop('_id', None)
+        return doc
+    return find_and_modify
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    The FastAPI app against an in-memory mongomock database
+
+    Startup hooks (indexes, background loops) don't run. Provides `client`,
+    `db`, auth `headers` for user g1, `seed(**fields)` to insert g1 and
+    `user()` to read g1 back.
+    """
+    from fastapi.testclient import TestClient
+    from mongomock.collection import Collection
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+    from auth import create_jwt_token
+    from user_cache import UserCache
+
+    monkeypatch.setattr(Collection, '_find_and_modify', _find_and_modify_keeping_id(Collection._find_and_modify))
+    db = AsyncMongoMockClient()['test']
+    monkeypatch.setattr(server, 'db', db)
+    monkeypatch.setattr(server, 'user_cache', UserCache())
+
+    def seed(**fields):
+        doc = {'google_id': 'g1', 'email': 'g1@example.com', 'name': 'G', 'coins': 0, 'version': 1, **fields}
+        asyncio.run(db.users.insert_one(doc))
+
+    def user():
+        return asyncio.run(db.users.find_one({'google_id': 'g1'}, {'_id': 0}))
+
+    token = create_jwt_token({'google_id': 'g1', 'email': 'g1@example.com'})
+    return SimpleNamespace(
+        client=TestClient(server.app),
+        db=db,
+        headers={'Authorization': f'Bearer {token}'},
+        seed=seed,
+        user=user,
+    )
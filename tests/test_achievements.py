@@ -0,0 +1,94 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from achievements import AchievementEngine, achievement_engine, unlocked_ids
+
+
+def test_only_achievements_reading_the_changed_fields_are_affected():
+    assert achievement_engine.affected(['totalQuestsCompleted']) == ['first_steps', 'centurion', 'legendary']
+    assert achievement_engine.affected(['miniGamesPlayed.dice']) == ['game_master']
+    assert achievement_engine.affected(['coins', 'unknownStat']) == []
+
+
+def test_projection_covers_the_condition_fields():
+    assert achievement_engine.projection(['game_master', 'level_10']) == {
+        '_id': 0, 'achievements': 1, 'level': 1,
+        'miniGamesPlayed.dice': 1, 'miniGamesPlayed.focusHunt': 1,
+        'miniGamesPlayed.raceClock': 1, 'miniGamesPlayed.bossBattle': 1,
+    }
+
+
+def test_unlocks_at_the_threshold():
+    candidates = ['first_steps', 'centurion']
+
+    assert achievement_engine.evaluate({'totalQuestsCompleted': 99}, candidates) == ['first_steps']
+    assert achievement_engine.evaluate({'totalQuestsCompleted': 100}, candidates) == ['first_steps', 'centurion']
+
+
+def test_every_field_of_a_condition_must_be_met():
+    played = {'dice': 1, 'focusHunt': 2, 'raceClock': 1}
+
+    assert achievement_engine.evaluate({'miniGamesPlayed': played}, ['game_master']) == []
+    assert achievement_engine.evaluate({'miniGamesPlayed': {**played, 'bossBattle': 1}}, ['game_master']) == ['game_master']
+
+
+def test_already_unlocked_achievements_are_not_returned_again():
+    doc = {'totalQuestsCompleted': 5, 'achievements': [{'id': 'first_steps', 'unlockedAt': '...'}]}
+
+    assert unlocked_ids(doc['achievements'] + ['level_10', 42]) == {'first_steps', 'level_10'}
+    assert achievement_engine.evaluate(doc, ['first_steps']) == []
+
+
+def test_missing_or_non_numeric_stats_never_unlock():
+    for value in (None, '100', True, {'n': 100}):
+        assert achievement_engine.evaluate({'totalQuestsCompleted': value}, ['first_steps']) == []
+
+
+def test_unlock_never_duplicates_or_drops_achievements():
+    db = AsyncMongoMockClient()['test']
+
+    async def scenario():
+        await db.users.insert_one({'google_id': 'g1', 'achievements': ['level_10']})
+        await achievement_engine.unlock(db, 'g1', ['first_steps', 'level_10'])
+        await achievement_engine.unlock(db, 'g1', ['first_steps'])
+        return await db.users.find_one({'google_id': 'g1'})
+
+    assert asyncio.run(scenario())['achievements'] == ['level_10', 'first_steps']
+
+
+def test_backfill_unlocks_only_qualifying_users():
+    db = AsyncMongoMockClient()['test']
+    engine = AchievementEngine({'level_10': {'level': 10}})
+
+    async def scenario():
+        await db.users.insert_many([
+            {'google_id': 'a', 'level': 12, 'achievements': []},
+            {'google_id': 'b', 'level': 3, 'achievements': []},
+            {'google_id': 'c', 'level': 40, 'achievements': ['level_10']},
+        ])
+        results = await engine.backfill(db)
+        users = {user['google_id']: user['achievements'] async for user in db.users.find()}
+        return results, users
+
+    results, users = asyncio.run(scenario())
+
+    assert results == {'level_10': 1}
+    assert users == {'a': ['level_10'], 'b': [], 'c': ['level_10']}
+
+
+def test_increment_endpoint_unlocks_and_rejects_unknown_stats(api):
+    api.seed(totalQuestsCompleted=0, achievements=[])
+
+    response = api.client.post('/api/stats/increment', json={'increments': {'totalQuestsCompleted': 1}}, headers=api.headers)
+    assert response.json() == {'success': True, 'unlocked_achievements': ['first_steps']}
+
+    response = api.client.post('/api/stats/increment', json={'increments': {'totalQuestsCompleted': 1}}, headers=api.headers)
+    assert response.json()['unlocked_achievements'] == []
+    assert api.user()['achievements'] == ['first_steps']
+    assert api.user()['totalQuestsCompleted'] == 2
+
+    for increments in ({'level': 50}, {'coins': -10}):
+        response = api.client.post('/api/stats/increment', json={'increments': increments}, headers=api.headers)
+        assert response.status_code == 400
+    assert api.user()['coins'] == 0 and 'level' not in api.user()
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from activity import EVENTS_COLLECTION, MAX_EVENT_AGE, build_event_docs, drop_seen_events
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def test_event_docs_keep_the_id_and_clamp_timestamps():
+    docs = build_event_docs('g1', [
+        {'type': 'xp', 'amount': 5, 'event_id': 'e1', 'ts': NOW - timedelta(days=10)},
+        {'type': 'streak_change', 'amount': -3, 'streak_type': 'daily', 'ts': NOW + timedelta(hours=1)},
+    ], NOW)
+
+    assert docs[0] == {'ts': NOW - MAX_EVENT_AGE, 'meta': {'google_id': 'g1'}, 'type': 'xp', 'amount': 5, 'event_id': 'e1'}
+    assert docs[1]['ts'] == NOW and docs[1]['streak_type'] == 'daily' and 'event_id' not in docs[1]
+
+
+def test_stored_and_repeated_events_are_dropped():
+    db = AsyncMongoMockClient()['test']
+    docs = build_event_docs('g1', [
+        {'type': 'xp', 'amount': 1, 'event_id': 'old'},
+        {'type': 'xp', 'amount': 2, 'event_id': 'new'},
+        {'type': 'xp', 'amount': 2, 'event_id': 'new'},
+        {'type': 'xp', 'amount': 3},
+    ], NOW)
+
+    async def scenario():
+        await db[EVENTS_COLLECTION].insert_one({**docs[0]})
+        # Same id from another user is a different event
+        await db[EVENTS_COLLECTION].insert_one({**docs[1], 'meta': {'google_id': 'g2'}})
+        return await drop_seen_events(db, 'g1', docs, NOW)
+
+    assert [doc['amount'] for doc in asyncio.run(scenario())] == [2, 3]
+
+
+def events(api):
+    return asyncio.run(api.db[EVENTS_COLLECTION].find({}, {'_id': 0}).to_list(None))
+
+
+def test_resent_batch_is_counted_once(api):
+    batch = {'events': [
+        {'type': 'quest_completed', 'quest_type': 'daily', 'event_id': 'a'},
+        {'type': 'streak_change', 'streak_type': 'daily', 'amount': 1, 'event_id': 'b'},
+    ]}
+
+    first = api.client.post('/api/activity/events', json=batch, headers=api.headers).json()
+    second = api.client.post('/api/activity/events', json=batch, headers=api.headers).json()
+
+    assert (first['accepted'], second['accepted']) == (2, 0)
+    assert sorted(event['event_id'] for event in events(api)) == ['a', 'b']
+
+
+def test_out_of_range_amounts_are_rejected(api):
+    for amount in (100_001, -100_001):
+        batch = {'events': [{'type': 'xp', 'amount': amount}]}
+        response = api.client.post('/api/activity/events', json=batch, headers=api.headers)
+        assert response.status_code == 422
+    assert events(api) == []
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+import analytics
+from activity import JOB_STATE_COLLECTION, acquire_lease, renew_lease
+
+LEASE = timedelta(minutes=5)
+
+
+def test_lease_is_exclusive_until_it_expires():
+    async def scenario():
+        db = AsyncMongoMockClient()['test']
+        now = datetime.now(timezone.utc)
+        first = await acquire_lease(db, 'job', now, LEASE)
+        blocked = await acquire_lease(db, 'job', now + timedelta(minutes=1), LEASE)
+        second = await acquire_lease(db, 'job', now + LEASE + timedelta(seconds=1), LEASE)
+        return first, blocked, second, await renew_lease(db, 'job', first, LEASE), await renew_lease(db, 'job', second, LEASE)
+
+    first, blocked, second, first_renewed, second_renewed = asyncio.run(scenario())
+
+    assert first and second and first != second
+    assert blocked is None
+    assert not first_renewed and second_renewed
+
+
+def test_run_renews_the_lease_after_every_stage(monkeypatch):
+    db = AsyncMongoMockClient()['test']
+    lease_ends = []
+
+    async def fake_aggregate(db, collection, pipeline):
+        state = await db[JOB_STATE_COLLECTION].find_one({'_id': analytics.ANALYTICS_JOB_ID})
+        lease_ends.append(state['lease_until'])
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(analytics, '_aggregate', fake_aggregate)
+
+    assert asyncio.run(analytics.run_analytics(db)) is True
+    assert len(lease_ends) == 9
+    assert lease_ends == sorted(lease_ends) and lease_ends[0] < lease_ends[-1]
+
+
+def test_run_stops_when_another_runner_takes_over(monkeypatch):
+    db = AsyncMongoMockClient()['test']
+    stages = []
+
+    async def fake_aggregate(db, collection, pipeline):
+        stages.append(collection)
+        # Our lease ran out during a slow stage and another runner acquired it
+        await db[JOB_STATE_COLLECTION].update_one(
+            {'_id': analytics.ANALYTICS_JOB_ID}, {'$set': {'lease_owner': 'someone-else'}}
+        )
+
+    monkeypatch.setattr(analytics, '_aggregate', fake_aggregate)
+
+    assert asyncio.run(analytics.run_analytics(db)) is False
+    assert stages == ['users']
+    state = asyncio.run(db[JOB_STATE_COLLECTION].find_one({'_id': analytics.ANALYTICS_JOB_ID}))
+    assert 'watermark' not in state
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from activity import JOB_STATE_COLLECTION
+from archive import ARCHIVE_COLLECTION, ARCHIVED_FLAG_MIGRATION, archive_batch, ensure_archive_indexes
+
+LONG_AGO = '2020-01-01T00:00:00+00:00'
+
+
+def cutoff():
+    return datetime.now(timezone.utc) - timedelta(days=1)
+
+
+def test_existing_users_are_flagged_once_and_indexed_on_the_flag():
+    db = AsyncMongoMockClient()['test']
+
+    async def scenario():
+        await db.users.insert_many([{'google_id': 'a'}, {'google_id': 'b', 'archived': True}])
+        await ensure_archive_indexes(db)
+        # Flagged once: a document missing the flag later is left alone
+        await db.users.insert_one({'google_id': 'c'})
+        await ensure_archive_indexes(db)
+        users = {user['google_id']: user.get('archived') async for user in db.users.find()}
+        marker = await db[JOB_STATE_COLLECTION].find_one({'_id': ARCHIVED_FLAG_MIGRATION})
+        return users, marker, await db.users.index_information()
+
+    users, marker, indexes = asyncio.run(scenario())
+
+    assert users == {'a': False, 'b': True, 'c': None}
+    assert marker is not None
+    assert indexes['updated_at_hot']['partialFilterExpression'] == {'archived': False}
+
+
+class RacingUsers:
+    """`users` collection where one user is written to just before the stubs land"""
+
+    def __init__(self, users, google_id):
+        self._users = users
+        self._google_id = google_id
+
+    def __getattr__(self, name):
+        return getattr(self._users, name)
+
+    async def bulk_write(self, ops, **kwargs):
+        await self._users.update_one(
+            {'google_id': self._google_id},
+            {'$set': {'updated_at': datetime.now(timezone.utc).isoformat()}}
+        )
+        return await self._users.bulk_write(ops, **kwargs)
+
+
+class RacingDb:
+    def __init__(self, db, google_id):
+        self._db = db
+        self.users = RacingUsers(db.users, google_id)
+
+    def __getitem__(self, name):
+        return self.users if name == 'users' else self._db[name]
+
+
+def test_user_written_to_mid_batch_stays_hot_without_an_archive_copy():
+    db = AsyncMongoMockClient()['test']
+
+    async def scenario():
+        await db.users.insert_many([
+            {'google_id': gid, 'coins': 5, 'updated_at': LONG_AGO, 'archived': False} for gid in ('a', 'b')
+        ])
+        archived = await archive_batch(RacingDb(db, 'b'), cutoff())
+        users = {user['google_id']: user async for user in db.users.find()}
+        return archived, users, await db[ARCHIVE_COLLECTION].distinct('_id')
+
+    archived, users, archive_ids = asyncio.run(scenario())
+
+    assert archived == 2
+    assert users['a']['archived'] is True and 'coins' not in users['a']
+    assert users['b']['archived'] is False and users['b']['coins'] == 5
+    assert archive_ids == ['a']
+
+
+def test_writes_to_an_archived_user_rehydrate_it_first(api):
+    api.seed(updated_at=LONG_AGO, archived=False, totalQuestsCompleted=3, achievements=['first_steps'])
+    asyncio.run(archive_batch(api.db, cutoff()))
+    assert api.user()['archived'] is True
+
+    response = api.client.post('/api/stats/increment', json={'increments': {'totalQuestsCompleted': 1}}, headers=api.headers)
+
+    assert response.json() == {'success': True, 'unlocked_achievements': []}
+    user = api.user()
+    assert user['archived'] is False
+    assert user['totalQuestsCompleted'] == 4 and user['achievements'] == ['first_steps']
+    assert asyncio.run(api.db[ARCHIVE_COLLECTION].count_documents({})) == 0
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import hashlib
+
+import pytest
+from bson import ObjectId, json_util
+from pymongo import InsertOne, ReplaceOne
+
+import data_transfer
+from data_transfer import (
+    COLLECTION_KEYS, _build_ops, _data_path, _read_checkpoint, _write_checkpoint,
+    import_collection, verify_checksum
+)
+
+
+def test_insert_mode_keeps_documents_as_is():
+    doc = {'_id': ObjectId(), 'google_id': 'g1'}
+    ops = _build_ops([dict(doc)], 'google_id', 'insert')
+    assert ops == [InsertOne(doc)]
+
+
+def test_upsert_matches_on_natural_key_and_drops_id():
+    ops = _build_ops([{'_id': ObjectId(), 'code': 'WELCOME100', 'amount': 100}], 'code', 'upsert')
+    assert ops == [ReplaceOne({'code': 'WELCOME100'}, {'code': 'WELCOME100', 'amount': 100}, upsert=True)]
+
+
+def test_upsert_without_natural_key_matches_on_id():
+    ops = _build_ops([{'_id': 'g1', 'data': b'...'}], '_id', 'upsert')
+    assert ops == [ReplaceOne({'_id': 'g1'}, {'_id': 'g1', 'data': b'...'}, upsert=True)]
+
+
+def test_default_collections_cover_archives_and_single_use_codes():
+    assert COLLECTION_KEYS['users_archive'] == '_id'
+    assert COLLECTION_KEYS['promo_batches'] == 'batch_id'
+    assert COLLECTION_KEYS['promo_batch_codes'] == '_id'
+
+
+def write_export(directory, collection, docs):
+    lines = [(json_util.dumps(doc) + '\n').encode('utf-8') for doc in docs]
+    with gzip.open(_data_path(directory, collection), 'wb') as f:
+        f.writelines(lines)
+    return {'count': len(lines), 'sha256': hashlib.sha256(b''.join(lines)).hexdigest()}
+
+
+class FakeDb:
+    """
+    bulk_write stand-in: each batch takes `delays[first _id]` seconds and the
+    batch starting at `fail_at` raises, so batches finish out of order
+    """
+
+    def __init__(self, delays=None, fail_at=None):
+        self.delays = delays or {}
+        self.fail_at = fail_at
+        self.written = set()
+
+    def __getitem__(self, collection):
+        return self
+
+    async def bulk_write(self, docs, ordered):
+        first = docs[0]['_id']
+        await asyncio.sleep(self.delays.get(first, 0))
+        if first == self.fail_at:
+            raise RuntimeError('write failed')
+        self.written.update(doc['_id'] for doc in docs)
+
+
+@pytest.fixture
+def plain_docs(monkeypatch):
+    # Hand the fake the documents themselves instead of pymongo operations
+    monkeypatch.setattr(data_transfer, '_build_ops', lambda docs, key, mode: docs)
+
+
+def run_import(db, directory, resume=False):
+    return asyncio.run(import_collection(db, 'things', directory, 'upsert', 2, 3, resume))
+
+
+def test_checkpoint_waits_for_earlier_batches(tmp_path, monkeypatch, plain_docs):
+    write_export(tmp_path, 'things', [{'_id': i} for i in range(6)])
+    db = FakeDb(delays={0: 0.05, 2: 0, 4: 0.01})
+    checkpoints = []
+
+    def record(directory, collection, lines_done):
+        # Every document before the checkpoint must already be written
+        assert set(range(lines_done)) <= db.written
+        checkpoints.append(lines_done)
+        _write_checkpoint(directory, collection, lines_done)
+
+    monkeypatch.setattr(data_transfer, '_write_checkpoint', record)
+
+    assert run_import(db, tmp_path) == 6
+    assert checkpoints == [0, 0, 6]
+
+
+def test_resume_replays_from_the_last_contiguous_batch(tmp_path, plain_docs):
+    write_export(tmp_path, 'things', [{'_id': i} for i in range(6)])
+
+    with pytest.raises(RuntimeError):
+        run_import(FakeDb(delays={2: 0.01}, fail_at=2), tmp_path)
+    checkpoint = _read_checkpoint(tmp_path, 'things')
+    assert checkpoint <= 2
+
+    db = FakeDb()
+    run_import(db, tmp_path, resume=True)
+    assert db.written == set(range(checkpoint, 6))
+
+
+def test_verify_checksum_detects_a_modified_export(tmp_path):
+    expected = write_export(tmp_path, 'things', [{'_id': i} for i in range(3)])
+    verify_checksum(tmp_path, 'things', expected)
+
+    write_export(tmp_path, 'things', [{'_id': i} for i in (0, 1, 5)])
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        verify_checksum(tmp_path, 'things', expected)
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+from health import HealthMonitor, PoolStats
+
+PRIMARY = ('db-0.example.net', 27017)
+SECONDARY = ('db-1.example.net', 27017)
+
+
+class FakeDb:
+    async def command(self, name):
+        return {'ok': 1}
+
+
+def check_out(stats, address, count=1):
+    event = SimpleNamespace(address=address)
+    for _ in range(count):
+        stats.connection_check_out_started(event)
+        stats.connection_checked_out(event)
+
+
+def wait(stats, address):
+    stats.connection_check_out_started(SimpleNamespace(address=address))
+
+
+def probe(stats, max_pool_size):
+    monitor = HealthMonitor(get_db=FakeDb, pool_stats=stats, max_pool_size=max_pool_size)
+    return asyncio.run(monitor.probe())
+
+
+def test_busy_pools_on_several_servers_are_not_exhausted():
+    stats = PoolStats()
+    check_out(stats, PRIMARY, 3)
+    check_out(stats, SECONDARY, 3)
+    wait(stats, SECONDARY)
+
+    state = probe(stats, max_pool_size=4)
+
+    assert state['problems'] == []
+    assert state['pool']['in_use'] == 6
+    assert state['pool']['pools']['db-1.example.net:27017'] == {'in_use': 3, 'waiting': 1}
+
+
+def test_one_full_pool_with_waiters_is_exhausted():
+    stats = PoolStats()
+    check_out(stats, PRIMARY, 4)
+    wait(stats, PRIMARY)
+    check_out(stats, SECONDARY, 1)
+
+    state = probe(stats, max_pool_size=4)
+
+    assert state['problems'] == ['connection pool exhausted: db-0.example.net:27017']
+
+
+def test_check_in_frees_the_pool():
+    stats = PoolStats()
+    check_out(stats, PRIMARY, 4)
+    stats.connection_checked_in(SimpleNamespace(address=PRIMARY))
+    wait(stats, PRIMARY)
+
+    assert stats.exhausted(4) == []
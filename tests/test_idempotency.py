@@ -0,0 +1,56 @@
+from mongomock_motor import AsyncMongoMockClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from auth import create_jwt_token
+from idempotency import IdempotencyMiddleware
+
+
+def make_client():
+    calls = []
+
+    async def echo(request: Request):
+        body = await request.json()
+        calls.append(body)
+        return JSONResponse({'call': len(calls), 'body': body})
+
+    collection = AsyncMongoMockClient()['test'].idempotency_keys
+    app = Starlette(routes=[Route('/echo', echo, methods=['POST'])])
+    app.add_middleware(IdempotencyMiddleware, get_collection=lambda: collection)
+    token = create_jwt_token({'google_id': 'g1', 'email': 'g1@example.com'})
+    return TestClient(app), {'Authorization': f'Bearer {token}'}, calls
+
+
+def test_retry_with_same_body_replays_stored_response():
+    client, headers, calls = make_client()
+    headers = {**headers, 'Idempotency-Key': 'k1'}
+
+    first = client.post('/echo', json={'code': 'A'}, headers=headers)
+    retry = client.post('/echo', json={'code': 'A'}, headers=headers)
+
+    assert first.json() == {'call': 1, 'body': {'code': 'A'}}
+    assert retry.json() == first.json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert len(calls) == 1
+
+
+def test_reusing_key_with_different_body_is_rejected():
+    client, headers, calls = make_client()
+    headers = {**headers, 'Idempotency-Key': 'k1'}
+
+    client.post('/echo', json={'code': 'A'}, headers=headers)
+    reused = client.post('/echo', json={'code': 'B'}, headers=headers)
+
+    assert reused.status_code == 422
+    assert calls == [{'code': 'A'}]
+
+
+def test_handler_still_receives_the_buffered_body():
+    client, headers, calls = make_client()
+
+    response = client.post('/echo', json={'items': list(range(100))}, headers={**headers, 'Idempotency-Key': 'k2'})
+
+    assert response.json()['body'] == {'items': list(range(100))}
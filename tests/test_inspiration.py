@@ -0,0 +1,104 @@
+import asyncio
+import random
+
+import bson
+from mongomock_motor import AsyncMongoMockClient
+
+from inspiration import (
+    BITMAP_FIELD, IDS_BY_TYPE, LEGACY_FIELD, SUGGESTIONS,
+    bits_to_bitmap, mark_used, sample_unused, suggestion_id_for_text, used_bits
+)
+
+
+def bits_of(ids):
+    bits = 0
+    for suggestion_id in ids:
+        bits |= 1 << suggestion_id
+    return bits
+
+
+def test_bitmap_round_trip():
+    bits = bits_of([0, 7, 8, 127])
+
+    bitmap = bits_to_bitmap(bits)
+
+    assert len(bitmap) == 16
+    assert bitmap[0] == 0b10000001 and bitmap[1] == 0b1
+    assert used_bits({BITMAP_FIELD: bitmap}) == bits
+    assert bits_to_bitmap(0) == b''
+
+
+def test_used_bits_includes_the_legacy_list():
+    text = SUGGESTIONS[40]['text']
+    user = {BITMAP_FIELD: bits_to_bitmap(bits_of([3])), LEGACY_FIELD: [text.upper(), 'not a suggestion']}
+
+    assert used_bits(user) == bits_of([3, 40])
+    assert suggestion_id_for_text(f'  {text.lower()} ') == 40
+
+
+def test_sample_unused_never_returns_used_or_duplicate_suggestions():
+    ids = IDS_BY_TYPE['dailyQuest']
+    used = bits_of(ids[::2])
+
+    picked = sample_unused('dailyQuest', used, 10, random.Random(1))
+
+    assert len(picked) == len(set(picked)) == 10
+    assert all(suggestion_id in ids and not used >> suggestion_id & 1 for suggestion_id in picked)
+
+
+def test_sample_unused_falls_back_when_nearly_exhausted():
+    ids = IDS_BY_TYPE['sideQuest']
+    left = ids[5]
+    used = bits_of(ids) & ~(1 << left)
+
+    assert sample_unused('sideQuest', used, 3, random.Random(1)) == [left]
+    assert sample_unused('sideQuest', bits_of(ids), 3, random.Random(1)) == []
+
+
+def run_mark(db, ids):
+    return asyncio.run(mark_used(db, 'g1', ids))
+
+
+def make_db(**user):
+    db = AsyncMongoMockClient()['test']
+    asyncio.run(db.users.insert_one({'google_id': 'g1', 'version': 4, **user}))
+    return db
+
+
+def stored_user(db):
+    return asyncio.run(db.users.find_one({'google_id': 'g1'}))
+
+
+def test_mark_used_sets_bits_and_bumps_version():
+    db = make_db(**{BITMAP_FIELD: bson.Binary(bits_to_bitmap(bits_of([1])))})
+
+    user, changed = run_mark(db, [2, 100])
+
+    assert changed and user == {'version': 5}
+    stored = stored_user(db)
+    assert used_bits(stored) == bits_of([1, 2, 100])
+    assert stored['version'] == 5
+
+
+def test_mark_used_folds_in_and_removes_the_legacy_list():
+    db = make_db(**{LEGACY_FIELD: [SUGGESTIONS[40]['text']]})
+
+    _, changed = run_mark(db, [2])
+
+    stored = stored_user(db)
+    assert changed and LEGACY_FIELD not in stored
+    assert used_bits(stored) == bits_of([2, 40])
+
+
+def test_mark_used_is_a_no_op_when_already_set():
+    db = make_db(**{BITMAP_FIELD: bson.Binary(bits_to_bitmap(bits_of([2])))})
+
+    user, changed = run_mark(db, [2])
+
+    assert not changed and user['version'] == 4
+    assert stored_user(db)['version'] == 4
+
+
+def test_mark_used_for_unknown_user():
+    db = AsyncMongoMockClient()['test']
+    assert asyncio.run(mark_used(db, 'nobody', [2])) == (None, False)
@@ -0,0 +1,79 @@
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from logging_config import (
+    MAX_REQUEST_ID_LENGTH, ContextFilter, JsonFormatter, RequestIdMiddleware, request_id_var
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_client():
+    """App logging one record per request through a ContextFilter"""
+    handler = ListHandler()
+    handler.addFilter(ContextFilter())
+    logger = logging.getLogger('tests.request_id')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get('/ping')
+    async def ping():
+        logger.info('handling ping')
+        return {'request_id': request_id_var.get()}
+
+    return TestClient(app), handler
+
+
+def test_incoming_request_id_is_reused_and_stamped_on_records():
+    client, handler = make_client()
+
+    response = client.get('/ping', headers={'X-Request-ID': 'abc-123'})
+
+    assert response.headers['x-request-id'] == 'abc-123'
+    assert response.json() == {'request_id': 'abc-123'}
+    assert [record.request_id for record in handler.records] == ['abc-123']
+
+
+def test_missing_or_oversized_request_ids_are_replaced():
+    client, handler = make_client()
+
+    first = client.get('/ping').headers['x-request-id']
+    second = client.get('/ping', headers={'X-Request-ID': 'x' * (MAX_REQUEST_ID_LENGTH + 1)}).headers['x-request-id']
+
+    assert len(first) == len(second) == 32 and first != second
+    assert [record.request_id for record in handler.records] == [first, second]
+
+
+def test_request_id_does_not_leak_outside_the_request():
+    client, _ = make_client()
+
+    client.get('/ping', headers={'X-Request-ID': 'abc-123'})
+
+    assert request_id_var.get() is None
+
+
+def test_json_output_carries_the_request_id():
+    record = logging.LogRecord('server', logging.INFO, __file__, 1, 'saved %s', ('g1',), None)
+    token = request_id_var.set('abc-123')
+    try:
+        ContextFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['request_id'] == 'abc-123' and entry['msg'] == 'saved g1'
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from minigames import MINI_GAME_COOLDOWN
+
+
+def same_instant(a, b):
+    # Mongo stores datetimes with millisecond precision
+    return abs(datetime.fromisoformat(a) - datetime.fromisoformat(b)) < timedelta(milliseconds=1)
+
+
+def play(api, game_id='dice', key=None):
+    headers = {**api.headers, 'Idempotency-Key': key} if key else api.headers
+    response = api.client.post('/api/minigames/play', json={'game_id': game_id}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_play_pays_the_reward_and_starts_the_cooldown(api):
+    api.seed(coins=3)
+    before = datetime.utcnow()
+
+    result = play(api, 'boss-battle')
+
+    assert result['success'] and result['reward'] == 10 and result['coins'] == 13
+    user = api.user()
+    assert user['totalCoinsEarned'] == 10 and user['miniGamesPlayed'] == {'bossBattle': 1}
+    cooldown = user['minigame_cooldown_until'].replace(tzinfo=None)
+    assert before + MINI_GAME_COOLDOWN <= cooldown <= datetime.utcnow() + MINI_GAME_COOLDOWN
+
+
+def test_no_reward_during_the_cooldown(api):
+    api.seed(coins=3)
+
+    first = play(api, 'dice')
+    second = play(api, 'focus-hunt')
+
+    assert not second['success'] and second['reward'] == 0
+    assert second['coins'] == 8 and same_instant(second['next_eligible_at'], first['next_eligible_at'])
+    assert api.user()['miniGamesPlayed'] == {'dice': 1}
+
+
+def test_play_is_allowed_once_the_cooldown_has_passed(api):
+    api.seed(coins=0, minigame_cooldown_until=datetime.utcnow() - timedelta(seconds=1))
+
+    assert play(api, 'race-clock')['success']
+    assert api.user()['coins'] == 5
+
+
+def test_retried_claim_pays_once(api):
+    api.seed(coins=0)
+
+    first = play(api, 'dice', key='claim-1')
+    retry = play(api, 'dice', key='claim-1')
+
+    assert retry == first and first['success']
+    assert api.user()['coins'] == 5 and api.user()['version'] == 2
+
+
+def test_unknown_game_is_not_found(api):
+    api.seed()
+
+    response = api.client.post('/api/minigames/play', json={'game_id': 'chess'}, headers=api.headers)
+
+    assert response.status_code == 404
+
+
+def test_cooldown_endpoint_reports_the_next_play(api):
+    api.seed()
+
+    assert api.client.get('/api/minigames/cooldown', headers=api.headers).json()['next_eligible_at'] is None
+    played = play(api)
+    cooldown = api.client.get('/api/minigames/cooldown', headers=api.headers).json()
+
+    assert cooldown['next_eligible_at'] is not None
+    assert same_instant(cooldown['next_eligible_at'], played['next_eligible_at'])
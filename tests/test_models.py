@@ -0,0 +1,77 @@
+import pytest
+from pydantic import ValidationError
+
+from models import MAX_EXTRA_FIELDS, MAX_INVENTORY_ITEMS, MAX_MAIN_QUEST_HISTORY, UserData, UserUpdateRequest
+
+USER = {'google_id': 'g1', 'email': 'a@example.com', 'name': 'A'}
+
+
+def test_read_model_accepts_stored_quests_beyond_update_limits():
+    # Documents written before the limits (or by other tools) must still load
+    quest = {'text': 'x' * 5000, 'nested': {'any': ['shape']}}
+    quest.update({f'extra{i}': i for i in range(MAX_EXTRA_FIELDS + 5)})
+
+    user = UserData(**USER, quests={'daily': [quest] * 80, 'side': [quest]})
+
+    assert user.quests.daily[0] == quest
+    assert len(user.quests.daily) == 80
+
+
+def test_update_keeps_only_the_fields_the_client_sent():
+    update = UserUpdateRequest(quests={'daily': [{'text': 'Run', 'xp': 10, 'emoji': '🏃'}]})
+
+    assert update.model_dump(exclude_unset=True) == {
+        'quests': {'daily': [{'text': 'Run', 'xp': 10, 'emoji': '🏃'}]}
+    }
+
+
+@pytest.mark.parametrize('quest', [
+    {'text': 'x' * 501},
+    {f'extra{i}': i for i in range(MAX_EXTRA_FIELDS + 1)},
+    {'extra': {'nested': 'object'}},
+    {'extra': 'x' * 101},
+])
+def test_update_rejects_oversized_quests(quest):
+    with pytest.raises(ValidationError):
+        UserUpdateRequest(quests={'daily': [quest]})
+
+
+def test_update_caps_list_lengths():
+    with pytest.raises(ValidationError):
+        UserUpdateRequest(quests={'daily': [{'text': 'Run'}] * 51})
+
+
+def test_append_only_lists_keep_their_newest_entries():
+    inventory = [{'id': f'item{i}'} for i in range(MAX_INVENTORY_ITEMS + 20)]
+    history = [{'title': f'Quest {i}'} for i in range(MAX_MAIN_QUEST_HISTORY + 1)]
+
+    update = UserUpdateRequest(inventory=inventory, main_quest_history=history).model_dump(exclude_unset=True)
+
+    assert update['inventory'] == inventory[20:]
+    assert update['main_quest_history'] == history[1:]
+
+
+def test_update_allows_a_few_unknown_scalar_fields():
+    item = {f'extra{i}': i for i in range(MAX_EXTRA_FIELDS)}
+
+    update = UserUpdateRequest(inventory=[item])
+
+    assert update.model_dump(exclude_unset=True) == {'inventory': [item]}
+
+
+def test_long_time_user_autosave_is_trimmed_not_rejected(api):
+    api.seed(used_promo_codes=['LAUNCH'], main_quest_history=[])
+    codes = [f'CODE{i}' for i in range(600)]
+    history = [{'title': f'Quest {i}', 'xpEarned': 10} for i in range(600)]
+
+    response = api.client.post(
+        '/api/user/update',
+        json={'used_promo_codes': codes, 'main_quest_history': history},
+        headers=api.headers
+    )
+
+    assert response.status_code == 200
+    user = api.user()
+    assert user['main_quest_history'] == history[100:]
+    # Merged, so codes the server already recorded are kept
+    assert user['used_promo_codes'] == ['LAUNCH'] + codes[100:]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from auth import create_jwt_token
+from profiling import (
+    PROFILING_CONFIG_ID, RUNTIME_CONFIG_COLLECTION, ProfilingConfig, ProfilingState, _prune
+)
+
+
+def scope(path='/api/user', google_id=None):
+    headers = []
+    if google_id:
+        token = create_jwt_token({'google_id': google_id, 'email': f'{google_id}@example.com'})
+        headers.append((b'authorization', f'Bearer {token}'.encode('latin-1')))
+    return {'type': 'http', 'path': path, 'headers': headers}
+
+
+def test_default_config_is_inactive():
+    assert not ProfilingConfig().active
+    assert ProfilingConfig(routes=['/api/store']).active
+
+
+def test_matches_route_prefixes():
+    config = ProfilingConfig(routes=['/api/store', '/api/auth/google'])
+
+    assert config.matches(scope('/api/store/purchase'))
+    assert config.matches(scope('/api/auth/google'))
+    assert not config.matches(scope('/api/user'))
+
+
+def test_matches_google_ids_from_the_bearer_token():
+    config = ProfilingConfig(google_ids=['g1'])
+
+    assert config.matches(scope(google_id='g1'))
+    assert not config.matches(scope(google_id='g2'))
+    assert not config.matches(scope())
+
+
+def test_matches_sampled_requests():
+    assert ProfilingConfig(sample_rate=1.0).matches(scope())
+    assert not ProfilingConfig(sample_rate=0.0).matches(scope())
+
+
+def test_override_applies_until_it_expires():
+    state = ProfilingState()
+    now = datetime.now(timezone.utc)
+
+    state.apply({'routes': ['/api/store'], 'expires_at': now + timedelta(minutes=5)})
+    assert state.config.routes == ('/api/store',)
+
+    # MongoDB hands datetimes back naive (UTC)
+    state.apply({'routes': ['/api/store'], 'expires_at': (now - timedelta(seconds=1)).replace(tzinfo=None)})
+    assert state.config is state.env_config
+
+    state.apply(None)
+    assert state.config is state.env_config
+
+
+def test_refresh_picks_up_the_stored_config():
+    db = AsyncMongoMockClient()['test']
+    state = ProfilingState()
+
+    async def scenario():
+        await db[RUNTIME_CONFIG_COLLECTION].insert_one({'_id': PROFILING_CONFIG_ID, 'sample_rate': 0.5, 'google_ids': ['g1']})
+        await state.refresh(db)
+        enabled = state.config.to_dict()
+        await db[RUNTIME_CONFIG_COLLECTION].delete_one({'_id': PROFILING_CONFIG_ID})
+        await state.refresh(db)
+        return enabled
+
+    enabled = asyncio.run(scenario())
+
+    assert enabled['active'] and enabled['sample_rate'] == 0.5 and enabled['google_ids'] == ['g1']
+    assert state.config is state.env_config
+
+
+def test_prune_keeps_the_newest_files(tmp_path):
+    for age, name in enumerate(['c.prof', 'b.prof', 'a.prof']):
+        path = tmp_path / name
+        path.write_text(name)
+        os.utime(path, (1000 - age, 1000 - age))
+
+    _prune(tmp_path, 2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['b.prof', 'c.prof']
+
+    _prune(tmp_path, 0)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from promo_batches import CODE_ALPHABET, CODE_LENGTH, create_batch, generate_codes
+
+
+def test_generates_distinct_codes_from_the_alphabet():
+    codes = generate_codes(2000)
+    assert len(codes) == 2000
+    for code in codes:
+        assert len(code) == CODE_LENGTH
+        assert set(code) <= set(CODE_ALPHABET)
+
+
+def test_prefix_is_uppercased_and_dash_joined():
+    codes = generate_codes(10, prefix='partnerx', length=6)
+    for code in codes:
+        prefix, _, body = code.partition('-')
+        assert prefix == 'PARTNERX'
+        assert len(body) == 6
+
+
+def test_zero_codes():
+    assert generate_codes(0) == set()
+
+
+@pytest.mark.parametrize('reward_type, amount, item_id', [
+    ('xp', None, None),
+    ('coins', -5, None),
+    ('item', None, None),
+])
+def test_create_batch_rejects_unredeemable_rewards_before_touching_mongo(reward_type, amount, item_id):
+    # Raises before a Mongo client is even created
+    with pytest.raises(ValueError):
+        asyncio.run(create_batch('Partner', 10, reward_type, amount, item_id))
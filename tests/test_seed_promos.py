@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from pymongo import UpdateOne
+
+from seed_promos import MANAGED_BY, diff_catalogue, load_catalogue, to_operations
+
+
+def _write(tmp_path, entries):
+    path = tmp_path / 'catalogue.json'
+    path.write_text(json.dumps({'promo_codes': entries}))
+    return path
+
+
+def test_loads_valid_entries(tmp_path):
+    catalogue = load_catalogue(_write(tmp_path, [
+        {'code': 'welcome100', 'type': 'xp', 'amount': 100},
+        {'code': 'FREEZE', 'type': 'item', 'item_id': 'streak_freeze'},
+    ]))
+    assert catalogue['WELCOME100']['amount'] == 100
+    assert catalogue['FREEZE']['item_id'] == 'streak_freeze'
+
+
+@pytest.mark.parametrize('entry', [
+    {'code': 'A', 'type': 'xp'},
+    {'code': 'A', 'type': 'coins', 'amount': '50'},
+    {'code': 'A', 'type': 'coins', 'amount': 0},
+    {'code': 'A', 'type': 'xp', 'amount': 2.5},
+    {'code': 'A', 'type': 'item'},
+    {'code': 'A', 'type': 'gems', 'amount': 5},
+    {'code': 'A', 'type': 'xp', 'amount': 5, 'max_uses': 0},
+    {'code': 'A', 'type': 'xp', 'amount': 5, 'max_uses': '10'},
+    {'code': 'A', 'type': 'xp', 'amount': 5, 'max_uses': True},
+])
+def test_rejects_unredeemable_entries(tmp_path, entry):
+    with pytest.raises(ValueError):
+        load_catalogue(_write(tmp_path, [{'code': 'OK', 'type': 'xp', 'amount': 5}, entry]))
+
+
+def _desired(**fields):
+    return {
+        'type': 'xp', 'amount': 100, 'item_id': None, 'active': True,
+        'max_uses': None, 'starts_at': None, 'ends_at': None, **fields
+    }
+
+
+def test_diff_adds_new_codes_without_touching_usage():
+    changes = diff_catalogue({'NEW': _desired()}, {})
+
+    assert changes == [(
+        'NEW',
+        {'$set': {**_desired(), 'managed_by': MANAGED_BY}, '$setOnInsert': {'used_count': 0}},
+        True,
+    )]
+
+
+def test_diff_only_sets_changed_fields():
+    current = {'code': 'WELCOME', **_desired(), 'managed_by': MANAGED_BY, 'used_count': 40}
+
+    assert diff_catalogue({'WELCOME': _desired()}, {'WELCOME': current}) == []
+    assert diff_catalogue({'WELCOME': _desired(amount=150)}, {'WELCOME': current}) == [
+        ('WELCOME', {'$set': {'amount': 150}}, False)
+    ]
+
+
+def test_diff_adopts_same_named_legacy_codes():
+    current = {'code': 'OLD', **_desired()}
+
+    assert diff_catalogue({'OLD': _desired()}, {'OLD': current}) == [
+        ('OLD', {'$set': {'managed_by': MANAGED_BY}}, False)
+    ]
+
+
+def test_diff_deactivates_removed_catalogue_codes_only():
+    existing = {
+        'GONE': {'code': 'GONE', **_desired(), 'managed_by': MANAGED_BY},
+        'ALREADY_OFF': {'code': 'ALREADY_OFF', **_desired(active=False), 'managed_by': MANAGED_BY},
+        'MANUAL': {'code': 'MANUAL', **_desired()},
+    }
+
+    assert diff_catalogue({}, existing) == [('GONE', {'$set': {'active': False}}, False)]
+
+
+def test_to_operations_builds_bulk_updates():
+    ops = to_operations([('GONE', {'$set': {'active': False}}, False)])
+
+    assert ops == [UpdateOne({'code': 'GONE'}, {'$set': {'active': False}}, upsert=False)]
@@ -0,0 +1,83 @@
+import asyncio
+
+from store import without_one
+
+
+def purchase(api, item_id, kind='item', key=None):
+    headers = {**api.headers, 'Idempotency-Key': key} if key else api.headers
+    response = api.client.post('/api/store/purchase', json={'item_id': item_id, 'kind': kind}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_purchase_deducts_the_catalogue_price(api):
+    api.seed(coins=50, inventory=[])
+
+    result = purchase(api, 'streak_freeze')
+
+    assert result['success'] and result['coins'] == 30
+    user = api.user()
+    assert user['coins'] == 30 and user['totalCoinsSpent'] == 20 and user['totalPurchases'] == 1
+    assert [entry['id'] for entry in user['inventory']] == ['streak_freeze']
+
+
+def test_insufficient_coins_changes_nothing(api):
+    api.seed(coins=10, inventory=[])
+
+    result = purchase(api, 'streak_freeze')
+
+    assert not result['success'] and result['message'] == 'Not enough coins!'
+    assert result['coins'] == 10
+    assert api.user()['inventory'] == [] and api.user()['version'] == 1
+
+
+def test_an_owned_avatar_is_not_bought_again(api):
+    api.seed(coins=100, unlocked_avatars=['ninja'])
+
+    result = purchase(api, 'ninja', kind='avatar')
+
+    assert not result['success'] and result['message'] == 'You already own this avatar!'
+    assert api.user()['coins'] == 100
+
+
+def test_replayed_purchase_is_charged_once(api):
+    api.seed(coins=50, inventory=[])
+
+    first = purchase(api, 'xp_multiplier', key='k1')
+    # The idempotency middleware answers exact replays; the key is also
+    # checked in the write itself, e.g. for a retry with a changed body
+    asyncio.run(api.db.idempotency_keys.delete_many({}))
+    second = purchase(api, 'xp_multiplier', key='k1')
+    third = purchase(api, 'xp_multiplier', key='k2')
+
+    assert first['coins'] == 35 and second['success'] and second['coins'] == 35
+    assert third['coins'] == 20
+    assert len(api.user()['inventory']) == 2
+
+
+def test_unknown_item_is_not_found(api):
+    api.seed(coins=50)
+
+    response = api.client.post('/api/store/purchase', json={'item_id': 'nope'}, headers=api.headers)
+
+    assert response.status_code == 404
+
+
+def test_without_one_removes_only_the_first_match():
+    inventory = [{'id': 'a', 'n': 1}, {'id': 'b'}, {'id': 'a', 'n': 2}]
+
+    assert without_one(inventory, 'a') == [{'id': 'b'}, {'id': 'a', 'n': 2}]
+    assert without_one(inventory, 'c') is None
+    assert len(inventory) == 3
+
+
+def test_using_an_item_removes_one_from_the_inventory(api):
+    api.seed(inventory=[{'id': 'xp_multiplier'}, {'id': 'streak_freeze'}, {'id': 'xp_multiplier'}])
+
+    used = api.client.post('/api/store/use', json={'item_id': 'xp_multiplier'}, headers=api.headers).json()
+    missing = api.client.post('/api/store/use', json={'item_id': 'mystery'}, headers=api.headers).json()
+
+    assert used['success'] and not missing['success']
+    user = api.user()
+    assert [entry['id'] for entry in user['inventory']] == ['streak_freeze', 'xp_multiplier']
+    assert user['version'] == 2
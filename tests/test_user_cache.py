@@ -0,0 +1,148 @@
+import asyncio
+
+from realtime import ChangeNotifier
+from user_cache import LocalCacheBackend, UserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDb:
+    """Loader over a dict of user documents, counting reads"""
+
+    def __init__(self, **users):
+        self.users = users
+        self.reads = 0
+
+    async def load(self, google_id):
+        self.reads += 1
+        user = self.users.get(google_id)
+        return dict(user) if user is not None else None
+
+
+def make_cache(ttl=30.0, max_size=100):
+    clock = FakeClock()
+    return UserCache(LocalCacheBackend(max_size=max_size, clock=clock), ttl=ttl), clock
+
+
+def test_second_read_is_served_from_the_cache():
+    cache, _ = make_cache()
+    db = FakeDb(g1={'coins': 5})
+
+    async def scenario():
+        return await cache.get('g1', db.load), await cache.get('g1', db.load)
+
+    assert asyncio.run(scenario()) == ({'coins': 5}, {'coins': 5})
+    assert db.reads == 1 and (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl():
+    cache, clock = make_cache(ttl=30)
+    db = FakeDb(g1={'coins': 5})
+
+    async def scenario():
+        await cache.get('g1', db.load)
+        clock.now = 31
+        db.users['g1'] = {'coins': 9}
+        return await cache.get('g1', db.load)
+
+    assert asyncio.run(scenario()) == {'coins': 9}
+    assert db.reads == 2
+
+
+def test_callers_get_private_copies():
+    cache, _ = make_cache()
+    db = FakeDb(g1={'inventory': []})
+
+    async def scenario():
+        user = await cache.get('g1', db.load)
+        user['inventory'].append('potion')
+        return await cache.get('g1', db.load)
+
+    assert asyncio.run(scenario()) == {'inventory': []}
+
+
+def test_least_recently_used_entry_is_evicted():
+    backend = LocalCacheBackend(max_size=2, clock=FakeClock())
+
+    async def scenario():
+        await backend.set('a', {'n': 1}, 30)
+        await backend.set('b', {'n': 2}, 30)
+        await backend.get('a')
+        await backend.set('c', {'n': 3}, 30)
+        return [await backend.get(key) for key in 'abc']
+
+    assert asyncio.run(scenario()) == [{'n': 1}, None, {'n': 3}]
+
+
+def test_missing_users_are_not_cached():
+    cache, _ = make_cache()
+    db = FakeDb()
+
+    async def scenario():
+        await cache.get('nobody', db.load)
+        return await cache.get('nobody', db.load)
+
+    assert asyncio.run(scenario()) is None
+    assert db.reads == 2
+
+
+def test_load_overlapping_a_write_is_not_cached():
+    cache, _ = make_cache()
+    db = FakeDb(g1={'coins': 5})
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load(google_id):
+        user = await db.load(google_id)
+        loading.set()
+        await release.wait()
+        return user
+
+    async def scenario():
+        reader = asyncio.create_task(cache.get('g1', slow_load))
+        await loading.wait()
+        # A write lands after the read but before the reader caches it
+        db.users['g1'] = {'coins': 0}
+        await cache.invalidate('g1')
+        release.set()
+        stale = await reader
+        return stale, await cache.get('g1', db.load)
+
+    stale, fresh = asyncio.run(scenario())
+
+    assert stale == {'coins': 5}
+    assert fresh == {'coins': 0}
+
+
+def test_changes_from_other_workers_drop_the_local_copy():
+    cache, _ = make_cache()
+    db = FakeDb(g1={'coins': 5})
+    notifier = ChangeNotifier()
+    notifier.listeners.append(cache.forget_local)
+
+    async def scenario():
+        await notifier.start()
+        await cache.get('g1', db.load)
+        db.users['g1'] = {'coins': 7}
+        await notifier.notify('g1', {'version': 2, 'fields': ['coins']})
+        return await cache.get('g1', db.load)
+
+    assert asyncio.run(scenario()) == {'coins': 7}
+
+
+def test_zero_ttl_disables_caching():
+    cache, _ = make_cache(ttl=0)
+    db = FakeDb(g1={'coins': 5})
+
+    async def scenario():
+        await cache.get('g1', db.load)
+        await cache.get('g1', db.load)
+
+    asyncio.run(scenario())
+    assert db.reads == 2 and cache.hits == 0